@@ -0,0 +1,167 @@
+"""
+Async API views for ASGI deployments.
+
+会长时间挂起的接口（长轮询的房间详情、SSE 推送）以及创建房间的异步版本。
+在事件循环中等待房间变化，不占用线程，单个进程可以同时保持大量等待中的连接。
+其余接口（开始投票、投票、重置、排序）只做很短的内存操作，继续使用 views.py 中的同步视图。
+
+由 app/asgi.py 设置 ROOM_ASYNC_VIEWS 后在 urls.py 中启用；响应格式与同步视图完全相同。
+
+房间服务的调用都经过 RoomService.run_async：Redis、共享内存后端的读写在线程池中执行，不阻塞事件循环；
+启用比赛磁盘缓存时，创建房间（需要读取 SQLite）也在线程池中执行。
+"""
+import asyncio
+import functools
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+
+from .renderers import ORJSONRenderer
+from .services import OpenDotaService, get_room_heroes_fetcher, get_room_service
+from .views import _RoomEventStream, _RoomPayload, _create_room, _long_poll_target, _room_detail
+
+# 同时等待房间变化的长轮询请求和 SSE 连接总数上限；等待只占用少量内存，上限可以远大于线程数
+_async_waiter_slots = threading.BoundedSemaphore(settings.ROOM_ASYNC_MAX_WAITERS)
+
+
+def _json_response(data, status_code: int = status.HTTP_200_OK, headers=None) -> HttpResponse:
+    """与 DRF Response 相同的 JSON 编码，data 为 None 时响应体为空"""
+    content = ORJSONRenderer().render(data) if data is not None else b''
+    return HttpResponse(content, status=status_code, headers=headers, content_type='application/json')
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class RoomCreateView(View):
+    """创建房间接口（异步）：未缓存的比赛在事件循环中用异步 HTTP 客户端获取"""
+
+    async def post(self, request):
+        # 与同步视图的 JSONParser 行为一致
+        if request.content_type != 'application/json':
+            return _json_response({
+                'detail': f'Unsupported media type "{request.content_type}" in request.'
+            }, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError as e:
+            return _json_response({'detail': f'JSON parse error - {e}'}, status.HTTP_400_BAD_REQUEST)
+        if not isinstance(data, dict):
+            return _json_response({'detail': 'JSON parse error - 请求体必须是对象'}, status.HTTP_400_BAD_REQUEST)
+
+        # 在线程池中执行时，后台获取任务仍提交到当前事件循环
+        submit_fetch = functools.partial(get_room_heroes_fetcher().submit_async, loop=asyncio.get_running_loop())
+        room_service = get_room_service()
+        payload, status_code = await room_service.run_async(
+            _create_room, data, request.headers.get('X-User-Fingerprint'), submit_fetch,
+            blocking=OpenDotaService.disk_cache_enabled()
+        )
+        return _json_response(payload, status_code)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class RoomDetailView(View):
+    """获取房间信息接口（异步），支持长轮询：?since=<版本号>&wait=<秒数>"""
+
+    async def get(self, request, room_id):
+        try:
+            user_fingerprint = request.headers.get('X-User-Fingerprint')
+            room_service = get_room_service()
+
+            target = await room_service.run_async(
+                _long_poll_target, room_service, room_id, request.GET.get('since'), request.GET.get('wait')
+            )
+            # 等待名额已满时立即返回，退化为普通轮询
+            if target is not None and _async_waiter_slots.acquire(blocking=False):
+                try:
+                    await room_service.wait_for_version_async(*target)
+                finally:
+                    _async_waiter_slots.release()
+
+            content, status_code, headers = await room_service.run_async(
+                _room_detail, room_service, room_id, user_fingerprint, request.headers.get('If-None-Match')
+            )
+            return HttpResponse(content, status=status_code, headers=headers, content_type='application/json')
+        except Exception as e:
+            return _json_response({
+                'success': False,
+                'error': 'SERVER_ERROR',
+                'message': f'获取房间信息失败: {str(e)}'
+            }, status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class _AsyncRoomEventStream(_RoomEventStream):
+    """_RoomEventStream 的异步版本
+
+    ASGI 处理器在客户端断开时取消响应任务并关闭生成器，不一定会调用 close()，
+    因此生成器结束时也释放连接名额（close() 可以重复调用）。
+    """
+
+    slots = _async_waiter_slots
+    # StreamingHttpResponse 优先按同步迭代器处理，去掉继承的 __iter__ 才会以异步方式消费
+    __iter__ = None
+
+    async def __aiter__(self):
+        try:
+            deadline = time.monotonic() + settings.ROOM_EVENTS_MAX_DURATION
+            last_version = None
+            yield 'retry: 3000\n\n'
+            while True:
+                snapshot = await self.room_service.run_async(self.room_service.get_room_snapshot, self.room_password)
+                if snapshot is None or snapshot.room_id != self.room_id:
+                    yield 'event: deleted\ndata: {}\n\n'
+                    return
+
+                if snapshot.version != last_version:
+                    last_version = snapshot.version
+                    payload = _RoomPayload.of(snapshot).data(self.user_fingerprint).decode('utf-8')
+                    yield f'event: room\ndata: {payload}\n\n'
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                version = await self.room_service.wait_for_version_async(
+                    self.room_id, last_version, min(settings.ROOM_EVENTS_HEARTBEAT, remaining)
+                )
+                if version == last_version:
+                    yield ': heartbeat\n\n'
+        finally:
+            self.close()
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class RoomEventsView(View):
+    """房间状态 SSE 推送接口（异步），用户指纹通过 fingerprint 查询参数传递"""
+
+    async def get(self, request, room_id):
+        user_fingerprint = request.GET.get('fingerprint') or request.headers.get('X-User-Fingerprint')
+        room_service = get_room_service()
+
+        room = await room_service.run_async(room_service.get_room_snapshot, room_id)
+        if room is None:
+            return _json_response({
+                'success': False,
+                'error': 'ROOM_NOT_FOUND',
+                'message': '房间不存在'
+            }, status.HTTP_404_NOT_FOUND)
+
+        if not _async_waiter_slots.acquire(blocking=False):
+            return _json_response({
+                'success': False,
+                'error': 'TOO_MANY_STREAMS',
+                'message': '实时推送连接数已满，请稍后重试'
+            }, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        response = StreamingHttpResponse(
+            _AsyncRoomEventStream(room_service, room_id, room.room_id, user_fingerprint),
+            content_type='text/event-stream; charset=utf-8'
+        )
+        response['Cache-Control'] = 'no-cache'
+        # 关闭反向代理（如 nginx）的响应缓冲
+        response['X-Accel-Buffering'] = 'no'
+        return response
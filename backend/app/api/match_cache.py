@@ -0,0 +1,107 @@
+"""
+SQLite-backed match cache.
+
+把 get_losing_team_heroes 提取出的失败方玩家列表按比赛ID保存到磁盘，重启或重新部署后仍然有效。
+比赛结束后数据不会再变化，条目不设过期时间，只按容量淘汰最久未使用的比赛。
+
+同一台机器上的多个 worker 可以共用同一个数据库文件（WAL 模式，读写互不阻塞）。
+磁盘缓存只是加速手段：读写失败时记录日志并当作未命中，不影响正常请求 OpenDota。
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger('app.api.services')
+
+
+class MatchDiskCache:
+    """比赛数据的磁盘缓存"""
+
+    # 超出容量时额外多删除容量的 1%；同样每写入这么多场比赛才检查一次容量，
+    # 多个 worker 共用数据库文件时，条目数最多超出容量 worker 数 × 该数量
+    evict_ratio = 0.01
+
+    def __init__(self, path: str, max_entries: int = 100000):
+        """打开（必要时创建）数据库文件，失败时抛出 sqlite3.Error 或 OSError"""
+        self.path = path
+        self.max_entries = max_entries
+        self._evict_batch = max(int(max_entries * self.evict_ratio), 1)
+        # 距离下次检查容量还可以写入的比赛数，启动后第一次写入时检查
+        self._puts_until_check = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # 连接在线程间共享，由 _lock 串行化
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        try:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS matches ('
+                'match_id INTEGER PRIMARY KEY, '
+                'heroes TEXT NOT NULL, '
+                'fetched_at REAL NOT NULL, '
+                'used_at REAL NOT NULL)'
+            )
+            self._conn.execute('CREATE INDEX IF NOT EXISTS matches_used_at ON matches (used_at)')
+        except sqlite3.Error:
+            self._conn.close()
+            raise
+
+    def get(self, match_id: int) -> Optional[List[Dict]]:
+        """读取比赛的失败方玩家列表，未缓存或读取失败时返回 None"""
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    'SELECT heroes FROM matches WHERE match_id = ?', (match_id,)
+                ).fetchone()
+                if row is None:
+                    return None
+                self._conn.execute(
+                    'UPDATE matches SET used_at = ? WHERE match_id = ?', (time.time(), match_id)
+                )
+            return json.loads(row[0])
+        except (sqlite3.Error, ValueError):
+            logger.exception(f'读取比赛磁盘缓存失败 - 比赛ID: {match_id}')
+            return None
+
+    def put(self, match_id: int, heroes: List[Dict]):
+        """保存比赛的失败方玩家列表，超出容量时淘汰最久未使用的比赛（每 _evict_batch 次写入检查一次）"""
+        data = json.dumps(heroes, ensure_ascii=False, separators=(',', ':'))
+        now = time.time()
+        try:
+            with self._lock:
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO matches (match_id, heroes, fetched_at, used_at) VALUES (?, ?, ?, ?)',
+                    (match_id, data, now, now)
+                )
+                if self._puts_until_check > 0:
+                    self._puts_until_check -= 1
+                    return
+                self._puts_until_check = self._evict_batch
+                count = self._conn.execute('SELECT COUNT(*) FROM matches').fetchone()[0]
+                if count > self.max_entries:
+                    self._conn.execute(
+                        'DELETE FROM matches WHERE match_id IN '
+                        '(SELECT match_id FROM matches ORDER BY used_at LIMIT ?)',
+                        (min(count - 1, count - self.max_entries + self._evict_batch),)
+                    )
+        except sqlite3.Error:
+            logger.exception(f'写入比赛磁盘缓存失败 - 比赛ID: {match_id}')
+
+    def count(self) -> int:
+        """获取缓存的比赛数"""
+        try:
+            with self._lock:
+                return self._conn.execute('SELECT COUNT(*) FROM matches').fetchone()[0]
+        except sqlite3.Error:
+            return 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
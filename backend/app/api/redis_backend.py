@@ -0,0 +1,768 @@
+"""
+Redis room storage backend.
+
+多个 gunicorn worker / 多个实例共享同一个 Redis 中的房间数据。
+每个修改操作都是一个 Lua 脚本，检查和写入在 Redis 中原子执行，因此 vote 的投票次数、
+重复投票和投票结束判断在多进程下依然正确。
+
+键结构（prefix 默认为 mole:）：
+- {prefix}room:{room_id}          房间基本信息（hash），包含 version、serial（创建序号）
+- {prefix}room:{room_id}:votes    玩家序号 -> 得票数（hash）
+- {prefix}room:{room_id}:voters   用户指纹 -> 投票用户状态 JSON（hash），n 为开始投票的先后顺序
+- {prefix}password:{password}     房间密码 -> 房间ID
+- {prefix}expiry                  房间ID -> 过期时间戳（有序集合）
+- {prefix}evictions               淘汰原因 -> 次数（hash）
+- {prefix}events                  房间变化通知频道，消息为 "房间ID 版本号"，版本号为 0 表示房间已删除
+
+脚本内部拼接键名，只支持单节点 Redis（或兼容 Redis 协议的服务），不支持 Redis Cluster。
+"""
+import json
+import logging
+import threading
+import time
+from datetime import datetime
+from itertools import chain
+from operator import itemgetter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+try:
+    import redis
+except ImportError:  # 只有使用 Redis 后端时才需要安装
+    redis = None
+
+from .services import (
+    PLAYER_COUNT,
+    AsyncRoomWaiters,
+    RoomBackend,
+    RoomCreateError,
+    RoomSnapshot,
+    RoomState,
+    VoterState,
+    ballot_mask,
+    count_voters,
+    players_to_mask,
+    vote_error,
+    vote_result
+)
+
+logger = logging.getLogger('app.api.services')
+
+# 所有脚本共用的参数和函数：ARGV[1..5] 依次为键前缀、当前时间戳、闲置保留时间、结束后保留时间、最长保留时间，
+# 各脚本自己的参数从 ARGV[6] 开始
+_LUA_PRELUDE = """
+local prefix = ARGV[1]
+local now = tonumber(ARGV[2])
+local idle_ttl = tonumber(ARGV[3])
+local finished_ttl = tonumber(ARGV[4])
+local max_age = tonumber(ARGV[5])
+local expiry_key = prefix .. 'expiry'
+local evictions_key = prefix .. 'evictions'
+
+local function room_key(room_id)
+    return prefix .. 'room:' .. room_id
+end
+
+local function password_key(room_password)
+    return prefix .. 'password:' .. room_password
+end
+
+-- 按房间状态重新计算过期时间
+local function touch(room_id, status, created_at)
+    local ttl = idle_ttl
+    if status == 'finished' or status == 'failed' then
+        ttl = finished_ttl
+    end
+    redis.call('ZADD', expiry_key, math.min(now + ttl, tonumber(created_at) + max_age), room_id)
+end
+
+-- 房间状态变更：递增版本号、刷新过期时间并通知等待者
+local function bump(room_id)
+    local key = room_key(room_id)
+    local version = redis.call('HINCRBY', key, 'version', 1)
+    local meta = redis.call('HMGET', key, 'status', 'created_at')
+    touch(room_id, meta[1], meta[2])
+    redis.call('PUBLISH', prefix .. 'events', room_id .. ' ' .. version)
+    return version
+end
+
+local function delete_room(room_id)
+    local key = room_key(room_id)
+    local room_password = redis.call('HGET', key, 'room_password')
+    redis.call('ZREM', expiry_key, room_id)
+    if not room_password then
+        return 0
+    end
+    if redis.call('GET', password_key(room_password)) == room_id then
+        redis.call('DEL', password_key(room_password))
+    end
+    redis.call('DEL', key, key .. ':votes', key .. ':voters')
+    redis.call('PUBLISH', prefix .. 'events', room_id .. ' 0')
+    return 1
+end
+"""
+
+# ARGV[6..8]: 房间ID、房间密码、最大房间数；之后为房间字段的 field / value 列表
+_CREATE_ROOM = """
+local room_id = ARGV[6]
+local room_password = ARGV[7]
+local max_rooms = tonumber(ARGV[8])
+local key = room_key(room_id)
+if redis.call('EXISTS', key) == 1 then
+    return 'ROOM_ID_EXISTS'
+end
+local owner = redis.call('GET', password_key(room_password))
+if owner and redis.call('EXISTS', room_key(owner)) == 1 then
+    return 'ROOM_PASSWORD_EXISTS'
+end
+-- 房间数达到上限时，先淘汰最接近过期的房间
+local evicted = {}
+while redis.call('ZCARD', expiry_key) >= max_rooms do
+    local oldest = redis.call('ZRANGE', expiry_key, 0, 0)[1]
+    if not oldest then
+        break
+    end
+    if delete_room(oldest) == 1 then
+        redis.call('HINCRBY', evictions_key, 'capacity', 1)
+        evicted[#evicted + 1] = oldest
+    end
+end
+redis.call('HSET', key, unpack(ARGV, 9))
+local serial = redis.call('INCR', prefix .. 'serial')
+redis.call('HSET', key, 'serial', serial)
+redis.call('SET', password_key(room_password), room_id)
+touch(room_id, redis.call('HGET', key, 'status'), redis.call('HGET', key, 'created_at'))
+return {serial, evicted}
+"""
+
+# ARGV[6..9]: 查找方式（password / id）、密码或房间ID、本地缓存的 "序号:版本号"、是否计入房间活动
+# 缓存仍然有效时只返回房间ID，否则返回房间ID和全部数据
+_LOAD_ROOM = """
+local room_id = ARGV[7]
+if ARGV[6] == 'password' then
+    room_id = redis.call('GET', password_key(ARGV[7]))
+    if not room_id then
+        return false
+    end
+end
+local key = room_key(room_id)
+local meta = redis.call('HMGET', key, 'status', 'created_at', 'serial', 'version', 'room_password')
+if not meta[1] then
+    return false
+end
+if ARGV[6] == 'password' and meta[5] ~= ARGV[7] then
+    return false
+end
+if ARGV[9] == '1' then
+    touch(room_id, meta[1], meta[2])
+end
+if ARGV[8] == meta[3] .. ':' .. meta[4] then
+    return {room_id}
+end
+return {
+    room_id,
+    redis.call('HGETALL', key),
+    redis.call('HGETALL', key .. ':votes'),
+    redis.call('HGETALL', key .. ':voters')
+}
+"""
+
+# ARGV[6]: 房间密码
+_ROOM_VERSION = """
+local room_id = redis.call('GET', password_key(ARGV[6]))
+if not room_id then
+    return false
+end
+local meta = redis.call('HMGET', room_key(room_id), 'status', 'created_at', 'version')
+if not meta[1] then
+    return false
+end
+touch(room_id, meta[1], meta[2])
+return {room_id, tonumber(meta[3])}
+"""
+
+# ARGV[6]: 房间密码
+_ROOM_EXISTS_BY_PASSWORD = """
+local room_id = redis.call('GET', password_key(ARGV[6]))
+if not room_id then
+    return 0
+end
+return redis.call('EXISTS', room_key(room_id))
+"""
+
+# ARGV[6]: 房间ID
+_DELETE_ROOM = """
+return delete_room(ARGV[6])
+"""
+
+# ARGV[6..8]: 房间ID、新状态（init / failed）、英雄列表 JSON（failed 时为空）；只修改 pending 状态的房间
+_FINISH_PENDING = """
+local room_id = ARGV[6]
+local key = room_key(room_id)
+if redis.call('HGET', key, 'status') ~= 'pending' then
+    return 0
+end
+if ARGV[7] == 'init' then
+    redis.call('HSET', key, 'status', 'init', 'heroes', ARGV[8])
+else
+    redis.call('HSET', key, 'status', ARGV[7])
+end
+bump(room_id)
+return 1
+"""
+
+# ARGV[6]: 房间ID
+_START_VOTING = """
+local room_id = ARGV[6]
+if redis.call('EXISTS', room_key(room_id)) == 0 then
+    return 0
+end
+redis.call('HSET', room_key(room_id), 'status', 'voting')
+bump(room_id)
+return 1
+"""
+
+# ARGV[6..7]: 房间ID、用户指纹
+_START_USER_VOTING = """
+local room_id = ARGV[6]
+local key = room_key(room_id)
+if redis.call('EXISTS', key) == 0 then
+    return 0
+end
+local raw = redis.call('HGET', key .. ':voters', ARGV[7])
+local voter
+if raw then
+    voter = cjson.decode(raw)
+    if voter.s == 1 then
+        return 1
+    end
+    voter.s = 1
+else
+    voter = {n = redis.call('HINCRBY', key, 'voter_seq', 1), p = {}, s = 1}
+end
+redis.call('HSET', key .. ':voters', ARGV[7], cjson.encode(voter))
+-- 计数字段出现之前创建的房间没有该字段，读取时再统计
+if redis.call('HEXISTS', key, 'started_voters') == 1 then
+    redis.call('HINCRBY', key, 'started_voters', 1)
+end
+bump(room_id)
+return 1
+"""
+
+# ARGV[6..8]: 房间ID、用户指纹、用户名（没有时为空字符串）；之后为本次投票的玩家序号（已校验范围）
+_VOTE = """
+local room_id = ARGV[6]
+local user_fingerprint = ARGV[7]
+local username = ARGV[8]
+local players = {}
+for i = 9, #ARGV do
+    players[#players + 1] = tonumber(ARGV[i])
+end
+local key = room_key(room_id)
+local voters_key = key .. ':voters'
+local meta = redis.call('HMGET', key, 'max_votes', 'votes_per_user')
+if not meta[1] then
+    return false
+end
+local max_votes = tonumber(meta[1])
+local votes_per_user = tonumber(meta[2])
+
+local raw = redis.call('HGET', voters_key, user_fingerprint)
+local voter
+if not raw then
+    voter = {n = redis.call('HINCRBY', key, 'voter_seq', 1), p = {}, s = 0}
+    if username ~= '' then
+        voter.u = username
+    end
+    -- 新增投票用户会影响已投票人数
+    redis.call('HSET', voters_key, user_fingerprint, cjson.encode(voter))
+    bump(room_id)
+else
+    voter = cjson.decode(raw)
+    if username ~= '' and not voter.u then
+        -- 补充用户名会影响已投票用户名列表
+        voter.u = username
+        redis.call('HSET', voters_key, user_fingerprint, cjson.encode(voter))
+        bump(room_id)
+    end
+end
+
+if voter.s ~= 1 then
+    return 'VOTING_NOT_STARTED'
+end
+if #voter.p >= votes_per_user then
+    return 'ALREADY_VOTED'
+end
+local seen = {}
+for _, voted in ipairs(voter.p) do
+    seen[voted] = true
+end
+for _, player in ipairs(players) do
+    if seen[player] then
+        return 'DUPLICATE_VOTE'
+    end
+    seen[player] = true
+end
+if #voter.p + #players > votes_per_user then
+    return 'TOO_MANY_VOTES'
+end
+
+for _, player in ipairs(players) do
+    redis.call('HINCRBY', key .. ':votes', player, 1)
+    voter.p[#voter.p + 1] = player
+end
+redis.call('HSET', voters_key, user_fingerprint, cjson.encode(voter))
+
+-- 已投完所有票的用户数随投票增量维护；计数字段出现之前创建的房间遍历一次补齐
+local completed = tonumber(redis.call('HGET', key, 'completed_voters'))
+if not completed then
+    completed = 0
+    for _, other in ipairs(redis.call('HVALS', voters_key)) do
+        if #cjson.decode(other).p >= votes_per_user then
+            completed = completed + 1
+        end
+    end
+    redis.call('HSET', key, 'completed_voters', completed)
+elseif #voter.p == votes_per_user then
+    completed = redis.call('HINCRBY', key, 'completed_voters', 1)
+end
+
+-- 已投票用户数达到最大投票人数，且所有已投票的用户都完成了所有投票时，投票结束
+local current_votes = redis.call('HLEN', voters_key)
+local finished = 0
+if current_votes >= max_votes and completed == current_votes then
+    finished = 1
+end
+if finished == 1 then
+    redis.call('HSET', key, 'status', 'finished')
+end
+bump(room_id)
+return {finished, current_votes, max_votes, cjson.encode(voter.p), votes_per_user - #voter.p}
+"""
+
+# ARGV[6..7]: 房间ID、房主指纹
+_RESET_VOTING = """
+local room_id = ARGV[6]
+local key = room_key(room_id)
+local creator_fingerprint = redis.call('HGET', key, 'creator_fingerprint')
+if not creator_fingerprint then
+    return 'ROOM_NOT_FOUND'
+end
+if creator_fingerprint ~= ARGV[7] then
+    return 'UNAUTHORIZED'
+end
+redis.call('DEL', key .. ':votes', key .. ':voters')
+redis.call(
+    'HSET', key, 'status', 'init', 'order_generation_count', 0, 'player_order', '', 'voter_seq', 0,
+    'started_voters', 0, 'completed_voters', 0
+)
+bump(room_id)
+return 'OK'
+"""
+
+# ARGV[6..8]: 房间ID、房主指纹、排序 JSON
+_SET_PLAYER_ORDER = """
+local room_id = ARGV[6]
+local key = room_key(room_id)
+local creator_fingerprint = redis.call('HGET', key, 'creator_fingerprint')
+if not creator_fingerprint then
+    return 'ROOM_NOT_FOUND'
+end
+if creator_fingerprint ~= ARGV[7] then
+    return 'UNAUTHORIZED'
+end
+redis.call('HSET', key, 'player_order', ARGV[8])
+local count = redis.call('HINCRBY', key, 'order_generation_count', 1)
+bump(room_id)
+return count
+"""
+
+# ARGV[6]: 单次最多处理的过期房间数；返回扫描数量和被淘汰的房间ID
+_SWEEP = """
+local expired = redis.call('ZRANGEBYSCORE', expiry_key, '-inf', now, 'LIMIT', 0, tonumber(ARGV[6]))
+local evicted = {}
+for _, room_id in ipairs(expired) do
+    local meta = redis.call('HMGET', room_key(room_id), 'status', 'created_at')
+    if delete_room(room_id) == 1 then
+        local reason = 'idle'
+        if tonumber(meta[2]) + max_age <= now then
+            reason = 'max_age'
+        elseif meta[1] == 'finished' or meta[1] == 'failed' then
+            reason = 'finished'
+        end
+        redis.call('HINCRBY', evictions_key, reason, 1)
+        evicted[#evicted + 1] = room_id
+    end
+end
+return {#expired, evicted}
+"""
+
+
+class RedisRoomBackend(RoomBackend):
+    """Redis 存储后端
+
+    - 修改操作：每个操作一个 Lua 脚本，一次往返完成检查和写入
+    - 读取快照：本进程按 (查找方式, 密码或房间ID) 缓存已解析的快照，脚本发现房间的
+      "创建序号:版本号" 与缓存一致时只返回房间ID，省去传输和解析
+    - 等待房间变化：后台线程订阅 events 频道，收到通知后唤醒本进程中等待该房间的请求；
+      等待结束时总会再读一次 Redis 中的版本号，订阅断开期间漏掉的通知最多推迟到超时
+    """
+
+    name = 'redis'
+    blocking = True
+
+    # 单次清理脚本最多处理的过期房间数，避免长时间阻塞 Redis
+    sweep_batch = 500
+
+    def __init__(self, url: str = None, prefix: str = 'mole:', client=None):
+        """url 为 Redis 连接地址；也可以直接传入 client（需设置 decode_responses=True）"""
+        if client is None:
+            if redis is None:
+                raise ImportError('使用 Redis 房间存储需要安装 redis 包')
+            client = redis.Redis.from_url(url or 'redis://localhost:6379/0', decode_responses=True)
+        self._redis = client
+        self._prefix = prefix
+        self._create_script = self._register(_CREATE_ROOM)
+        self._load_script = self._register(_LOAD_ROOM)
+        self._version_script = self._register(_ROOM_VERSION)
+        self._exists_script = self._register(_ROOM_EXISTS_BY_PASSWORD)
+        self._delete_script = self._register(_DELETE_ROOM)
+        self._finish_pending_script = self._register(_FINISH_PENDING)
+        self._start_voting_script = self._register(_START_VOTING)
+        self._start_user_voting_script = self._register(_START_USER_VOTING)
+        self._vote_script = self._register(_VOTE)
+        self._reset_script = self._register(_RESET_VOTING)
+        self._order_script = self._register(_SET_PLAYER_ORDER)
+        self._sweep_script = self._register(_SWEEP)
+        # (查找方式, 密码或房间ID) -> ("创建序号:版本号", 快照)
+        self._snapshots: Dict[Tuple[str, str], Tuple[str, RoomSnapshot]] = {}
+        # 等待房间变化：房间ID -> 等待中的请求数 / 收到的最新版本号
+        self._wait_cond = threading.Condition()
+        self._waiting: Dict[str, int] = {}
+        self._published: Dict[str, int] = {}
+        self._listener: Optional[threading.Thread] = None
+        self._async_waiters = AsyncRoomWaiters(blocking=True)
+
+    def _register(self, script: str):
+        return self._redis.register_script(_LUA_PRELUDE + script)
+
+    def _room_key(self, room_id: str) -> str:
+        return f'{self._prefix}room:{room_id}'
+
+    def _run(self, script, *args):
+        """执行脚本，自动带上公共参数"""
+        return script(args=[
+            self._prefix,
+            time.time(),
+            self.idle_ttl,
+            self.finished_ttl,
+            self.max_age,
+            *args
+        ])
+
+    def _load(self, mode: str, lookup: str, touch: bool) -> Optional[RoomSnapshot]:
+        """读取房间快照，本地缓存仍然有效时直接复用"""
+        cache_key = (mode, lookup)
+        cached = self._snapshots.get(cache_key)
+        result = self._run(self._load_script, mode, lookup, cached[0] if cached else '', '1' if touch else '0')
+        if not result:
+            self._snapshots.pop(cache_key, None)
+            return None
+        if len(result) == 1:
+            return cached[1]
+        token, snapshot = self._decode(result[0], result[1], result[2], result[3], cached)
+        if len(self._snapshots) >= self.max_rooms:
+            self._snapshots.clear()
+        self._snapshots[cache_key] = (token, snapshot)
+        return snapshot
+
+    @staticmethod
+    def _decode(
+        room_id: str,
+        meta_pairs: List[str],
+        vote_pairs: List[str],
+        voter_pairs: List[str],
+        cached: Optional[Tuple[str, RoomSnapshot]]
+    ) -> Tuple[str, RoomSnapshot]:
+        """把 HGETALL 的结果还原为快照，返回 ("创建序号:版本号", 快照)"""
+        meta = dict(zip(meta_pairs[::2], meta_pairs[1::2]))
+        votes = [0] * PLAYER_COUNT
+        for player, count in zip(vote_pairs[::2], vote_pairs[1::2]):
+            votes[int(player) - 1] = int(count)
+        voters = []
+        for fingerprint, raw in zip(voter_pairs[::2], voter_pairs[1::2]):
+            data = json.loads(raw)
+            # Lua 的 cjson 会把空数组编码为 {}，遍历时两者结果相同
+            voters.append((data['n'], fingerprint, VoterState(players_to_mask(data['p']), data.get('u'), data['s'] == 1)))
+        # 按开始投票的先后排序，与内存后端中已投票用户的顺序一致
+        voters.sort(key=itemgetter(0))
+        votes_per_user = int(meta['votes_per_user'])
+        if 'started_voters' in meta and 'completed_voters' in meta:
+            started_voters, completed_voters = int(meta['started_voters']), int(meta['completed_voters'])
+        else:
+            # 计数字段出现之前创建的房间
+            started_voters, completed_voters = count_voters((voter for _, _, voter in voters), votes_per_user)
+        # 英雄列表只在 pending 房间获取到比赛数据时写入一次，之后同一个房间直接复用已解析的列表
+        if cached is not None and cached[1].status != 'pending' and cached[0].split(':')[0] == meta['serial']:
+            heroes = cached[1].heroes
+        else:
+            heroes = json.loads(meta['heroes'])
+        room = RoomState(
+            room_id=room_id,
+            room_password=meta['room_password'],
+            match_id=int(meta['match_id']),
+            max_votes=int(meta['max_votes']),
+            votes_per_user=votes_per_user,
+            creator_username=meta['creator_username'],
+            creator_fingerprint=meta['creator_fingerprint'],
+            heroes=heroes,
+            show_only_winner_votes=meta['show_only_winner_votes'] == '1',
+            status=meta['status'],
+            created_at=datetime.fromtimestamp(float(meta['created_at'])),
+            votes=votes,
+            voted_users={fingerprint: voter for _, fingerprint, voter in voters},
+            started_voters=started_voters,
+            completed_voters=completed_voters,
+            player_order=tuple(json.loads(meta['player_order'])) if meta['player_order'] else None,
+            order_generation_count=int(meta['order_generation_count']),
+            version=int(meta['version'])
+        )
+        return f"{meta['serial']}:{meta['version']}", RoomSnapshot.from_state(room)
+
+    def sweep_expired_rooms(self) -> int:
+        evicted = 0
+        while True:
+            scanned, room_ids = self._run(self._sweep_script, self.sweep_batch)
+            for room_id in room_ids:
+                logger.info(f'房间已淘汰 - 房间ID: {room_id}, 原因: 过期')
+            evicted += len(room_ids)
+            if scanned < self.sweep_batch:
+                return evicted
+
+    def get_stats(self) -> Dict:
+        pipe = self._redis.pipeline()
+        pipe.zcard(f'{self._prefix}expiry')
+        pipe.hgetall(f'{self._prefix}evictions')
+        rooms, counts = pipe.execute()
+        evictions = {'idle': 0, 'finished': 0, 'max_age': 0, 'capacity': 0}
+        evictions.update({reason: int(count) for reason, count in counts.items()})
+        return {
+            'rooms': rooms,
+            'max_rooms': self.max_rooms,
+            'evictions': evictions
+        }
+
+    def find_room(self, room_id: str) -> Optional[RoomSnapshot]:
+        return self._load('id', room_id, False)
+
+    def get_room_version(self, room_id: str) -> Optional[int]:
+        version = self._redis.hget(self._room_key(room_id), 'version')
+        return int(version) if version is not None else None
+
+    def _listen(self):
+        """订阅房间变化通知，唤醒本进程中正在等待对应房间的请求；连接断开后自动重连"""
+        while True:
+            pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(f'{self._prefix}events')
+                for message in pubsub.listen():
+                    room_id, _, version = message['data'].rpartition(' ')
+                    with self._wait_cond:
+                        if room_id in self._waiting:
+                            self._published[room_id] = int(version)
+                            self._wait_cond.notify_all()
+                    self._async_waiters.notify(room_id)
+            except Exception:
+                logger.exception('Redis 房间变化订阅中断，1 秒后重连')
+                time.sleep(1)
+            finally:
+                pubsub.close()
+
+    def _start_listener(self):
+        """第一次等待时启动订阅线程（调用方需持有 _wait_cond）"""
+        if self._listener is None:
+            self._listener = threading.Thread(target=self._listen, name='room-events-listener', daemon=True)
+            self._listener.start()
+
+    def wait_for_version(self, room_id: str, since: int, timeout: float) -> Optional[int]:
+        with self._wait_cond:
+            self._waiting[room_id] = self._waiting.get(room_id, 0) + 1
+            self._start_listener()
+        try:
+            version = self.get_room_version(room_id)
+            if version is None or version > since:
+                return version
+            with self._wait_cond:
+                self._wait_cond.wait_for(
+                    lambda: self._published.get(room_id, since) == 0 or self._published.get(room_id, since) > since,
+                    timeout
+                )
+                if self._published.get(room_id) == 0:
+                    return None
+            return self.get_room_version(room_id)
+        finally:
+            with self._wait_cond:
+                self._waiting[room_id] -= 1
+                if not self._waiting[room_id]:
+                    del self._waiting[room_id]
+                    self._published.pop(room_id, None)
+
+    async def wait_for_version_async(self, room_id: str, since: int, timeout: float) -> Optional[int]:
+        # 订阅线程收到通知后唤醒事件循环中的等待者；读取版本号（一次 HGET）在线程池中执行
+        with self._wait_cond:
+            self._start_listener()
+        return await self._async_waiters.wait_for_version(room_id, since, timeout, self.get_room_version)
+
+    def room_exists(self, room_id: str) -> bool:
+        return self._redis.exists(self._room_key(room_id)) == 1
+
+    def room_exists_by_password(self, room_password: str) -> bool:
+        return self._run(self._exists_script, room_password) == 1
+
+    def get_room_snapshot(self, room_password: str) -> Optional[RoomSnapshot]:
+        return self._load('password', room_password, True)
+
+    def get_room_version_by_password(self, room_password: str) -> Optional[Tuple[str, int]]:
+        result = self._run(self._version_script, room_password)
+        if not result:
+            return None
+        return result[0], result[1]
+
+    def get_room_status(self, room_id: str) -> Optional[str]:
+        return self._redis.hget(self._room_key(room_id), 'status')
+
+    def create_room(
+        self,
+        room_id: str,
+        room_password: str,
+        match_id: int,
+        max_votes: int,
+        votes_per_user: int,
+        creator_username: str,
+        creator_fingerprint: str,
+        heroes: Optional[List[Dict]],
+        show_only_winner_votes: bool = True
+    ) -> RoomSnapshot:
+        room = RoomState(
+            room_id=room_id,
+            room_password=room_password,
+            match_id=match_id,
+            max_votes=max_votes,
+            votes_per_user=votes_per_user,
+            creator_username=creator_username,
+            creator_fingerprint=creator_fingerprint,
+            heroes=heroes if heroes is not None else [],
+            show_only_winner_votes=show_only_winner_votes,
+            status='init' if heroes is not None else 'pending'
+        )
+        fields = {
+            'room_password': room_password,
+            'match_id': match_id,
+            'max_votes': max_votes,
+            'votes_per_user': votes_per_user,
+            'creator_username': creator_username,
+            'creator_fingerprint': creator_fingerprint,
+            'heroes': json.dumps(room.heroes, ensure_ascii=False),
+            'show_only_winner_votes': 1 if show_only_winner_votes else 0,
+            'status': room.status,
+            'created_at': room.created_at.timestamp(),
+            'player_order': '',
+            'order_generation_count': room.order_generation_count,
+            'version': room.version,
+            'voter_seq': 0,
+            'started_voters': 0,
+            'completed_voters': 0
+        }
+        result = self._run(
+            self._create_script,
+            room_id,
+            room_password,
+            self.max_rooms,
+            *chain.from_iterable(fields.items())
+        )
+        if isinstance(result, str):
+            raise RoomCreateError(result)
+        serial, evicted = result
+        for evicted_id in evicted:
+            logger.info(f'房间已淘汰 - 房间ID: {evicted_id}, 原因: capacity')
+        snapshot = RoomSnapshot.from_state(room)
+        self._snapshots[('password', room_password)] = (f'{serial}:{room.version}', snapshot)
+        return snapshot
+
+    def complete_room(self, room_id: str, heroes: List[Dict]) -> bool:
+        return self._run(
+            self._finish_pending_script, room_id, 'init', json.dumps(heroes, ensure_ascii=False)
+        ) == 1
+
+    def fail_room(self, room_id: str) -> bool:
+        return self._run(self._finish_pending_script, room_id, 'failed', '') == 1
+
+    def delete_room(self, room_id: str) -> bool:
+        return self._run(self._delete_script, room_id) == 1
+
+    def start_voting(self, room_id: str):
+        if not self._run(self._start_voting_script, room_id):
+            raise KeyError(f'房间不存在: {room_id}')
+
+    def start_user_voting(self, room_id: str, user_fingerprint: str):
+        if not self._run(self._start_user_voting_script, room_id, user_fingerprint):
+            raise KeyError(f'房间不存在: {room_id}')
+
+    def vote_many(
+        self,
+        room_id: str,
+        user_fingerprint: str,
+        player_indices: Sequence[int],
+        username: str = None
+    ) -> Dict:
+        ballot_mask(player_indices)
+        result = self._run(self._vote_script, room_id, user_fingerprint, username or '', *player_indices)
+        if result is None:
+            raise KeyError(f'房间不存在: {room_id}')
+        if isinstance(result, str):
+            return vote_error(result)
+        finished, current_votes, max_votes, voted_players, remaining = result
+        return vote_result(finished == 1, current_votes, max_votes, json.loads(voted_players), remaining)
+
+    def reset_voting(self, room_id: str, creator_fingerprint: str) -> Dict:
+        result = self._run(self._reset_script, room_id, creator_fingerprint)
+        if result == 'ROOM_NOT_FOUND':
+            return {
+                'success': False,
+                'error': 'ROOM_NOT_FOUND',
+                'message': '房间不存在'
+            }
+        if result == 'UNAUTHORIZED':
+            return {
+                'success': False,
+                'error': 'UNAUTHORIZED',
+                'message': '只有房主可以重置投票'
+            }
+        return {
+            'success': True,
+            'message': '投票已重置'
+        }
+
+    def generate_player_order(self, room_id: str, creator_fingerprint: str) -> Dict:
+        import random
+        # 生成1-5的随机排序
+        order = list(range(1, 6))
+        random.shuffle(order)
+        result = self._run(self._order_script, room_id, creator_fingerprint, json.dumps(order))
+        if result == 'ROOM_NOT_FOUND':
+            return {
+                'success': False,
+                'error': 'ROOM_NOT_FOUND',
+                'message': '房间不存在'
+            }
+        if result == 'UNAUTHORIZED':
+            return {
+                'success': False,
+                'error': 'UNAUTHORIZED',
+                'message': '只有房主可以生成排序'
+            }
+        return {
+            'success': True,
+            'message': '排序已生成',
+            'order': order,
+            'generation_count': result
+        }
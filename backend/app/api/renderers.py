@@ -0,0 +1,49 @@
+"""
+Fast JSON renderer.
+
+基于 orjson 的 DRF 渲染器，输出与 rest_framework.renderers.JSONRenderer 逐字节相同：
+紧凑分隔符、不转义非 ASCII 字符、转义 U+2028 / U+2029，其他类型（datetime、Decimal、UUID 等）
+交给 DRF 的 JSONEncoder.default 处理。
+唯一的区别是需要用指数表示的浮点数：标准库输出 1e+16、2.5e-05，orjson 输出 1e16、0.000025，
+解析后的数值相同（接口数据中没有这类浮点数）。
+
+以下情况退回到 JSONRenderer 的标准库实现：
+- 未安装 orjson
+- 修改了 UNICODE_JSON / COMPACT_JSON 配置，或请求了缩进输出（Accept: application/json; indent=4）
+- orjson 无法处理的数据，如非字符串的字典键、超出 64 位的整数
+"""
+try:
+    import orjson
+except ImportError:  # 可选依赖，未安装时使用标准库 json
+    orjson = None
+
+from rest_framework.renderers import JSONRenderer
+
+if orjson is not None:
+    # datetime 和 dataclass 交给 DRF 的编码器处理，与标准库 json 的结果一致
+    _ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+
+class ORJSONRenderer(JSONRenderer):
+    """orjson 实现的 JSONRenderer，可以直接替换 REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] 中的 JSONRenderer"""
+
+    def __init__(self):
+        self._default = self.encoder_class().default
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if (accepted_media_type and 'indent' in accepted_media_type) or (
+            renderer_context and renderer_context.get('indent') is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self._default, option=_ORJSON_OPTIONS)
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # 与 JSONRenderer 一样转义 U+2028 / U+2029，保证输出是合法的 JavaScript
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
@@ -0,0 +1,246 @@
+"""
+Write-ahead journal for the in-memory room backend.
+
+进程内存储后端（MemoryRoomBackend）的持久化：进程重启后恢复所有房间。
+
+- 房间变更时后端只调用 mark(room_id, room) 把房间登记为“脏”（一次加锁的字典赋值），不做任何 I/O
+- 后台线程每隔 flush_interval 取走全部脏房间，生成房间当前状态的完整记录，追加到日志文件后 fsync 一次（组提交）；
+  同一房间在一个周期内的多次变更只写一条记录
+- 每隔 snapshot_interval 写一次快照：先把脏房间写入当前日志并切换到新的日志文件，再逐个房间流式写入快照文件，
+  完成后原子替换旧快照并删除已包含在快照中的日志文件。写快照不持有日志写入锁，期间照常每隔 flush_interval
+  把脏房间写入新的日志文件
+- 启动时读取快照，再按顺序重放快照之后的日志文件
+
+日志记录和快照记录的都是写入时房间的最新状态。切换日志文件之后房间的每次变更都会在新日志中产生一条更晚的记录，
+因此快照中的房间即使比新日志中较早的记录新，也会被该房间在新日志中的最后一条记录覆盖，重放时按顺序覆盖即可。
+进程崩溃时最多丢失最近 flush_interval 内的变更；日志末尾不完整的记录会被跳过。
+
+文件（都在 directory 下）：
+- snapshot.jsonl            第一行为 {"journal": 序号}，之后每行一个房间
+- journal-{序号}.jsonl       每行一条记录：{"op": "put", "room": {...}} 或 {"op": "del", "room_id": ...}
+
+房间数据的结构由后端定义，其中的 format 字段为记录格式版本，旧版本的记录在恢复时由后端转换。
+"""
+import atexit
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger('app.api.services')
+
+_SEGMENT_PATTERN = re.compile(r'^journal-(\d+)\.jsonl$')
+
+
+def _dumps(data) -> str:
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+
+class RoomJournal:
+    """房间的预写日志和快照"""
+
+    def __init__(self, directory: str, flush_interval: float = 0.05, snapshot_interval: float = 300):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.snapshot_interval = snapshot_interval
+        os.makedirs(directory, exist_ok=True)
+        # 房间ID -> 房间状态对象（None 表示已删除），由后端在变更时登记
+        self._dirty: Dict[str, object] = {}
+        self._lock = threading.Lock()
+        # 串行化日志写入和日志文件切换（后台线程与 flush / close 的调用方之间）
+        self._write_lock = threading.Lock()
+        # 串行化快照文件的写入（写快照期间不持有 _write_lock）
+        self._snapshot_lock = threading.Lock()
+        self._segment = None
+        self._seq = 0
+        self._capture: Optional[Callable[[object], Optional[Dict]]] = None
+        self._iter_rooms: Optional[Callable[[], Iterable[object]]] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._stats = {
+            'commits': 0,
+            'records': 0,
+            'bytes': 0,
+            'snapshots': 0,
+            'last_snapshot_rooms': 0,
+            'last_snapshot_seconds': 0.0
+        }
+
+    @property
+    def _snapshot_path(self) -> str:
+        return os.path.join(self.directory, 'snapshot.jsonl')
+
+    def _segment_path(self, seq: int) -> str:
+        return os.path.join(self.directory, f'journal-{seq:08d}.jsonl')
+
+    def _segments(self) -> List[Tuple[int, str]]:
+        """按序号升序列出日志文件"""
+        found = []
+        for name in os.listdir(self.directory):
+            match = _SEGMENT_PATTERN.match(name)
+            if match:
+                found.append((int(match.group(1)), os.path.join(self.directory, name)))
+        return sorted(found)
+
+    @staticmethod
+    def _read_lines(path: str) -> Iterator[Dict]:
+        """逐行读取 JSON 记录，跳过无法解析的行（通常是崩溃时写了一半的最后一行）"""
+        with open(path, 'rb') as f:
+            for number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    logger.warning(f'跳过损坏的房间日志记录 - 文件: {path}, 行号: {number}')
+
+    def load(self) -> Iterator[Tuple[str, object]]:
+        """按顺序读取快照和之后的日志，产出 ('put', 房间数据) 或 ('del', 房间ID)"""
+        first_seq = 0
+        if os.path.exists(self._snapshot_path):
+            lines = self._read_lines(self._snapshot_path)
+            header = next(lines, None) or {}
+            first_seq = header.get('journal', 0)
+            for room in lines:
+                yield 'put', room
+        for seq, path in self._segments():
+            self._seq = max(self._seq, seq)
+            if seq < first_seq:
+                continue
+            for record in self._read_lines(path):
+                if record.get('op') == 'put':
+                    yield 'put', record['room']
+                elif record.get('op') == 'del':
+                    yield 'del', record['room_id']
+
+    def start(self, capture: Callable[[object], Optional[Dict]], iter_rooms: Callable[[], Iterable[object]]):
+        """开始记录并启动后台线程（应在 load 完成之后调用）
+
+        capture(room) 返回房间当前状态的记录，房间已不在后端中时返回 None；iter_rooms() 返回所有房间，用于快照。
+        """
+        self._capture = capture
+        self._iter_rooms = iter_rooms
+        with self._write_lock:
+            self._open_segment(self._seq + 1)
+        self._thread = threading.Thread(target=self._run, name='room-journal', daemon=True)
+        self._thread.start()
+        # 正常退出（如 gunicorn worker 收到 SIGTERM）时写入剩余的变更
+        atexit.register(self.close)
+
+    def mark(self, room_id: str, room: Optional[object]):
+        """登记房间已变更（room 为 None 表示已删除），在下一次组提交时写入"""
+        with self._lock:
+            self._dirty[room_id] = room
+
+    def _open_segment(self, seq: int):
+        if self._segment is not None:
+            self._segment.close()
+        self._seq = seq
+        self._segment = open(self._segment_path(seq), 'ab')
+
+    def _run(self):
+        next_snapshot = time.monotonic() + self.snapshot_interval
+        while not self._stopped.wait(self.flush_interval):
+            try:
+                if time.monotonic() >= next_snapshot:
+                    self.write_snapshot()
+                    next_snapshot = time.monotonic() + self.snapshot_interval
+                else:
+                    self.flush()
+            except Exception:
+                logger.exception('写入房间日志失败')
+
+    def flush(self):
+        """把所有脏房间写入当前日志文件并 fsync"""
+        with self._write_lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+        if not dirty:
+            return
+        lines = []
+        for room_id, room in dirty.items():
+            if room is None:
+                lines.append(_dumps({'op': 'del', 'room_id': room_id}))
+                continue
+            data = self._capture(room)
+            # 房间已被删除或替换时跳过，对应的删除记录会随后写入
+            if data is not None:
+                lines.append(_dumps({'op': 'put', 'room': data}))
+        if not lines:
+            return
+        payload = ('\n'.join(lines) + '\n').encode('utf-8')
+        self._segment.write(payload)
+        self._segment.flush()
+        os.fsync(self._segment.fileno())
+        self._stats['commits'] += 1
+        self._stats['records'] += len(lines)
+        self._stats['bytes'] += len(payload)
+
+    def write_snapshot(self):
+        """写入所有房间的快照，之后删除已包含在快照中的日志文件
+
+        只在切换日志文件时短暂持有 _write_lock；逐个房间写入快照期间每隔 flush_interval 组提交一次，
+        后台线程写快照时日志仍然按时落盘。
+        """
+        with self._snapshot_lock:
+            started = time.monotonic()
+            with self._write_lock:
+                self._flush_locked()
+                seq = self._seq + 1
+                self._open_segment(seq)
+                rooms_to_write = list(self._iter_rooms())
+
+            rooms = 0
+            next_flush = time.monotonic() + self.flush_interval
+            tmp_path = self._snapshot_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(_dumps({'journal': seq}) + '\n')
+                for room in rooms_to_write:
+                    data = self._capture(room)
+                    if data is not None:
+                        f.write(_dumps(data) + '\n')
+                        rooms += 1
+                    if time.monotonic() >= next_flush:
+                        self.flush()
+                        next_flush = time.monotonic() + self.flush_interval
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self._snapshot_path)
+            # 让替换操作本身也落盘
+            dir_fd = os.open(self.directory, os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+
+            for old_seq, path in self._segments():
+                if old_seq < seq:
+                    os.remove(path)
+            self._stats['snapshots'] += 1
+            self._stats['last_snapshot_rooms'] = rooms
+            self._stats['last_snapshot_seconds'] = round(time.monotonic() - started, 3)
+
+    def get_stats(self) -> Dict:
+        """获取组提交次数、写入的记录数和字节数，以及最近一次快照的房间数和耗时"""
+        stats = dict(self._stats)
+        stats['pending'] = len(self._dirty)
+        return stats
+
+    def close(self):
+        """停止后台线程并写入剩余的脏房间（可以重复调用）"""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+            atexit.unregister(self.close)
+        with self._write_lock:
+            if self._segment is not None:
+                self._flush_locked()
+                self._segment.close()
+                self._segment = None
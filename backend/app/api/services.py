@@ -1,62 +1,541 @@
 """
 Business logic services.
 """
+import asyncio
+import gc
+import heapq
 import uuid
 import json
+import logging
 import os
+import sqlite3
+import time
 from datetime import datetime
-from typing import Dict, List, Optional
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import threading
+import weakref
 
+try:
+    import httpx
+except ImportError:  # 只有 ASGI 部署的异步请求需要，未安装时在线程中执行同步请求
+    httpx = None
 
-class RoomService:
-    """房间管理服务（单例模式）"""
+from ..metrics import LOCK_BUCKETS, UPSTREAM_BUCKETS, Counter, Histogram
+from .match_cache import MatchDiskCache
+from .room_journal import RoomJournal
 
-    _instance = None
-    _lock = threading.Lock()
+logger = logging.getLogger('app.api.services')
 
-    def __new__(cls):
-        if cls._instance is None:
-            with cls._lock:
-                if cls._instance is None:
-                    cls._instance = super(RoomService, cls).__new__(cls)
-                    cls._instance._rooms: Dict[str, Dict] = {}
-                    cls._instance._room_lock = threading.Lock()
-        return cls._instance
+# /metrics 指标（lock：room 房间锁 / global 全局锁；result：ok / http_error / error）
+LOCK_WAIT = Histogram('mole_lock_wait_seconds', '获取房间存储锁的等待时间', ('lock',), LOCK_BUCKETS)
+LOCK_HOLD = Histogram('mole_lock_hold_seconds', '房间存储锁的持有时间', ('lock',), LOCK_BUCKETS)
+_VOTES = Counter('mole_votes_total', '成功提交的票数')
+_OPENDOTA_REQUESTS = Histogram(
+    'mole_opendota_request_duration_seconds', 'OpenDota 比赛数据请求的耗时（按结果）', ('result',), UPSTREAM_BUCKETS
+)
+_ROOM_LOCK = ('room',)
+_GLOBAL_LOCK = ('global',)
+
+
+# 候选人数：每场比赛失败方的玩家数
+PLAYER_COUNT = 5
+
+# 投票位图 -> 已投玩家序号（升序）和票数，位图只有 2 ** PLAYER_COUNT 种取值，预先计算后直接共享
+_MASK_PLAYERS = tuple(
+    tuple(index + 1 for index in range(PLAYER_COUNT) if mask & (1 << index)) for mask in range(1 << PLAYER_COUNT)
+)
+_MASK_COUNTS = tuple(mask.bit_count() for mask in range(1 << PLAYER_COUNT))
+
+
+def players_to_mask(players) -> int:
+    """已投玩家序号转换为投票位图"""
+    mask = 0
+    for player_index in players:
+        mask |= 1 << (player_index - 1)
+    return mask
+
+
+def ballot_mask(player_indices: Sequence[int]) -> int:
+    """校验一次提交的玩家序号并转换为投票位图（序号重复时位图的位数少于序号个数）
+
+    没有序号或序号超出范围时抛出 ValueError。
+    """
+    if not player_indices:
+        raise ValueError('至少需要投一票')
+    for player_index in player_indices:
+        if not 1 <= player_index <= PLAYER_COUNT:
+            raise ValueError(f'玩家序号必须在 1-{PLAYER_COUNT} 范围内')
+    return players_to_mask(player_indices)
+
+
+@dataclass(frozen=True, slots=True)
+class VoterState:
+    """投票用户状态（不可变，变更时整体替换，快照可以直接共享）
+
+    voted_mask 的第 i 位表示已投票给 i + 1 号玩家。
+    """
+    voted_mask: int = 0
+    username: Optional[str] = None
+    started: bool = False
+
+    @property
+    def voted_players(self) -> Tuple[int, ...]:
+        """已投玩家序号（升序）"""
+        return _MASK_PLAYERS[self.voted_mask]
+
+    @property
+    def vote_count(self) -> int:
+        return _MASK_COUNTS[self.voted_mask]
+
+    def has_voted(self, player_index: int) -> bool:
+        return bool(self.voted_mask & (1 << (player_index - 1)))
+
+
+def count_voters(voters: Iterable[VoterState], votes_per_user: int) -> Tuple[int, int]:
+    """统计已开始投票和已投完所有票的用户数（只在重建房间状态时使用，投票时增量维护）"""
+    started = completed = 0
+    for voter in voters:
+        started += voter.started
+        if voter.vote_count >= votes_per_user > 0:
+            completed += 1
+    return started, completed
+
+
+@dataclass(slots=True, eq=False)
+class RoomState:
+    """房间的内部状态，只能在持有房间锁时修改
+
+    snapshot 是当前已发布的只读快照；任何修改都会把它置为 None，
+    下一次读取时重新生成并发布，读者拿到的快照此后不会再变化。
+    """
+    room_id: str
+    room_password: str
+    match_id: int
+    max_votes: int
+    votes_per_user: int
+    creator_username: str
+    creator_fingerprint: str
+    heroes: List[Dict]
+    show_only_winner_votes: bool = True
+    status: str = 'init'
+    created_at: datetime = field(default_factory=datetime.now)
+    # 各玩家的得票数，下标为玩家序号 - 1
+    votes: List[int] = field(default_factory=lambda: [0] * PLAYER_COUNT)
+    voted_users: Dict[str, VoterState] = field(default_factory=dict)
+    # 已开始投票和已投完所有票的用户数，随投票增量维护，投票结束判断不需要遍历 voted_users
+    started_voters: int = 0
+    completed_voters: int = 0
+    player_order: Optional[Tuple[int, ...]] = None
+    order_generation_count: int = 0
+    # 每次状态变更递增，用于 ETag 和推送去重
+    version: int = 1
+    snapshot: Optional['RoomSnapshot'] = None
+    # 最近一次读写的时间戳（time.time()），用于闲置过期
+    last_active: float = field(default_factory=time.time)
+    # 该房间在过期堆中有效条目的截止时间，堆中截止时间不一致的条目视为已作废
+    expiry_deadline: float = 0.0
+
+
+@dataclass(frozen=True, slots=True)
+class RoomSnapshot:
+    """房间在某个版本的只读快照
+
+    由存储后端生成（内存后端在持有房间锁时生成），之后可以不加锁地被任意线程读取。
+    heroes 列表本身不会被修改（pending 房间获取到英雄后整体替换），因此直接共享房间中的列表。
+    derived 用于缓存由快照计算出的数据（如序列化后的接口响应），与快照同时失效；
+    多个线程同时计算时结果相同，后写入的覆盖先写入的即可，不需要加锁。
+    """
+    room_id: str
+    room_password: str
+    match_id: int
+    status: str
+    max_votes: int
+    votes_per_user: int
+    creator_username: str
+    creator_fingerprint: str
+    heroes: List[Dict]
+    show_only_winner_votes: bool
+    player_order: Optional[Tuple[int, ...]]
+    order_generation_count: int
+    created_at: datetime
+    version: int
+    votes: Mapping[str, int]
+    # 对外展示的票数：开启 show_only_winner_votes 时只包含得票最多的玩家
+    visible_votes: Mapping[str, int]
+    voted_users: Mapping[str, VoterState]
+    voted_usernames: Tuple[str, ...]
+    started_voters: int
+    completed_voters: int
+    derived: Dict[str, object] = field(default_factory=dict, compare=False, repr=False)
+
+    @property
+    def current_votes(self) -> int:
+        """已投票人数"""
+        return len(self.voted_users)
+
+    @classmethod
+    def from_state(cls, room: RoomState) -> 'RoomSnapshot':
+        """根据房间状态生成快照（调用方需持有房间锁）"""
+        votes = {str(index + 1): count for index, count in enumerate(room.votes) if count}
+        visible_votes = votes
+        if room.show_only_winner_votes and votes:
+            # 只展示内鬼（得票最多的玩家）的票数
+            max_count = max(votes.values())
+            visible_votes = {key: count for key, count in votes.items() if count == max_count}
+        voted_users = dict(room.voted_users)
+        voted_usernames = tuple([
+            voter.username for voter in voted_users.values() if voter.username
+        ])
+        return cls(
+            room_id=room.room_id,
+            room_password=room.room_password,
+            match_id=room.match_id,
+            status=room.status,
+            max_votes=room.max_votes,
+            votes_per_user=room.votes_per_user,
+            creator_username=room.creator_username,
+            creator_fingerprint=room.creator_fingerprint,
+            heroes=room.heroes,
+            show_only_winner_votes=room.show_only_winner_votes,
+            player_order=room.player_order,
+            order_generation_count=room.order_generation_count,
+            created_at=room.created_at,
+            version=room.version,
+            votes=MappingProxyType(votes),
+            visible_votes=MappingProxyType(visible_votes),
+            voted_users=MappingProxyType(voted_users),
+            voted_usernames=voted_usernames,
+            started_voters=room.started_voters,
+            completed_voters=room.completed_voters
+        )
+
+    def to_dict(self, user_fingerprint: str = None) -> Dict:
+        """转换为某个用户视角下的房间详情接口响应数据
+
+        finished 状态返回投票结果，其他状态返回用户投票信息；
+        快照本身不可变，元组字段直接放入结果（JSON 序列化时与列表相同），无需再复制。
+        """
+        data = {
+            'room_id': self.room_id,
+            'room_password': self.room_password,
+            'match_id': self.match_id,
+            'status': self.status,
+            'max_votes': self.max_votes,
+            'votes_per_user': self.votes_per_user,
+            'current_votes': len(self.voted_users),
+            'creator_username': self.creator_username,
+            'creator_fingerprint': self.creator_fingerprint,
+            'heroes': self.heroes,
+            'show_only_winner_votes': self.show_only_winner_votes,
+            'player_order': self.player_order,
+            'order_generation_count': self.order_generation_count
+        }
+        if self.status == 'finished':
+            data['votes'] = dict(self.visible_votes)
+        else:
+            if user_fingerprint:
+                voter = self.voted_users.get(user_fingerprint)
+                if voter is None:
+                    data['user_voted_players'] = ()
+                    data['user_started_voting'] = False
+                else:
+                    data['user_voted_players'] = voter.voted_players
+                    data['user_started_voting'] = voter.started
+            data['voted_usernames'] = self.voted_usernames
+        return data
+
+    def to_room_dict(self) -> Dict:
+        """转换为旧版 get_room / get_room_by_password 返回的房间字典"""
+        return {
+            'room_id': self.room_id,
+            'room_password': self.room_password,
+            'match_id': self.match_id,
+            'max_votes': self.max_votes,
+            'votes_per_user': self.votes_per_user,
+            'status': self.status,
+            'created_at': self.created_at,
+            'creator_username': self.creator_username,
+            'creator_fingerprint': self.creator_fingerprint,
+            'heroes': self.heroes,
+            'votes': dict(self.votes),
+            'voted_users': {
+                fingerprint: {
+                    'vote_count': voter.vote_count,
+                    'voted_players': list(voter.voted_players),
+                    'username': voter.username,
+                    'started': voter.started
+                }
+                for fingerprint, voter in self.voted_users.items()
+            },
+            'show_only_winner_votes': self.show_only_winner_votes,
+            'player_order': list(self.player_order) if self.player_order is not None else None,
+            'order_generation_count': self.order_generation_count,
+            'version': self.version,
+            'current_votes': len(self.voted_users),
+            'started_voters': self.started_voters,
+            'completed_voters': self.completed_voters
+        }
+
+
+# 投票失败原因对应的提示信息
+VOTE_ERROR_MESSAGES = {
+    'VOTING_NOT_STARTED': '请先点击开始投票',
+    'ALREADY_VOTED': '你已完成所有投票',
+    'DUPLICATE_VOTE': '不能重复投票给同一玩家',
+    'TOO_MANY_VOTES': '投票数超过剩余票数',
+    'ROOM_FULL': '房间投票人数已满'
+}
+
+
+# 创建房间失败原因对应的提示信息
+CREATE_ERROR_MESSAGES = {
+    'ROOM_ID_EXISTS': '房间ID冲突，请重试',
+    'ROOM_PASSWORD_EXISTS': '该房间密码已被使用，请更换房间密码'
+}
+
+
+class RoomCreateError(ValueError):
+    """房间ID或房间密码已被使用，code 为 CREATE_ERROR_MESSAGES 中的失败原因"""
+
+    def __init__(self, code: str):
+        super().__init__(CREATE_ERROR_MESSAGES[code])
+        self.code = code
+
+
+def vote_error(error: str) -> Dict:
+    """投票失败的返回结果"""
+    return {
+        'success': False,
+        'error': error,
+        'message': VOTE_ERROR_MESSAGES[error]
+    }
+
+
+def vote_result(
+    finished: bool,
+    current_votes: int,
+    max_votes: int,
+    user_voted_players: List[int],
+    user_remaining_votes: int
+) -> Dict:
+    """投票成功的返回结果"""
+    message = '投票成功'
+    if finished:
+        message = '投票成功，投票已结束'
+    elif user_remaining_votes > 0:
+        message = f'投票成功，还需投 {user_remaining_votes} 票'
+
+    return {
+        'success': True,
+        'message': message,
+        'finished': finished,
+        'current_votes': current_votes,
+        'max_votes': max_votes,
+        'user_voted_players': user_voted_players,
+        'user_remaining_votes': user_remaining_votes
+    }
+
+
+@contextmanager
+def timed_lock(lock, labels: tuple):
+    """持有 lock，并记录等待时间和持有时间（LOCK_WAIT / LOCK_HOLD）"""
+    start = time.perf_counter()
+    with lock:
+        acquired = time.perf_counter()
+        LOCK_WAIT.observe(acquired - start, labels)
+        try:
+            yield
+        finally:
+            LOCK_HOLD.observe(time.perf_counter() - acquired, labels)
+
+
+def _wake(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class AsyncRoomWaiters:
+    """在事件循环中等待房间变化的协程（ASGI 部署），等待期间不占用线程
+
+    后端在房间状态变更时（可能在任意线程）调用 notify，通过 call_soon_threadsafe 唤醒对应事件循环中的等待者。
+    等待者先登记再检查版本号，两者之间发生的变更不会漏掉。
+    后端无法主动通知时传入 poll_version：每个事件循环只有一个后台任务，每隔 poll_interval
+    读取一次被等待房间的版本号，变化时再唤醒，读取次数与等待者数量无关。
+    blocking 为 True 时（读取版本号需要网络往返或跨进程加锁）在线程池中读取，不阻塞事件循环。
+    """
+
+    def __init__(self, poll_version=None, poll_interval: float = 0.05, blocking: bool = False):
+        self._lock = threading.Lock()
+        # 房间ID -> {(事件循环, future)}
+        self._waiters: Dict[str, set] = {}
+        self._poll_version = poll_version
+        self._poll_interval = poll_interval
+        self._blocking = blocking
+        self._pollers: set = set()
+
+    async def _call(self, func, *args):
+        if self._blocking:
+            return await asyncio.to_thread(func, *args)
+        return func(*args)
+
+    def notify(self, room_id: str):
+        """唤醒等待该房间的所有协程"""
+        # 没有等待者时不加锁，不影响同步部署的写入性能
+        if room_id not in self._waiters:
+            return
+        with self._lock:
+            waiters = self._waiters.pop(room_id, ())
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_wake, future)
+
+    async def wait_for_version(self, room_id: str, since: int, timeout: float, get_version) -> Optional[int]:
+        """等待 get_version(room_id) 超过 since，或超时；语义与 RoomBackend.wait_for_version 相同"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            entry = (loop, loop.create_future())
+            with self._lock:
+                self._waiters.setdefault(room_id, set()).add(entry)
+                if self._poll_version is not None and loop not in self._pollers:
+                    self._pollers.add(loop)
+                    loop.create_task(self._poll(loop))
+            try:
+                version = await self._call(get_version, room_id)
+                remaining = deadline - loop.time()
+                if version is None or version > since or remaining <= 0:
+                    return version
+                try:
+                    await asyncio.wait_for(entry[1], remaining)
+                except asyncio.TimeoutError:
+                    return await self._call(get_version, room_id)
+            finally:
+                with self._lock:
+                    waiters = self._waiters.get(room_id)
+                    if waiters is not None:
+                        waiters.discard(entry)
+                        if not waiters:
+                            del self._waiters[room_id]
+
+    async def _poll(self, loop: asyncio.AbstractEventLoop):
+        """定期检查本事件循环中被等待房间的版本号，没有等待者时退出"""
+        versions: Dict[str, Optional[int]] = {}
+        while True:
+            await asyncio.sleep(self._poll_interval)
+            with self._lock:
+                room_ids = [
+                    room_id for room_id, waiters in self._waiters.items()
+                    if any(waiter[0] is loop for waiter in waiters)
+                ]
+                if not room_ids:
+                    self._pollers.discard(loop)
+                    return
+            # 一次读取所有被等待房间的版本号（blocking 时只切换一次线程）
+            current = await self._call(lambda: {room_id: self._poll_version(room_id) for room_id in room_ids})
+            for room_id, version in current.items():
+                if room_id in versions and versions[room_id] != version:
+                    self.notify(room_id)
+            versions = current
+
+
+class RoomBackend:
+    """房间存储后端接口
+
+    RoomService 的房间读写全部委托给存储后端。后端需要保证每个修改操作的检查和写入是原子的
+    （例如 vote 对投票次数、重复投票的检查），读取时返回 RoomSnapshot。
+    房间不存在时：读取返回 None / False，start_voting / start_user_voting / vote 抛出 KeyError，
+    reset_voting / generate_player_order 返回 ROOM_NOT_FOUND 错误。
+
+    create_room 的 heroes 为 None 时房间处于 pending 状态（比赛数据在后台获取中），
+    之后由 complete_room 写入英雄并进入 init 状态，或由 fail_room 标记为 failed（按已结束房间的保留时间过期）。
+    """
+
+    # 后端名称，用于统计信息
+    name = ''
+    # 读写是否会阻塞（网络往返、跨进程文件锁）；为 True 时异步视图在线程池中调用，见 RoomService.run_async
+    blocking = False
+
+    # 房间过期配置（秒），可通过 configure_expiry 修改
+    # 闲置房间（无任何读写）的保留时间
+    idle_ttl = 2 * 60 * 60
+    # 投票已结束的房间在最后一次读写后的保留时间
+    finished_ttl = 30 * 60
+    # 房间自创建起的最长保留时间
+    max_age = 24 * 60 * 60
+    # 同时保留的最大房间数
+    max_rooms = 10000
+
+    def configure_expiry(
+        self,
+        idle_ttl: float = None,
+        finished_ttl: float = None,
+        max_age: float = None,
+        max_rooms: int = None
+    ):
+        """修改房间过期配置，未提供的参数保持不变"""
+        if idle_ttl is not None:
+            self.idle_ttl = idle_ttl
+        if finished_ttl is not None:
+            self.finished_ttl = finished_ttl
+        if max_age is not None:
+            self.max_age = max_age
+        if max_rooms is not None:
+            self.max_rooms = max_rooms
+
+    def sweep_expired_rooms(self) -> int:
+        """淘汰所有已过期的房间，返回淘汰数量"""
+        raise NotImplementedError
+
+    def get_stats(self) -> Dict:
+        """获取房间数量和按原因统计的淘汰次数"""
+        raise NotImplementedError
+
+    def get_voter_stats(self) -> Optional[Dict]:
+        """所有房间中已开始投票（started）和已投完（completed）的用户数，需要遍历房间；不支持时返回 None"""
+        return None
+
+    def find_room(self, room_id: str) -> Optional[RoomSnapshot]:
+        """通过房间ID获取房间快照，不计入房间活动"""
+        raise NotImplementedError
+
+    def get_room_version(self, room_id: str) -> Optional[int]:
+        """获取房间当前版本号，不计入房间活动；房间不存在时返回 None"""
+        raise NotImplementedError
+
+    def wait_for_version(self, room_id: str, since: int, timeout: float) -> Optional[int]:
+        """阻塞等待房间版本号超过 since，或超时；返回等待结束时的版本号，房间不存在或被删除时返回 None"""
+        raise NotImplementedError
+
+    async def wait_for_version_async(self, room_id: str, since: int, timeout: float) -> Optional[int]:
+        """wait_for_version 的异步版本，等待期间不占用线程（通常借助 AsyncRoomWaiters 实现）"""
+        raise NotImplementedError
 
     def room_exists(self, room_id: str) -> bool:
         """检查房间是否存在"""
-        with self._room_lock:
-            return room_id in self._rooms
+        raise NotImplementedError
 
     def room_exists_by_password(self, room_password: str) -> bool:
         """通过密码检查房间是否存在"""
-        with self._room_lock:
-            for room in self._rooms.values():
-                if room.get('room_password') == room_password:
-                    return True
-            return False
+        raise NotImplementedError
 
-    def get_room_by_password(self, room_password: str) -> Optional[Dict]:
-        """通过密码获取房间信息"""
-        with self._room_lock:
-            for room in self._rooms.values():
-                if room.get('room_password') == room_password:
-                    room_copy = room.copy()
-                    # 确保 voted_users 字段存在
-                    if 'voted_users' not in room_copy:
-                        room_copy['voted_users'] = {}
-                    room_copy['current_votes'] = len(room_copy.get('voted_users', {}))
-                    return room_copy
-            return None
+    def get_room_snapshot(self, room_password: str) -> Optional[RoomSnapshot]:
+        """通过密码获取房间快照，并计入房间活动"""
+        raise NotImplementedError
+
+    def get_room_version_by_password(self, room_password: str) -> Optional[Tuple[str, int]]:
+        """通过密码获取房间ID和当前版本号，并计入房间活动"""
+        raise NotImplementedError
 
     def get_room_status(self, room_id: str) -> Optional[str]:
         """获取房间状态"""
-        with self._room_lock:
-            if room_id not in self._rooms:
-                return None
-            return self._rooms[room_id]['status']
+        raise NotImplementedError
 
     def create_room(
         self,
@@ -67,197 +546,638 @@ class RoomService:
         votes_per_user: int,
         creator_username: str,
         creator_fingerprint: str,
-        heroes: List[Dict],
+        heroes: Optional[List[Dict]],
         show_only_winner_votes: bool = True
-    ) -> Dict:
-        """创建房间"""
-        with self._room_lock:
-            room = {
-                'room_id': room_id,
-                'room_password': room_password,
-                'match_id': match_id,
-                'max_votes': max_votes,
-                'votes_per_user': votes_per_user,
-                'status': 'init',
-                'created_at': datetime.now(),
-                'creator_username': creator_username,
-                'creator_fingerprint': creator_fingerprint,
-                'heroes': heroes,
-                'votes': {},
-                'voted_users': {},
-                'show_only_winner_votes': show_only_winner_votes,
-                'player_order': None,
-                'order_generation_count': 0
-            }
-            self._rooms[room_id] = room
-            return room
+    ) -> RoomSnapshot:
+        """创建房间，返回房间快照；heroes 为 None 时创建 pending 房间
 
-    def get_room(self, room_id: str) -> Dict:
-        """获取房间信息"""
-        with self._room_lock:
-            if room_id not in self._rooms:
-                raise KeyError(f'房间不存在: {room_id}')
-            room = self._rooms[room_id].copy()
-            # 确保 voted_users 字段存在
-            if 'voted_users' not in room:
-                room['voted_users'] = {}
-            room['current_votes'] = len(room.get('voted_users', {}))
-            return room
+        房间ID或房间密码已被使用时抛出 RoomCreateError。
+        """
+        raise NotImplementedError
+
+    def check_room_limits(
+        self,
+        room_password: str,
+        max_votes: int,
+        creator_fingerprint: str,
+        heroes: Optional[List[Dict]]
+    ) -> Optional[str]:
+        """检查房间参数是否超出后端的存储上限，超出时返回提示信息（默认没有上限）"""
+        return None
+
+    def complete_room(self, room_id: str, heroes: List[Dict]) -> bool:
+        """写入 pending 房间的英雄列表并进入 init 状态，房间不存在或不是 pending 状态时返回 False"""
+        raise NotImplementedError
+
+    def fail_room(self, room_id: str) -> bool:
+        """把 pending 房间标记为 failed，房间不存在或不是 pending 状态时返回 False"""
+        raise NotImplementedError
+
+    def delete_room(self, room_id: str) -> bool:
+        """删除房间"""
+        raise NotImplementedError
 
     def start_voting(self, room_id: str):
-        """开始投票（房间级别，已废弃，保留用于兼容）"""
-        with self._room_lock:
-            self._rooms[room_id]['status'] = 'voting'
+        """开始投票（房间级别）"""
+        raise NotImplementedError
 
     def start_user_voting(self, room_id: str, user_fingerprint: str):
-        """用户开始投票（用户级别）"""
-        with self._room_lock:
-            room = self._rooms[room_id]
-            if 'voted_users' not in room:
-                room['voted_users'] = {}
-            if user_fingerprint not in room['voted_users']:
-                room['voted_users'][user_fingerprint] = {
-                    'vote_count': 0,
-                    'voted_players': [],
-                    'started': True
-                }
-            else:
-                room['voted_users'][user_fingerprint]['started'] = True
-
-    def has_user_started_voting(self, room_id: str, user_fingerprint: str) -> bool:
-        """检查用户是否已开始投票"""
-        with self._room_lock:
-            if room_id not in self._rooms:
-                return False
-            room = self._rooms[room_id]
-            if 'voted_users' not in room:
-                return False
-            if user_fingerprint not in room['voted_users']:
-                return False
-            return room['voted_users'][user_fingerprint].get('started', False)
+        """用户开始投票"""
+        raise NotImplementedError
 
     def vote(self, room_id: str, user_fingerprint: str, player_index: int, username: str = None) -> Dict:
-        """提交投票"""
-        with self._room_lock:
-            room = self._rooms[room_id]
-
-            if user_fingerprint not in room['voted_users']:
-                room['voted_users'][user_fingerprint] = {
-                    'vote_count': 0,
-                    'voted_players': [],
-                    'username': username,
-                    'started': False
-                }
-            elif username and not room['voted_users'][user_fingerprint].get('username'):
-                room['voted_users'][user_fingerprint]['username'] = username
+        """提交投票，返回 vote_result / vote_error 的结果"""
+        return self.vote_many(room_id, user_fingerprint, (player_index,), username)
 
-            # 检查用户是否已开始投票
-            if not room['voted_users'][user_fingerprint].get('started', False):
-                return {
-                    'success': False,
-                    'error': 'VOTING_NOT_STARTED',
-                    'message': '请先点击开始投票'
-                }
+    def vote_many(
+        self,
+        room_id: str,
+        user_fingerprint: str,
+        player_indices: Sequence[int],
+        username: str = None
+    ) -> Dict:
+        """一次提交多票：全部通过检查后一起写入，任何一票不合法时都不写入，返回结果与 vote 相同"""
+        raise NotImplementedError
 
-            user_vote_info = room['voted_users'][user_fingerprint]
+    def reset_voting(self, room_id: str, creator_fingerprint: str) -> Dict:
+        """重置投票状态（只有房主可以操作）"""
+        raise NotImplementedError
 
-            if user_vote_info['vote_count'] >= room['votes_per_user']:
-                return {
-                    'success': False,
-                    'error': 'ALREADY_VOTED',
-                    'message': '你已完成所有投票'
-                }
+    def generate_player_order(self, room_id: str, creator_fingerprint: str) -> Dict:
+        """生成随机玩家排序（只有房主可以操作）"""
+        raise NotImplementedError
 
-            if player_index in user_vote_info['voted_players']:
-                return {
-                    'success': False,
-                    'error': 'DUPLICATE_VOTE',
-                    'message': '不能重复投票给同一玩家'
-                }
 
-            player_key = str(player_index)
-            if player_key not in room['votes']:
-                room['votes'][player_key] = 0
+# MemoryRoomBackend 写入日志和快照的房间记录格式，记录结构变化时递增，并在 _upgrade_journal_record 中转换旧格式
+JOURNAL_RECORD_FORMAT = 2
 
-            room['votes'][player_key] += 1
-            user_vote_info['vote_count'] += 1
-            user_vote_info['voted_players'].append(player_index)
 
-            current_votes = len(room['voted_users'])
-            # 判断投票是否结束：需要同时满足两个条件
-            # 1. 已投票用户数达到最大投票人数
-            # 2. 所有已投票的用户都完成了他们的所有投票
-            finished = False
-            if current_votes >= room['max_votes']:
-                # 检查所有已投票的用户是否都完成了所有投票
-                all_users_completed = True
-                for user_info in room['voted_users'].values():
-                    if user_info['vote_count'] < room['votes_per_user']:
-                        all_users_completed = False
-                        break
-                finished = all_users_completed
+class MemoryRoomBackend(RoomBackend):
+    """进程内存储后端（默认）
 
-            if finished:
-                room['status'] = 'finished'
+    房间只保存在当前进程中，多个 worker 之间不共享，多进程部署请使用 SharedMemoryRoomBackend 或 RedisRoomBackend。
 
-            user_remaining_votes = room['votes_per_user'] - user_vote_info['vote_count']
+    锁的划分：
+    - _room_lock：全局锁，只在房间增删（修改 _rooms / _password_index / _room_locks）时持有
+    - _room_locks[room_id]：房间锁，保护单个房间内部状态的修改，不同房间之间互不阻塞；
+      它是一个 Condition，等待房间变化（长轮询、SSE 推送）时也使用它
 
-            message = '投票成功'
-            if finished:
-                message = '投票成功，投票已结束'
-            elif user_remaining_votes > 0:
-                message = f'投票成功，还需投 {user_remaining_votes} 票'
+    读取房间时返回已发布的 RoomSnapshot，不加锁也不复制。
+
+    房间过期：每个房间在 _expiry_heap 中有一个 (截止时间, 房间ID) 条目，后台清理线程只弹出已到期的条目，
+    弹出时再根据最近活动时间重新计算截止时间，尚未到期的重新入堆；房间数达到上限时淘汰最接近过期的房间。
+    _expiry_lock 只保护过期堆和淘汰计数，持有它时不会再去获取其他锁。
+
+    持久化（可选）：传入 RoomJournal 时，启动时从快照和日志恢复房间；之后每次变更只把房间登记到日志的脏集合，
+    由日志的后台线程批量写盘，请求本身不做 I/O。
+    """
+
+    name = 'memory'
+
+    def __init__(self, journal: Optional[RoomJournal] = None):
+        self._rooms: Dict[str, RoomState] = {}
+        # 房间密码 -> 房间ID 的索引，保证按密码查找为 O(1)
+        self._password_index: Dict[str, str] = {}
+        self._room_locks: Dict[str, threading.Condition] = {}
+        self._room_lock = threading.Lock()
+        self._expiry_heap: List[Tuple[float, str]] = []
+        self._expiry_lock = threading.Lock()
+        # 异步等待房间变化的协程，房间变更时与 Condition 一起唤醒
+        self._async_waiters = AsyncRoomWaiters()
+        self._eviction_counts: Dict[str, int] = {
+            'idle': 0,
+            'finished': 0,
+            'max_age': 0,
+            'capacity': 0
+        }
+        self._journal = journal
+        if journal is not None:
+            self._recover()
+            journal.start(self._journal_record, lambda: list(self._rooms.values()))
+
+    def _recover(self):
+        """从日志恢复房间（只在启动时调用，此时还没有其他线程访问后端）
 
+        恢复时一次性创建大量长期存在的对象，期间暂停循环垃圾回收，避免反复扫描已恢复的房间。
+        """
+        start = time.monotonic()
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            rooms = self._load_journal()
+        finally:
+            if gc_enabled:
+                gc.enable()
+        if rooms:
+            logger.info(f'已从日志恢复房间 - 数量: {rooms}, 耗时: {time.monotonic() - start:.2f}秒')
+
+    def _load_journal(self) -> int:
+        """按顺序重放快照和日志，重建房间和索引，返回恢复的房间数"""
+        records: Dict[str, Dict] = {}
+        for op, data in self._journal.load():
+            if op == 'put':
+                records[data['room_id']] = data
+            else:
+                records.pop(data, None)
+        rooms = 0
+        for data in records.values():
+            try:
+                data = self._upgrade_journal_record(data)
+                voted_users = {
+                    fingerprint: VoterState(voted_mask, username, started)
+                    for fingerprint, (voted_mask, username, started) in data['voted_users'].items()
+                }
+            except (KeyError, TypeError, ValueError) as exc:
+                logger.warning(f'跳过无法识别的房间日志记录 - 房间ID: {data.get("room_id")}, 原因: {exc}')
+                continue
+            started_voters, completed_voters = count_voters(voted_users.values(), data['votes_per_user'])
+            room = RoomState(
+                room_id=data['room_id'],
+                room_password=data['room_password'],
+                match_id=data['match_id'],
+                max_votes=data['max_votes'],
+                votes_per_user=data['votes_per_user'],
+                creator_username=data['creator_username'],
+                creator_fingerprint=data['creator_fingerprint'],
+                heroes=data['heroes'],
+                show_only_winner_votes=data['show_only_winner_votes'],
+                status=data['status'],
+                created_at=datetime.fromtimestamp(data['created_at']),
+                votes=data['votes'],
+                voted_users=voted_users,
+                started_voters=started_voters,
+                completed_voters=completed_voters,
+                player_order=tuple(data['player_order']) if data['player_order'] is not None else None,
+                order_generation_count=data['order_generation_count'],
+                version=data['version'],
+                last_active=data['last_active']
+            )
+            self._rooms[room.room_id] = room
+            self._password_index[room.room_password] = room.room_id
+            self._room_locks[room.room_id] = threading.Condition(threading.Lock())
+            self._schedule_expiry(room, self._expiry_deadline(room))
+            rooms += 1
+        return rooms
+
+    @staticmethod
+    def _upgrade_journal_record(data: Dict) -> Dict:
+        """把旧版本的房间日志记录转换为当前格式（JOURNAL_RECORD_FORMAT），无法识别时抛出 ValueError
+
+        格式 1（没有 format 字段）：votes 为 {"玩家序号": 票数}，voted_users 中为已投玩家序号列表；
+        格式 2：votes 为按玩家序号排列的票数列表，voted_users 中为投票位图。
+        """
+        record_format = data.get('format', 1)
+        if record_format == JOURNAL_RECORD_FORMAT:
+            return data
+        if record_format != 1:
+            raise ValueError(f'不支持的记录格式 {record_format}')
+        votes = data['votes']
+        return {
+            **data,
+            'format': JOURNAL_RECORD_FORMAT,
+            'votes': [votes.get(str(index + 1), 0) for index in range(PLAYER_COUNT)],
+            'voted_users': {
+                fingerprint: [players_to_mask(voted_players), username, started]
+                for fingerprint, (voted_players, username, started) in data['voted_users'].items()
+            }
+        }
+
+    def _journal_record(self, room: RoomState) -> Optional[Dict]:
+        """生成房间当前状态的日志记录，房间已被删除或替换时返回 None（由日志的后台线程调用）"""
+        with self._locked_room(room.room_id) as current:
+            if current is not room:
+                return None
             return {
-                'success': True,
-                'message': message,
-                'finished': finished,
-                'current_votes': current_votes,
-                'max_votes': room['max_votes'],
-                'user_voted_players': user_vote_info['voted_players'].copy(),
-                'user_remaining_votes': user_remaining_votes
+                'format': JOURNAL_RECORD_FORMAT,
+                'room_id': room.room_id,
+                'room_password': room.room_password,
+                'match_id': room.match_id,
+                'max_votes': room.max_votes,
+                'votes_per_user': room.votes_per_user,
+                'creator_username': room.creator_username,
+                'creator_fingerprint': room.creator_fingerprint,
+                'heroes': room.heroes,
+                'show_only_winner_votes': room.show_only_winner_votes,
+                'status': room.status,
+                'created_at': room.created_at.timestamp(),
+                'votes': list(room.votes),
+                'voted_users': {
+                    fingerprint: [voter.voted_mask, voter.username, voter.started]
+                    for fingerprint, voter in room.voted_users.items()
+                },
+                'player_order': room.player_order,
+                'order_generation_count': room.order_generation_count,
+                'version': room.version,
+                'last_active': room.last_active
             }
 
-    def get_user_voted_players(self, room_id: str, user_fingerprint: str) -> Optional[List[int]]:
-        """获取用户已投票的玩家列表"""
-        with self._room_lock:
-            if room_id not in self._rooms:
+    def _expiry_deadline(self, room: RoomState) -> float:
+        """计算房间的过期时间戳：闲置 / 结束后的保留时间与最长保留时间取较早者"""
+        ttl = self.finished_ttl if room.status in ('finished', 'failed') else self.idle_ttl
+        return min(room.last_active + ttl, room.created_at.timestamp() + self.max_age)
+
+    def _schedule_expiry(self, room: RoomState, deadline: float):
+        """为房间登记新的过期堆条目，旧条目随之作废"""
+        with self._expiry_lock:
+            room.expiry_deadline = deadline
+            heapq.heappush(self._expiry_heap, (deadline, room.room_id))
+
+    def _evict(self, room: RoomState, reason: str) -> bool:
+        """淘汰房间并计数"""
+        if self._rooms.get(room.room_id) is not room or not self.delete_room(room.room_id):
+            return False
+        self._record_eviction(room, reason)
+        return True
+
+    def _record_eviction(self, room: RoomState, reason: str):
+        with self._expiry_lock:
+            self._eviction_counts[reason] += 1
+        logger.info(f'房间已淘汰 - 房间ID: {room.room_id}, 原因: {reason}')
+
+    def _pop_expiry(self, now: float = None) -> Optional[RoomState]:
+        """弹出下一个需要淘汰的房间
+
+        now 为 None 时忽略截止时间，直接返回最接近过期的房间（用于容量淘汰）；
+        否则只返回已到期的房间，没有时返回 None。
+        """
+        while True:
+            with self._expiry_lock:
+                if not self._expiry_heap:
+                    return None
+                deadline, room_id = self._expiry_heap[0]
+                if now is not None and deadline > now:
+                    return None
+                heapq.heappop(self._expiry_heap)
+                room = self._rooms.get(room_id)
+                if room is None or room.expiry_deadline != deadline:
+                    # 房间已删除，或该条目已被更新的条目取代
+                    continue
+                actual_deadline = self._expiry_deadline(room)
+                if actual_deadline > deadline:
+                    # 房间在入堆后有过活动，按新的截止时间重新入堆后继续比较
+                    room.expiry_deadline = actual_deadline
+                    heapq.heappush(self._expiry_heap, (actual_deadline, room_id))
+                    continue
+                return room
+
+    def _expiry_reason(self, room: RoomState, now: float) -> str:
+        if room.created_at.timestamp() + self.max_age <= now:
+            return 'max_age'
+        if room.status in ('finished', 'failed'):
+            return 'finished'
+        return 'idle'
+
+    def sweep_expired_rooms(self) -> int:
+        now = time.time()
+        evicted = 0
+        while True:
+            room = self._pop_expiry(now)
+            if room is None:
+                return evicted
+            if self._evict(room, self._expiry_reason(room, now)):
+                evicted += 1
+
+    def get_stats(self) -> Dict:
+        with self._expiry_lock:
+            evictions = dict(self._eviction_counts)
+        stats = {
+            'rooms': len(self._rooms),
+            'max_rooms': self.max_rooms,
+            'evictions': evictions
+        }
+        if self._journal is not None:
+            stats['journal'] = self._journal.get_stats()
+        return stats
+
+    def get_voter_stats(self) -> Optional[Dict]:
+        started = completed = 0
+        for room in list(self._rooms.values()):
+            started += room.started_voters
+            completed += room.completed_voters
+        return {'started': started, 'completed': completed}
+
+    @contextmanager
+    def _locked_room(self, room_id: str):
+        """持有房间锁并返回房间状态，房间不存在时返回 None
+
+        字典的单次读取是原子的，因此查找锁时不需要全局锁；
+        拿到房间锁后再重新读取房间，以防在等待期间房间已被删除。
+        """
+        room_lock = self._room_locks.get(room_id)
+        if room_lock is None:
+            yield None
+            return
+        start = time.perf_counter()
+        with room_lock:
+            acquired = time.perf_counter()
+            LOCK_WAIT.observe(acquired - start, _ROOM_LOCK)
+            try:
+                yield self._rooms.get(room_id)
+            finally:
+                LOCK_HOLD.observe(time.perf_counter() - acquired, _ROOM_LOCK)
+
+    def _bump_version(self, room: RoomState):
+        """房间状态变更后递增版本号、作废已发布的快照并唤醒等待者（调用方需持有房间锁）"""
+        room.version += 1
+        room.snapshot = None
+        room.last_active = time.time()
+        self._room_locks[room.room_id].notify_all()
+        self._async_waiters.notify(room.room_id)
+        if self._journal is not None:
+            self._journal.mark(room.room_id, room)
+
+    def _snapshot(self, room: RoomState) -> RoomSnapshot:
+        """获取房间当前的快照
+
+        快照有效时直接返回；已被修改作废时，持有房间锁重新生成并发布。
+        房间已被删除（锁不存在）时状态不会再变化，直接生成即可。
+        """
+        snapshot = room.snapshot
+        if snapshot is not None:
+            return snapshot
+        room_lock = self._room_locks.get(room.room_id)
+        with room_lock if room_lock is not None else nullcontext():
+            snapshot = room.snapshot
+            if snapshot is None:
+                snapshot = RoomSnapshot.from_state(room)
+                room.snapshot = snapshot
+            return snapshot
+
+    def find_room(self, room_id: str) -> Optional[RoomSnapshot]:
+        room = self._rooms.get(room_id)
+        if room is None:
+            return None
+        return self._snapshot(room)
+
+    def get_room_version(self, room_id: str) -> Optional[int]:
+        room = self._rooms.get(room_id)
+        return room.version if room is not None else None
+
+    def wait_for_version(self, room_id: str, since: int, timeout: float) -> Optional[int]:
+        """阻塞等待房间版本号超过 since，或超时
+
+        返回等待结束时的版本号（超时则可能仍等于 since），房间不存在或在等待期间被删除时返回 None。
+        """
+        room_lock = self._room_locks.get(room_id)
+        if room_lock is None:
+            return None
+        with room_lock:
+            room = self._rooms.get(room_id)
+            if room is None:
+                return None
+            room_lock.wait_for(
+                lambda: self._rooms.get(room_id) is not room or room.version > since,
+                timeout
+            )
+            if self._rooms.get(room_id) is not room:
                 return None
+            return room.version
 
-            room = self._rooms[room_id]
-            if user_fingerprint not in room['voted_users']:
-                return []
+    async def wait_for_version_async(self, room_id: str, since: int, timeout: float) -> Optional[int]:
+        return await self._async_waiters.wait_for_version(room_id, since, timeout, self.get_room_version)
 
-            return room['voted_users'][user_fingerprint]['voted_players'].copy()
+    def room_exists(self, room_id: str) -> bool:
+        """检查房间是否存在"""
+        return room_id in self._rooms
 
-    def get_voted_usernames(self, room_id: str) -> List[str]:
-        """获取已投票用户的用户名列表"""
-        with self._room_lock:
-            if room_id not in self._rooms:
-                return []
-
-            room = self._rooms[room_id]
-            usernames = []
-            for user_info in room['voted_users'].values():
-                username = user_info.get('username')
-                if username:
-                    usernames.append(username)
-            return usernames
+    def room_exists_by_password(self, room_password: str) -> bool:
+        """通过密码检查房间是否存在"""
+        room_id = self._password_index.get(room_password)
+        return room_id is not None and room_id in self._rooms
+
+    def get_room_snapshot(self, room_password: str) -> Optional[RoomSnapshot]:
+        """通过密码获取房间快照，房间不存在时返回 None"""
+        room_id = self._password_index.get(room_password)
+        if room_id is None:
+            return None
+        room = self._rooms.get(room_id)
+        if room is None or room.room_password != room_password:
+            return None
+        room.last_active = time.time()
+        return self._snapshot(room)
+
+    def get_room_version_by_password(self, room_password: str) -> Optional[Tuple[str, int]]:
+        """通过密码获取房间ID和当前版本号，房间不存在时返回 None
+
+        版本号是单个整数，读取本身是原子的，因此不需要持有房间锁。
+        """
+        room_id = self._password_index.get(room_password)
+        if room_id is None:
+            return None
+        room = self._rooms.get(room_id)
+        if room is None:
+            return None
+        room.last_active = time.time()
+        return room_id, room.version
+
+    def get_room_status(self, room_id: str) -> Optional[str]:
+        """获取房间状态"""
+        room = self._rooms.get(room_id)
+        if room is None:
+            return None
+        return room.status
+
+    def create_room(
+        self,
+        room_id: str,
+        room_password: str,
+        match_id: int,
+        max_votes: int,
+        votes_per_user: int,
+        creator_username: str,
+        creator_fingerprint: str,
+        heroes: Optional[List[Dict]],
+        show_only_winner_votes: bool = True
+    ) -> RoomSnapshot:
+        """创建房间，返回房间快照；heroes 为 None 时创建 pending 房间"""
+        room = RoomState(
+            room_id=room_id,
+            room_password=room_password,
+            match_id=match_id,
+            max_votes=max_votes,
+            votes_per_user=votes_per_user,
+            creator_username=creator_username,
+            creator_fingerprint=creator_fingerprint,
+            heroes=heroes if heroes is not None else [],
+            show_only_winner_votes=show_only_winner_votes,
+            status='init' if heroes is not None else 'pending'
+        )
+        room.snapshot = RoomSnapshot.from_state(room)
+        evicted = []
+        with timed_lock(self._room_lock, _GLOBAL_LOCK):
+            if room_id in self._rooms:
+                raise RoomCreateError('ROOM_ID_EXISTS')
+            if room_password in self._password_index:
+                raise RoomCreateError('ROOM_PASSWORD_EXISTS')
+            # 房间数达到上限时，先淘汰最接近过期的房间；检查、淘汰和写入在同一次全局锁内完成，
+            # 并发创建不会超过 max_rooms
+            while len(self._rooms) >= self.max_rooms:
+                oldest = self._pop_expiry()
+                if oldest is None:
+                    break
+                if self._rooms.get(oldest.room_id) is oldest and self._remove_locked(oldest.room_id):
+                    evicted.append(oldest)
+            room_lock = self._room_locks.get(room_id)
+            if room_lock is None:
+                room_lock = threading.Condition(threading.Lock())
+                self._room_locks[room_id] = room_lock
+            with room_lock:
+                self._rooms[room_id] = room
+                self._password_index[room_password] = room_id
+                if self._journal is not None:
+                    self._journal.mark(room_id, room)
+        for oldest in evicted:
+            self._record_eviction(oldest, 'capacity')
+            self._async_waiters.notify(oldest.room_id)
+        self._async_waiters.notify(room_id)
+        self._schedule_expiry(room, self._expiry_deadline(room))
+        return room.snapshot
+
+    def complete_room(self, room_id: str, heroes: List[Dict]) -> bool:
+        """写入 pending 房间的英雄列表并进入 init 状态"""
+        with self._locked_room(room_id) as room:
+            if room is None or room.status != 'pending':
+                return False
+            room.heroes = heroes
+            room.status = 'init'
+            self._bump_version(room)
+            return True
+
+    def fail_room(self, room_id: str) -> bool:
+        """把 pending 房间标记为 failed"""
+        with self._locked_room(room_id) as room:
+            if room is None or room.status != 'pending':
+                return False
+            room.status = 'failed'
+            self._bump_version(room)
+            # 失败的房间按已结束房间的保留时间过期，登记更早的过期时间
+            self._schedule_expiry(room, self._expiry_deadline(room))
+            return True
+
+    def delete_room(self, room_id: str) -> bool:
+        """删除房间，同时清理密码索引和房间锁"""
+        with timed_lock(self._room_lock, _GLOBAL_LOCK):
+            if not self._remove_locked(room_id):
+                return False
+        self._async_waiters.notify(room_id)
+        return True
+
+    def _remove_locked(self, room_id: str) -> bool:
+        """从房间表中移除房间（调用方需持有全局锁），异步等待者由调用方在释放锁后唤醒"""
+        room_lock = self._room_locks.pop(room_id, None)
+        if room_lock is None:
+            return False
+        with room_lock:
+            room = self._rooms.pop(room_id)
+            if self._password_index.get(room.room_password) == room_id:
+                del self._password_index[room.room_password]
+            # 唤醒仍在等待该房间变化的请求
+            room_lock.notify_all()
+            if self._journal is not None:
+                self._journal.mark(room_id, None)
+        return True
+
+    def start_voting(self, room_id: str):
+        """开始投票（房间级别，已废弃，保留用于兼容）"""
+        with self._locked_room(room_id) as room:
+            if room is None:
+                raise KeyError(f'房间不存在: {room_id}')
+            room.status = 'voting'
+            self._bump_version(room)
+
+    def start_user_voting(self, room_id: str, user_fingerprint: str):
+        """用户开始投票（用户级别）"""
+        with self._locked_room(room_id) as room:
+            if room is None:
+                raise KeyError(f'房间不存在: {room_id}')
+            voter = room.voted_users.get(user_fingerprint)
+            if voter is None:
+                room.voted_users[user_fingerprint] = VoterState(started=True)
+            elif not voter.started:
+                room.voted_users[user_fingerprint] = VoterState(voter.voted_mask, voter.username, True)
+            else:
+                return
+            room.started_voters += 1
+            self._bump_version(room)
+
+    def vote_many(
+        self,
+        room_id: str,
+        user_fingerprint: str,
+        player_indices: Sequence[int],
+        username: str = None
+    ) -> Dict:
+        """提交投票（一票或多票）"""
+        ballot = ballot_mask(player_indices)
+        with self._locked_room(room_id) as room:
+            if room is None:
+                raise KeyError(f'房间不存在: {room_id}')
+
+            voter = room.voted_users.get(user_fingerprint)
+            if voter is None:
+                voter = VoterState(username=username)
+                room.voted_users[user_fingerprint] = voter
+                # 新增投票用户会影响已投票人数
+                self._bump_version(room)
+            elif username and not voter.username:
+                voter = VoterState(voter.voted_mask, username, voter.started)
+                room.voted_users[user_fingerprint] = voter
+                # 补充用户名会影响已投票用户名列表
+                self._bump_version(room)
+
+            # 检查用户是否已开始投票
+            if not voter.started:
+                return vote_error('VOTING_NOT_STARTED')
+
+            if voter.vote_count >= room.votes_per_user:
+                return vote_error('ALREADY_VOTED')
+
+            if voter.voted_mask & ballot or _MASK_COUNTS[ballot] != len(player_indices):
+                return vote_error('DUPLICATE_VOTE')
+
+            if voter.vote_count + len(player_indices) > room.votes_per_user:
+                return vote_error('TOO_MANY_VOTES')
+
+            for player_index in player_indices:
+                room.votes[player_index - 1] += 1
+            voter = VoterState(voter.voted_mask | ballot, voter.username, voter.started)
+            room.voted_users[user_fingerprint] = voter
+            if voter.vote_count == room.votes_per_user:
+                room.completed_voters += 1
+
+            current_votes = len(room.voted_users)
+            # 判断投票是否结束：需要同时满足两个条件
+            # 1. 已投票用户数达到最大投票人数
+            # 2. 所有已投票的用户都完成了他们的所有投票（只有刚投出的票能让用户变为已完成，由计数判断）
+            finished = current_votes >= room.max_votes and room.completed_voters == current_votes
+
+            if finished:
+                room.status = 'finished'
+            self._bump_version(room)
+            if finished:
+                # 结束后的保留时间更短，登记更早的过期时间
+                self._schedule_expiry(room, self._expiry_deadline(room))
+
+            return vote_result(
+                finished,
+                current_votes,
+                room.max_votes,
+                list(voter.voted_players),
+                room.votes_per_user - voter.vote_count
+            )
 
     def reset_voting(self, room_id: str, creator_fingerprint: str) -> Dict:
         """重置投票状态（只有房主可以操作）"""
-        with self._room_lock:
-            if room_id not in self._rooms:
+        with self._locked_room(room_id) as room:
+            if room is None:
                 return {
                     'success': False,
                     'error': 'ROOM_NOT_FOUND',
                     'message': '房间不存在'
                 }
 
-            room = self._rooms[room_id]
-
             # 验证是否为房主
-            if room.get('creator_fingerprint') != creator_fingerprint:
+            if room.creator_fingerprint != creator_fingerprint:
                 return {
                     'success': False,
                     'error': 'UNAUTHORIZED',
@@ -265,12 +1185,15 @@ class RoomService:
                 }
 
             # 重置投票状态
-            room['status'] = 'init'
-            room['votes'] = {}
-            room['voted_users'] = {}
+            room.status = 'init'
+            room.votes = [0] * PLAYER_COUNT
+            room.voted_users = {}
+            room.started_voters = 0
+            room.completed_voters = 0
             # 清理排序生成次数
-            room['order_generation_count'] = 0
-            room['player_order'] = None
+            room.order_generation_count = 0
+            room.player_order = None
+            self._bump_version(room)
 
             return {
                 'success': True,
@@ -280,18 +1203,16 @@ class RoomService:
     def generate_player_order(self, room_id: str, creator_fingerprint: str) -> Dict:
         """生成随机玩家排序（只有房主可以操作）"""
         import random
-        with self._room_lock:
-            if room_id not in self._rooms:
+        with self._locked_room(room_id) as room:
+            if room is None:
                 return {
                     'success': False,
                     'error': 'ROOM_NOT_FOUND',
                     'message': '房间不存在'
                 }
 
-            room = self._rooms[room_id]
-
             # 验证是否为房主
-            if room.get('creator_fingerprint') != creator_fingerprint:
+            if room.creator_fingerprint != creator_fingerprint:
                 return {
                     'success': False,
                     'error': 'UNAUTHORIZED',
@@ -301,19 +1222,258 @@ class RoomService:
             # 生成1-5的随机排序
             order = list(range(1, 6))
             random.shuffle(order)
-            room['player_order'] = order
+            room.player_order = tuple(order)
             # 增加生成次数
-            if 'order_generation_count' not in room:
-                room['order_generation_count'] = 0
-            room['order_generation_count'] += 1
+            room.order_generation_count += 1
+            self._bump_version(room)
 
             return {
                 'success': True,
                 'message': '排序已生成',
                 'order': order,
-                'generation_count': room['order_generation_count']
+                'generation_count': room.order_generation_count
             }
 
+
+class RoomService:
+    """房间管理服务（单例模式）
+
+    房间数据保存在存储后端中：默认是进程内的 MemoryRoomBackend；多 worker 部署时通过 configure_backend
+    换成共享的后端——单机使用 SharedMemoryRoomBackend，多实例使用 RedisRoomBackend。
+    这里负责转发、后台清理线程，以及基于快照实现的旧版接口。
+    """
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super(RoomService, cls).__new__(cls)
+                    cls._instance._backend: RoomBackend = MemoryRoomBackend()
+                    cls._instance._sweeper: Optional[threading.Thread] = None
+        return cls._instance
+
+    @property
+    def backend(self) -> RoomBackend:
+        return self._backend
+
+    def configure_backend(self, backend: RoomBackend):
+        """替换存储后端（只应在启动时调用，原后端中的房间不会迁移）"""
+        backend.configure_expiry(
+            idle_ttl=self._backend.idle_ttl,
+            finished_ttl=self._backend.finished_ttl,
+            max_age=self._backend.max_age,
+            max_rooms=self._backend.max_rooms
+        )
+        self._backend = backend
+
+    def configure_expiry(
+        self,
+        idle_ttl: float = None,
+        finished_ttl: float = None,
+        max_age: float = None,
+        max_rooms: int = None
+    ):
+        """修改房间过期配置，未提供的参数保持不变"""
+        self._backend.configure_expiry(idle_ttl, finished_ttl, max_age, max_rooms)
+
+    def sweep_expired_rooms(self) -> int:
+        """淘汰所有已过期的房间，返回淘汰数量"""
+        return self._backend.sweep_expired_rooms()
+
+    def start_expiry_sweeper(self, interval: float):
+        """启动后台清理线程，每隔 interval 秒淘汰一次过期房间"""
+        with self._lock:
+            if self._sweeper is not None:
+                return
+            self._sweeper = threading.Thread(
+                target=self._sweep_forever, args=(interval,), name='room-expiry-sweeper', daemon=True
+            )
+        self._sweeper.start()
+
+    def _sweep_forever(self, interval: float):
+        while True:
+            time.sleep(interval)
+            try:
+                self.sweep_expired_rooms()
+            except Exception:
+                logger.exception('清理过期房间失败')
+
+    def get_stats(self) -> Dict:
+        """获取存储后端名称、房间数量和淘汰计数"""
+        stats = {'backend': self._backend.name}
+        stats.update(self._backend.get_stats())
+        return stats
+
+    def get_voter_stats(self) -> Optional[Dict]:
+        """所有房间中已开始投票和已投完的用户数（Redis 后端不支持，返回 None）"""
+        return self._backend.get_voter_stats()
+
+    def wait_for_version(self, room_id: str, since: int, timeout: float) -> Optional[int]:
+        """阻塞等待房间版本号超过 since，或超时
+
+        返回等待结束时的版本号（超时则可能仍等于 since），房间不存在或在等待期间被删除时返回 None。
+        """
+        return self._backend.wait_for_version(room_id, since, timeout)
+
+    async def wait_for_version_async(self, room_id: str, since: int, timeout: float) -> Optional[int]:
+        """wait_for_version 的异步版本（ASGI 部署），等待期间不占用线程"""
+        return await self._backend.wait_for_version_async(room_id, since, timeout)
+
+    async def run_async(self, func, *args, blocking: bool = False):
+        """在事件循环中调用房间服务（ASGI 部署）
+
+        存储后端会阻塞（Redis、共享内存）或 blocking 为 True（例如 func 还会读取磁盘缓存）时，在线程池中执行 func，
+        不阻塞事件循环；内存后端的操作很短，直接调用。
+        """
+        if blocking or self._backend.blocking:
+            return await asyncio.to_thread(func, *args)
+        return func(*args)
+
+    def room_exists(self, room_id: str) -> bool:
+        """检查房间是否存在"""
+        return self._backend.room_exists(room_id)
+
+    def room_exists_by_password(self, room_password: str) -> bool:
+        """通过密码检查房间是否存在"""
+        return self._backend.room_exists_by_password(room_password)
+
+    def get_room_snapshot(self, room_password: str) -> Optional[RoomSnapshot]:
+        """通过密码获取房间快照，房间不存在时返回 None"""
+        return self._backend.get_room_snapshot(room_password)
+
+    def get_room_by_password(self, room_password: str) -> Optional[Dict]:
+        """通过密码获取房间信息（旧版字典格式，新代码请使用 get_room_snapshot）"""
+        snapshot = self._backend.get_room_snapshot(room_password)
+        if snapshot is None:
+            return None
+        return snapshot.to_room_dict()
+
+    def get_room_version_by_password(self, room_password: str) -> Optional[Tuple[str, int]]:
+        """通过密码获取房间ID和当前版本号，房间不存在时返回 None"""
+        return self._backend.get_room_version_by_password(room_password)
+
+    def get_room_status(self, room_id: str) -> Optional[str]:
+        """获取房间状态"""
+        return self._backend.get_room_status(room_id)
+
+    def create_room(
+        self,
+        room_id: str,
+        room_password: str,
+        match_id: int,
+        max_votes: int,
+        votes_per_user: int,
+        creator_username: str,
+        creator_fingerprint: str,
+        heroes: Optional[List[Dict]],
+        show_only_winner_votes: bool = True
+    ) -> RoomSnapshot:
+        """创建房间，返回房间快照；heroes 为 None 时创建 pending 房间，比赛数据由 RoomHeroesFetcher 在后台获取"""
+        return self._backend.create_room(
+            room_id=room_id,
+            room_password=room_password,
+            match_id=match_id,
+            max_votes=max_votes,
+            votes_per_user=votes_per_user,
+            creator_username=creator_username,
+            creator_fingerprint=creator_fingerprint,
+            heroes=heroes,
+            show_only_winner_votes=show_only_winner_votes
+        )
+
+    def check_room_limits(
+        self,
+        room_password: str,
+        max_votes: int,
+        creator_fingerprint: str,
+        heroes: Optional[List[Dict]]
+    ) -> Optional[str]:
+        """检查房间参数是否超出存储后端的上限（例如共享内存后端的投票人数），超出时返回提示信息"""
+        return self._backend.check_room_limits(room_password, max_votes, creator_fingerprint, heroes)
+
+    def complete_room(self, room_id: str, heroes: List[Dict]) -> bool:
+        """写入 pending 房间的英雄列表并进入 init 状态"""
+        return self._backend.complete_room(room_id, heroes)
+
+    def fail_room(self, room_id: str) -> bool:
+        """把 pending 房间标记为 failed"""
+        return self._backend.fail_room(room_id)
+
+    def delete_room(self, room_id: str) -> bool:
+        """删除房间"""
+        return self._backend.delete_room(room_id)
+
+    def get_room(self, room_id: str) -> Dict:
+        """获取房间信息（旧版字典格式，新代码请使用 get_room_snapshot）"""
+        snapshot = self._backend.find_room(room_id)
+        if snapshot is None:
+            raise KeyError(f'房间不存在: {room_id}')
+        return snapshot.to_room_dict()
+
+    def start_voting(self, room_id: str):
+        """开始投票（房间级别，已废弃，保留用于兼容）"""
+        self._backend.start_voting(room_id)
+
+    def start_user_voting(self, room_id: str, user_fingerprint: str):
+        """用户开始投票（用户级别）"""
+        self._backend.start_user_voting(room_id, user_fingerprint)
+
+    def has_user_started_voting(self, room_id: str, user_fingerprint: str) -> bool:
+        """检查用户是否已开始投票"""
+        snapshot = self._backend.find_room(room_id)
+        if snapshot is None:
+            return False
+        voter = snapshot.voted_users.get(user_fingerprint)
+        return voter is not None and voter.started
+
+    def vote(self, room_id: str, user_fingerprint: str, player_index: int, username: str = None) -> Dict:
+        """提交投票"""
+        result = self._backend.vote(room_id, user_fingerprint, player_index, username)
+        if result['success']:
+            _VOTES.inc()
+        return result
+
+    def vote_many(
+        self,
+        room_id: str,
+        user_fingerprint: str,
+        player_indices: Sequence[int],
+        username: str = None
+    ) -> Dict:
+        """一次提交多票（全部成功或全部不写入）"""
+        result = self._backend.vote_many(room_id, user_fingerprint, player_indices, username)
+        if result['success']:
+            _VOTES.inc(amount=len(player_indices))
+        return result
+
+    def get_user_voted_players(self, room_id: str, user_fingerprint: str) -> Optional[List[int]]:
+        """获取用户已投票的玩家列表"""
+        snapshot = self._backend.find_room(room_id)
+        if snapshot is None:
+            return None
+        voter = snapshot.voted_users.get(user_fingerprint)
+        if voter is None:
+            return []
+        return list(voter.voted_players)
+
+    def get_voted_usernames(self, room_id: str) -> List[str]:
+        """获取已投票用户的用户名列表"""
+        snapshot = self._backend.find_room(room_id)
+        if snapshot is None:
+            return []
+        return list(snapshot.voted_usernames)
+
+    def reset_voting(self, room_id: str, creator_fingerprint: str) -> Dict:
+        """重置投票状态（只有房主可以操作）"""
+        return self._backend.reset_voting(room_id, creator_fingerprint)
+
+    def generate_player_order(self, room_id: str, creator_fingerprint: str) -> Dict:
+        """生成随机玩家排序（只有房主可以操作）"""
+        return self._backend.generate_player_order(room_id, creator_fingerprint)
+
     @property
     def current_votes(self) -> int:
         """获取当前已投票人数（用于房间信息）"""
@@ -321,17 +1481,147 @@ class RoomService:
         pass
 
 
+def create_room_backend(
+    backend: str,
+    redis_url: str = None,
+    redis_prefix: str = 'mole:',
+    shm_path: str = None,
+    shm_capacity: int = 10000,
+    journal_dir: str = None,
+    journal_flush_interval: float = 0.05,
+    journal_snapshot_interval: float = 300
+) -> RoomBackend:
+    """按名称创建存储后端：memory（默认）、redis 或 shm
+
+    journal_dir 只对 memory 后端有效：设置后房间写入该目录下的日志和快照，重启后恢复。
+    """
+    if backend == 'memory':
+        journal = None
+        if journal_dir:
+            journal = RoomJournal(
+                journal_dir, flush_interval=journal_flush_interval, snapshot_interval=journal_snapshot_interval
+            )
+        return MemoryRoomBackend(journal)
+    if backend == 'redis':
+        # redis 是可选依赖，只在使用 Redis 后端时导入
+        from .redis_backend import RedisRoomBackend
+        return RedisRoomBackend(redis_url, prefix=redis_prefix)
+    if backend == 'shm':
+        from .shm_backend import SharedMemoryRoomBackend
+        return SharedMemoryRoomBackend(shm_path, capacity=shm_capacity)
+    raise ValueError(f'未知的房间存储后端: {backend}')
+
+
 def get_room_service() -> RoomService:
     """获取房间服务单例"""
     return RoomService()
 
 
+class _MatchFetch:
+    """正在进行的比赛数据请求，同一场比赛的并发请求共享它的结果"""
+
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Optional[List[Dict]] = None
+        self.error: Optional[Exception] = None
+
+
 class OpenDotaService:
-    """OpenDota API服务"""
+    """OpenDota API服务
+
+    - 所有请求共用一个带连接池的 requests.Session，复用 TLS 连接，对 429 / 5xx 有限次重试
+    - get_losing_team_heroes 的结果按比赛ID做 LRU + TTL 缓存（比赛结束后数据不会再变化）；
+      同一场比赛的并发请求只向上游发起一次，其余请求等待并共享结果，失败结果不缓存
+    - 配置了磁盘缓存时，内存未命中先查磁盘（重启后仍然有效），命中后放入内存；从 OpenDota 获取的结果同时写入磁盘
+    """
 
     BASE_URL = 'https://api.opendota.com/api'
+    # 请求超时（连接, 读取），秒
+    timeout = (3.05, 10)
+    # 最多缓存的比赛数和缓存时间（秒）
+    cache_size = 1024
+    cache_ttl = 24 * 60 * 60
+    # 连接池大小，应不小于同时创建房间的线程数
+    pool_size = 16
+
     _heroes_data = None
     _heroes_lock = threading.Lock()
+    _session: Optional[requests.Session] = None
+    _session_lock = threading.Lock()
+    # 比赛ID -> (过期时间戳, 失败方玩家列表)，按最近使用排序
+    _match_cache: 'OrderedDict[int, Tuple[float, List[Dict]]]' = OrderedDict()
+    _inflight: Dict[int, _MatchFetch] = {}
+    _cache_lock = threading.Lock()
+    _cache_stats = {'hits': 0, 'misses': 0, 'shared': 0, 'disk_hits': 0}
+    _disk_cache: Optional[MatchDiskCache] = None
+    # 异步部署：事件循环 -> httpx.AsyncClient，(事件循环, 比赛ID) -> 进行中的请求
+    _async_clients: 'weakref.WeakKeyDictionary' = weakref.WeakKeyDictionary()
+    _async_inflight: Dict[Tuple[asyncio.AbstractEventLoop, int], asyncio.Future] = {}
+
+    @classmethod
+    def configure(
+        cls,
+        base_url: str = None,
+        timeout: float = None,
+        cache_size: int = None,
+        cache_ttl: float = None,
+        disk_cache_path: str = None,
+        disk_cache_size: int = 100000
+    ):
+        """修改上游地址、读取超时和缓存配置，未提供的参数保持不变
+
+        disk_cache_path 为数据库文件路径，提供时启用磁盘缓存（最多保存 disk_cache_size 场比赛）。
+        """
+        if base_url is not None:
+            cls.BASE_URL = base_url.rstrip('/')
+        if timeout is not None:
+            cls.timeout = (cls.timeout[0], timeout)
+        if cache_size is not None:
+            cls.cache_size = cache_size
+        if cache_ttl is not None:
+            cls.cache_ttl = cache_ttl
+        if disk_cache_path:
+            # 磁盘缓存不可用（目录不可写、文件损坏或被锁定）时只记录日志，不影响应用启动
+            try:
+                cls._disk_cache = MatchDiskCache(disk_cache_path, max_entries=disk_cache_size)
+            except (sqlite3.Error, OSError):
+                logger.exception(f'打开比赛磁盘缓存失败，已禁用磁盘缓存 - 路径: {disk_cache_path}')
+                cls._disk_cache = None
+
+    @classmethod
+    def _get_session(cls) -> requests.Session:
+        if cls._session is None:
+            with cls._session_lock:
+                if cls._session is None:
+                    retry = Retry(
+                        total=2,
+                        backoff_factor=0.3,
+                        status_forcelist=(429, 500, 502, 503, 504),
+                        allowed_methods=('GET',)
+                    )
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=cls.pool_size, max_retries=retry)
+                    session = requests.Session()
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    cls._session = session
+        return cls._session
+
+    @classmethod
+    def disk_cache_enabled(cls) -> bool:
+        """是否启用了磁盘缓存（读取缓存会访问 SQLite 文件）"""
+        return cls._disk_cache is not None
+
+    @classmethod
+    def get_cache_stats(cls) -> Dict:
+        """获取比赛缓存的命中统计"""
+        with cls._cache_lock:
+            stats = dict(cls._cache_stats)
+            stats['size'] = len(cls._match_cache)
+        if cls._disk_cache is not None:
+            stats['disk_size'] = cls._disk_cache.count()
+        return stats
 
     def __init__(self):
         """初始化时加载英雄配置文件"""
@@ -358,9 +1648,17 @@ class OpenDotaService:
     def get_match_data(self, match_id: int) -> Dict:
         """获取比赛数据"""
         url = f'{self.BASE_URL}/matches/{match_id}'
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        return response.json()
+        start = time.perf_counter()
+        try:
+            response = self._get_session().get(url, timeout=self.timeout)
+            response.raise_for_status()
+            data = response.json()
+        except Exception as e:
+            result = 'http_error' if isinstance(e, requests.HTTPError) else 'error'
+            _OPENDOTA_REQUESTS.observe(time.perf_counter() - start, (result,))
+            raise
+        _OPENDOTA_REQUESTS.observe(time.perf_counter() - start, ('ok',))
+        return data
 
     def get_heroes(self) -> List[Dict]:
         """获取英雄列表（从配置文件读取）"""
@@ -374,10 +1672,178 @@ class OpenDotaService:
             self._load_heroes_config()
         return OpenDotaService._heroes_data.get(hero_id)
 
+    def get_cached_losing_team_heroes(self, match_id: int) -> Optional[List[Dict]]:
+        """只从缓存（内存、磁盘）获取失败方的玩家和英雄信息，未缓存时返回 None，不访问网络
+
+        磁盘命中时放入内存缓存。返回列表的副本，调用方可以自由修改。
+        """
+        match_id = int(match_id)
+        heroes = self._memory_cached(match_id)
+        if heroes is not None:
+            return heroes
+        return self._disk_cached(match_id)
+
+    def _memory_cached(self, match_id: int) -> Optional[List[Dict]]:
+        """只查内存缓存，命中时返回副本"""
+        with self._cache_lock:
+            cached = self._match_cache.get(match_id)
+            if cached is not None and cached[0] > time.time():
+                self._match_cache.move_to_end(match_id)
+                self._cache_stats['hits'] += 1
+                return [dict(player) for player in cached[1]]
+        return None
+
+    def _disk_cached(self, match_id: int) -> Optional[List[Dict]]:
+        """只查磁盘缓存，命中时放入内存缓存并返回副本"""
+        disk_cache = self._disk_cache
+        if disk_cache is None:
+            return None
+        heroes = disk_cache.get(match_id)
+        if heroes is None:
+            return None
+        with self._cache_lock:
+            self._cache_stats['disk_hits'] += 1
+            self._remember(match_id, heroes)
+        return [dict(player) for player in heroes]
+
+    @classmethod
+    def _remember(cls, match_id: int, heroes: List[Dict]):
+        """放入内存缓存，超出容量时淘汰最久未使用的比赛（调用方需持有 _cache_lock）"""
+        cls._match_cache[match_id] = (time.time() + cls.cache_ttl, heroes)
+        cls._match_cache.move_to_end(match_id)
+        while len(cls._match_cache) > cls.cache_size:
+            cls._match_cache.popitem(last=False)
+
     def get_losing_team_heroes(self, match_id: int) -> List[Dict]:
-        """获取失败方的玩家和英雄信息"""
-        match_data = self.get_match_data(match_id)
+        """获取失败方的玩家和英雄信息（优先使用缓存）
+
+        返回列表的副本，调用方可以自由修改。
+        """
+        match_id = int(match_id)
+        with self._cache_lock:
+            cached = self._match_cache.get(match_id)
+            if cached is not None and cached[0] > time.time():
+                self._match_cache.move_to_end(match_id)
+                self._cache_stats['hits'] += 1
+                return [dict(player) for player in cached[1]]
+            fetch = self._inflight.get(match_id)
+            leader = fetch is None
+            if leader:
+                fetch = _MatchFetch()
+                self._inflight[match_id] = fetch
+                self._cache_stats['misses'] += 1
+            else:
+                self._cache_stats['shared'] += 1
+
+        if not leader:
+            # 已有相同比赛的请求在进行中，等待它的结果
+            fetch.done.wait()
+            if fetch.error is not None:
+                raise fetch.error
+            return [dict(player) for player in fetch.result]
+
+        try:
+            fetch.result = self._load_losing_team_heroes(match_id)
+        except Exception as e:
+            fetch.error = e
+            raise
+        finally:
+            with self._cache_lock:
+                del self._inflight[match_id]
+                if fetch.error is None:
+                    self._remember(match_id, fetch.result)
+            fetch.done.set()
+        return [dict(player) for player in fetch.result]
 
+    def _load_losing_team_heroes(self, match_id: int) -> List[Dict]:
+        """内存未命中时先查磁盘缓存，仍未命中再请求 OpenDota 并写入磁盘缓存"""
+        disk_cache = self._disk_cache
+        if disk_cache is None:
+            return self._fetch_losing_team_heroes(match_id)
+        heroes = disk_cache.get(match_id)
+        if heroes is not None:
+            with self._cache_lock:
+                self._cache_stats['disk_hits'] += 1
+            return heroes
+        heroes = self._fetch_losing_team_heroes(match_id)
+        disk_cache.put(match_id, heroes)
+        return heroes
+
+    def _fetch_losing_team_heroes(self, match_id: int) -> List[Dict]:
+        """从 OpenDota 获取比赛数据并提取失败方的玩家和英雄信息"""
+        return self._losing_team_heroes(self.get_match_data(match_id))
+
+    @classmethod
+    def _get_async_client(cls) -> 'httpx.AsyncClient':
+        """当前事件循环的异步 HTTP 客户端（httpx 的连接池不能跨事件循环使用）"""
+        loop = asyncio.get_running_loop()
+        client = cls._async_clients.get(loop)
+        if client is None:
+            client = httpx.AsyncClient(
+                timeout=httpx.Timeout(cls.timeout[1], connect=cls.timeout[0]),
+                limits=httpx.Limits(max_connections=cls.pool_size),
+                transport=httpx.AsyncHTTPTransport(retries=2)
+            )
+            cls._async_clients[loop] = client
+        return client
+
+    async def get_match_data_async(self, match_id: int) -> Dict:
+        """get_match_data 的异步版本；未安装 httpx 时在线程中执行同步版本"""
+        if httpx is None:
+            return await asyncio.to_thread(self.get_match_data, match_id)
+        url = f'{self.BASE_URL}/matches/{match_id}'
+        client = self._get_async_client()
+        start = time.perf_counter()
+        try:
+            # 与同步版本一致：429 / 5xx 最多重试 2 次，间隔指数增长
+            for attempt in range(3):
+                response = await client.get(url)
+                if response.status_code not in (429, 500, 502, 503, 504) or attempt == 2:
+                    break
+                await asyncio.sleep(0.3 * 2 ** attempt)
+            response.raise_for_status()
+            data = response.json()
+        except Exception as e:
+            result = 'http_error' if isinstance(e, httpx.HTTPStatusError) else 'error'
+            _OPENDOTA_REQUESTS.observe(time.perf_counter() - start, (result,))
+            raise
+        _OPENDOTA_REQUESTS.observe(time.perf_counter() - start, ('ok',))
+        return data
+
+    async def get_losing_team_heroes_async(self, match_id: int) -> List[Dict]:
+        """get_losing_team_heroes 的异步版本（ASGI 部署）
+
+        共用内存和磁盘缓存；同一事件循环中同一场比赛的并发请求只向上游发起一次。
+        """
+        match_id = int(match_id)
+        heroes = self._memory_cached(match_id)
+        if heroes is None and self._disk_cache is not None:
+            # SQLite 读取在线程中执行，不阻塞事件循环
+            heroes = await asyncio.to_thread(self._disk_cached, match_id)
+        if heroes is not None:
+            return heroes
+        key = (asyncio.get_running_loop(), match_id)
+        task = self._async_inflight.get(key)
+        with self._cache_lock:
+            self._cache_stats['misses' if task is None else 'shared'] += 1
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_losing_team_heroes_async(match_id))
+            self._async_inflight[key] = task
+            task.add_done_callback(lambda _: self._async_inflight.pop(key, None))
+        # 某个等待者被取消时不影响其他等待者共享的请求
+        heroes = await asyncio.shield(task)
+        return [dict(player) for player in heroes]
+
+    async def _fetch_losing_team_heroes_async(self, match_id: int) -> List[Dict]:
+        heroes = self._losing_team_heroes(await self.get_match_data_async(match_id))
+        with self._cache_lock:
+            self._remember(match_id, heroes)
+        if self._disk_cache is not None:
+            await asyncio.to_thread(self._disk_cache.put, match_id, heroes)
+        return heroes
+
+    def _losing_team_heroes(self, match_data: Dict) -> List[Dict]:
+        """从比赛数据中提取失败方的玩家和英雄信息"""
         players = match_data.get('players', [])
         radiant_win = match_data.get('radiant_win', False)
 
@@ -404,3 +1870,119 @@ class OpenDotaService:
             raise ValueError(f'失败方玩家数量不正确，期望5人，实际{len(losing_team_players)}人')
 
         return losing_team_players
+
+
+class RoomHeroesFetcher:
+    """在后台为 pending 房间获取比赛数据
+
+    OpenDota 响应可能很慢，创建房间的请求只登记 pending 房间并提交任务后立即返回，
+    由这里的有界线程池（ASGI 部署时为事件循环中的协程）获取失败方英雄后调用 complete_room / fail_room，
+    不占用处理其他请求的线程。
+    房间版本号随之变化，客户端通过长轮询或 SSE 推送得到通知。
+    进行中和排队的任务总数不超过 max_pending，超出时 submit 返回 False。
+    """
+
+    # 同时请求 OpenDota 的线程数
+    workers = 4
+    # 进行中和排队的任务总数上限
+    max_pending = 64
+
+    def __init__(self):
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._stats = {'completed': 0, 'failed': 0, 'rejected': 0}
+        self._tasks: set = set()
+
+    def configure(self, workers: int = None, max_pending: int = None):
+        """修改线程数和任务数上限，只在第一次提交任务前生效"""
+        if workers is not None:
+            self.workers = workers
+        if max_pending is not None:
+            self.max_pending = max_pending
+
+    def _reserve(self) -> bool:
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._stats['rejected'] += 1
+                return False
+            self._pending += 1
+            return True
+
+    def _release(self, completed: bool):
+        with self._lock:
+            self._pending -= 1
+            self._stats['completed' if completed else 'failed'] += 1
+
+    def submit(self, room_id: str, match_id: int) -> bool:
+        """提交获取任务，任务数已满时返回 False"""
+        if not self._reserve():
+            return False
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='room-heroes')
+        self._executor.submit(self._fetch, room_id, match_id)
+        return True
+
+    def submit_async(self, room_id: str, match_id: int, loop: asyncio.AbstractEventLoop = None) -> bool:
+        """在事件循环中提交获取任务（ASGI 部署），使用异步 HTTP 客户端，不占用线程
+
+        loop 为空时使用当前线程正在运行的事件循环；在线程池中调用时传入视图所在的事件循环。
+        """
+        if not self._reserve():
+            return False
+        if loop is None:
+            self._start_async(room_id, match_id)
+        else:
+            loop.call_soon_threadsafe(self._start_async, room_id, match_id)
+        return True
+
+    def _start_async(self, room_id: str, match_id: int):
+        task = asyncio.ensure_future(self._fetch_async(room_id, match_id))
+        # 事件循环只保留任务的弱引用，完成前由这里持有
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _fetch(self, room_id: str, match_id: int):
+        completed = False
+        try:
+            heroes = OpenDotaService().get_losing_team_heroes(match_id)
+            completed = get_room_service().complete_room(room_id, heroes)
+        except Exception as e:
+            self._fail(room_id, match_id, e)
+        finally:
+            self._release(completed)
+
+    async def _fetch_async(self, room_id: str, match_id: int):
+        completed = False
+        room_service = get_room_service()
+        try:
+            heroes = await OpenDotaService().get_losing_team_heroes_async(match_id)
+            completed = await room_service.run_async(room_service.complete_room, room_id, heroes)
+        except Exception as e:
+            await room_service.run_async(self._fail, room_id, match_id, e)
+        finally:
+            self._release(completed)
+
+    @staticmethod
+    def _fail(room_id: str, match_id: int, error: Exception):
+        logger.warning(f'获取比赛数据失败 - 比赛ID: {match_id}, 房间ID: {room_id}, 错误: {error}')
+        try:
+            get_room_service().fail_room(room_id)
+        except Exception:
+            logger.exception(f'标记房间失败状态出错 - 房间ID: {room_id}')
+
+    def get_stats(self) -> Dict:
+        """获取进行中的任务数和完成 / 失败 / 拒绝计数"""
+        with self._lock:
+            stats = {'pending': self._pending, 'max_pending': self.max_pending}
+            stats.update(self._stats)
+        return stats
+
+
+_room_heroes_fetcher = RoomHeroesFetcher()
+
+
+def get_room_heroes_fetcher() -> RoomHeroesFetcher:
+    """获取后台比赛数据获取器"""
+    return _room_heroes_fetcher
@@ -0,0 +1,805 @@
+"""
+Shared-memory room storage backend.
+
+同一台机器上的多个 gunicorn worker 通过 mmap 映射同一个文件共享房间数据，不依赖任何外部服务。
+
+文件布局：
+- 文件头：魔数、布局版本、容量、记录大小、创建序号计数、房间数、按原因统计的淘汰次数
+- 两张开放寻址哈希表（房间ID / 房间密码 -> 槽位），线性探测，删除时回移后续条目，不留墓碑
+- capacity 个定长房间记录：5 个玩家的得票计数、最多 MAX_VOTERS 个投票用户（每人一个 5 位的已投玩家位图），
+  英雄列表以 JSON 保存在记录内的定长区域
+
+加锁：每个槽位一把锁，文件头和哈希表共用一把全局锁，加锁顺序为全局锁 -> 槽位锁。
+跨进程使用 fcntl 字节范围锁；fcntl 锁属于进程而不是线程，因此进程内先获取对应的 threading.Lock。
+读取快照时先不加锁比较 (创建序号, 版本号)，与本进程缓存一致时直接复用，否则持有槽位锁重新解析。
+跨进程无法使用条件变量，等待房间变化时每隔 poll_interval 检查一次版本号
+（异步等待时每个事件循环只有一个任务轮询，与等待者数量无关）。
+
+与内存后端的差异：用户已投的玩家按序号排列（位图不记录投票先后）；每个房间最多 MAX_VOTERS 个投票用户，
+只有开始投票时才占用名额（未开始投票就提交投票的用户不会被记录）；字符串字段有长度上限，
+超出时创建房间 / 开始投票会抛出 ValueError（用户名超长时截断），创建房间的接口会先用 check_room_limits 检查。
+"""
+import errno
+import fcntl
+import heapq
+import json
+import logging
+import mmap
+import os
+import random
+import struct
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .services import (
+    LOCK_HOLD,
+    LOCK_WAIT,
+    PLAYER_COUNT,
+    VOTE_ERROR_MESSAGES,
+    AsyncRoomWaiters,
+    RoomBackend,
+    RoomCreateError,
+    RoomSnapshot,
+    RoomState,
+    VoterState,
+    ballot_mask,
+    vote_error,
+    vote_result
+)
+
+logger = logging.getLogger('app.api.services')
+
+_MAGIC = b'MOLE'
+_LAYOUT_VERSION = 2
+
+# 每个房间最多记录的投票用户数
+MAX_VOTERS = 32
+# 英雄列表 JSON 的最大字节数
+MAX_HEROES_BYTES = 2048
+
+_STATUSES = ('init', 'voting', 'finished', 'pending', 'failed')
+_EVICTION_REASONS = ('idle', 'finished', 'max_age', 'capacity')
+# LOCK_WAIT / LOCK_HOLD 的标签：槽位锁、全局锁
+_ROOM_LOCK = ('room',)
+_GLOBAL_LOCK = ('global',)
+
+# 文件头：魔数、布局版本、容量、记录大小；之后是创建序号计数、房间数和 4 个淘汰计数
+_HEADER = struct.Struct('<4sIII')
+_COUNTERS = struct.Struct('<QQ4Q')
+_COUNTERS_OFFSET = _HEADER.size
+_HEADER_SIZE = 4096
+
+# 哈希表条目：0 为空，否则为槽位 + 1
+_BUCKET = struct.Struct('<I')
+
+# 房间记录的定长部分，字段下标见下方常量
+_ROOM = struct.Struct('<QQddqIIIBBBB5BBBx5I33p65p65p65pH')
+(
+    _VERSION, _SERIAL, _CREATED_AT, _LAST_ACTIVE, _MATCH_ID, _MAX_VOTES, _VOTES_PER_USER,
+    _ORDER_COUNT, _USED, _STATUS, _SHOW_WINNER, _VOTER_COUNT
+) = range(12)
+_PLAYER_ORDER = slice(12, 12 + PLAYER_COUNT)
+# 已开始投票和已投完所有票的用户数，随投票增量维护
+_STARTED_COUNT, _COMPLETED_COUNT = 12 + PLAYER_COUNT, 13 + PLAYER_COUNT
+_VOTES = 14 + PLAYER_COUNT
+_ROOM_ID = _VOTES + PLAYER_COUNT
+_PASSWORD, _CREATOR_USERNAME, _CREATOR_FINGERPRINT, _HEROES_LEN = range(_ROOM_ID + 1, _ROOM_ID + 5)
+
+# 不加锁读取时使用的字段
+_VERSION_SERIAL = struct.Struct('<QQ')
+_LAST_ACTIVE_FIELD = struct.Struct('<d')
+_LAST_ACTIVE_OFFSET = struct.calcsize('<QQd')
+_USED_OFFSET = struct.calcsize('<QQddqIII')
+_KEY_FIELDS = {
+    _ROOM_ID: (struct.calcsize('<QQddqIIIBBBB5BBBx5I'), struct.Struct('33p')),
+    _PASSWORD: (struct.calcsize('<QQddqIIIBBBB5BBBx5I33p'), struct.Struct('65p'))
+}
+
+# 投票用户：指纹、用户名、是否已开始投票、已投玩家位图
+_VOTER = struct.Struct('<65p65pBB')
+
+
+def _align(value: int, alignment: int) -> int:
+    return (value + alignment - 1) // alignment * alignment
+
+
+def _encode(value: str, limit: int, label: str) -> bytes:
+    """编码定长字段，超出长度上限时抛出 ValueError"""
+    encoded = value.encode('utf-8')
+    if len(encoded) > limit:
+        raise ValueError(f'{label}过长（最多 {limit} 字节）')
+    return encoded
+
+
+def _truncate(value: str, limit: int) -> bytes:
+    """编码并截断到 limit 字节以内，不截断多字节字符"""
+    return value.encode('utf-8')[:limit].decode('utf-8', 'ignore').encode('utf-8')
+
+
+class SharedMemoryRoomBackend(RoomBackend):
+    """共享内存存储后端，同一台机器上的多个 worker 共享房间数据"""
+
+    name = 'shm'
+    blocking = True
+
+    # 跨进程等待房间变化时检查版本号的间隔（秒）
+    poll_interval = 0.05
+
+    def __init__(self, path: str, capacity: int = 10000):
+        """path 为映射文件路径（不存在时创建），capacity 为最多可保存的房间数"""
+        self._capacity = capacity
+        self._record_size = _align(_ROOM.size + MAX_HEROES_BYTES + MAX_VOTERS * _VOTER.size, 64)
+        self._bucket_count = capacity * 2
+        self._tables = {
+            _ROOM_ID: _HEADER_SIZE,
+            _PASSWORD: _HEADER_SIZE + self._bucket_count * _BUCKET.size
+        }
+        self._records = _align(_HEADER_SIZE + 2 * self._bucket_count * _BUCKET.size, mmap.PAGESIZE)
+        size = self._records + capacity * self._record_size
+
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        # 初始化时持有文件头的锁，避免多个 worker 同时初始化
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, _HEADER_SIZE, 0)
+        try:
+            if os.fstat(self._fd).st_size == 0:
+                # 预先分配空间，避免写入时因磁盘 / tmpfs 空间不足触发 SIGBUS
+                os.posix_fallocate(self._fd, 0, size)
+                self._mm = mmap.mmap(self._fd, size)
+                _HEADER.pack_into(self._mm, 0, _MAGIC, _LAYOUT_VERSION, capacity, self._record_size)
+            else:
+                header = _HEADER.unpack(os.pread(self._fd, _HEADER.size, 0))
+                if header != (_MAGIC, _LAYOUT_VERSION, capacity, self._record_size):
+                    raise RuntimeError(f'共享内存文件 {path} 的布局与当前配置不一致，请删除该文件后重启')
+                self._mm = mmap.mmap(self._fd, size)
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, _HEADER_SIZE, 0)
+
+        self._global_thread_lock = threading.Lock()
+        self._slot_thread_locks = [threading.Lock() for _ in range(capacity)]
+        # 本进程的查找缓存：(字段, 房间ID或密码) -> (槽位, 创建序号)
+        self._slot_cache: Dict[Tuple[int, str], Tuple[int, int]] = {}
+        # 本进程已解析的快照：槽位 -> ((创建序号, 版本号), 快照)
+        self._snapshots: Dict[int, Tuple[Tuple[int, int], RoomSnapshot]] = {}
+        # 查找空闲槽位的起点
+        self._next_free = 0
+        # 查找房间可能需要等待其他进程持有的全局锁，异步等待时在线程池中读取版本号
+        self._async_waiters = AsyncRoomWaiters(self.get_room_version, self.poll_interval, blocking=True)
+
+    @contextmanager
+    def _locked(self, thread_lock: threading.Lock, start: int, length: int, labels: tuple):
+        """持有线程锁和文件区域锁，记录等待时间（包括等待其他进程）和持有时间"""
+        waiting = time.perf_counter()
+        with thread_lock:
+            while True:
+                try:
+                    fcntl.lockf(self._fd, fcntl.LOCK_EX, length, start)
+                    break
+                except OSError as e:
+                    # 内核按进程检测死锁：多线程 worker 的不同线程分别等待其他进程持有的区域时会误报
+                    # （加锁顺序固定为全局锁 -> 槽位锁，不会真正死锁），稍后重试
+                    if e.errno != errno.EDEADLK:
+                        raise
+                    time.sleep(0.001)
+            acquired = time.perf_counter()
+            LOCK_WAIT.observe(acquired - waiting, labels)
+            try:
+                yield
+            finally:
+                LOCK_HOLD.observe(time.perf_counter() - acquired, labels)
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, length, start)
+
+    def _global_lock(self):
+        """全局锁：保护文件头和哈希表"""
+        return self._locked(self._global_thread_lock, 0, _HEADER_SIZE, _GLOBAL_LOCK)
+
+    def _slot_lock(self, slot: int):
+        return self._locked(self._slot_thread_locks[slot], self._offset(slot), self._record_size, _ROOM_LOCK)
+
+    def _offset(self, slot: int) -> int:
+        return self._records + slot * self._record_size
+
+    def _read(self, slot: int) -> list:
+        return list(_ROOM.unpack_from(self._mm, self._offset(slot)))
+
+    def _write(self, slot: int, fields: list):
+        # 先打包再整体复制：pack_into 会先把整条记录清零再写入，不加锁的读取（_lookup_slot）可能看到序号为 0
+        offset = self._offset(slot)
+        self._mm[offset:offset + _ROOM.size] = _ROOM.pack(*fields)
+
+    def _serial(self, slot: int) -> int:
+        return _VERSION_SERIAL.unpack_from(self._mm, self._offset(slot))[1]
+
+    def _voter_offset(self, slot: int, index: int) -> int:
+        return self._offset(slot) + _ROOM.size + MAX_HEROES_BYTES + index * _VOTER.size
+
+    def _voters(self, slot: int, count: int) -> List[list]:
+        return [list(_VOTER.unpack_from(self._mm, self._voter_offset(slot, index))) for index in range(count)]
+
+    def _write_voter(self, slot: int, index: int, voter: list):
+        _VOTER.pack_into(self._mm, self._voter_offset(slot, index), *voter)
+
+    def _find_voter(self, slot: int, count: int, fingerprint: bytes) -> Tuple[int, Optional[list]]:
+        """查找投票用户，返回 (下标, 用户字段)，不存在时返回 (-1, None)"""
+        for index, voter in enumerate(self._voters(slot, count)):
+            if voter[0] == fingerprint:
+                return index, voter
+        return -1, None
+
+    def _bump(self, slot: int, fields: list):
+        """房间状态变更：递增版本号、记录活动时间并写回（调用方需持有槽位锁）"""
+        fields[_VERSION] += 1
+        fields[_LAST_ACTIVE] = time.time()
+        self._write(slot, fields)
+
+    def _read_counters(self) -> list:
+        return list(_COUNTERS.unpack_from(self._mm, _COUNTERS_OFFSET))
+
+    def _write_counters(self, counters: list):
+        _COUNTERS.pack_into(self._mm, _COUNTERS_OFFSET, *counters)
+
+    def _home_bucket(self, key: bytes) -> int:
+        # 需要跨进程一致，不能使用随机化的内置 hash()
+        return zlib.crc32(key) % self._bucket_count
+
+    def _bucket_entry(self, field: int, bucket: int) -> int:
+        return _BUCKET.unpack_from(self._mm, self._tables[field] + bucket * _BUCKET.size)[0]
+
+    def _set_bucket_entry(self, field: int, bucket: int, entry: int):
+        _BUCKET.pack_into(self._mm, self._tables[field] + bucket * _BUCKET.size, entry)
+
+    def _slot_key(self, field: int, slot: int) -> bytes:
+        offset, key_struct = _KEY_FIELDS[field]
+        return key_struct.unpack_from(self._mm, self._offset(slot) + offset)[0]
+
+    def _probe(self, field: int, key: bytes) -> Optional[Tuple[int, int]]:
+        """在哈希表中查找，返回 (哈希桶, 槽位)"""
+        bucket = self._home_bucket(key)
+        for _ in range(self._bucket_count):
+            entry = self._bucket_entry(field, bucket)
+            if entry == 0:
+                return None
+            if self._slot_key(field, entry - 1) == key:
+                return bucket, entry - 1
+            bucket = (bucket + 1) % self._bucket_count
+        return None
+
+    def _index_insert(self, field: int, key: bytes, slot: int):
+        """登记索引（调用方需持有全局锁）"""
+        bucket = self._home_bucket(key)
+        while self._bucket_entry(field, bucket) != 0:
+            bucket = (bucket + 1) % self._bucket_count
+        self._set_bucket_entry(field, bucket, slot + 1)
+
+    def _index_remove(self, field: int, key: bytes):
+        """移除索引并回移同一探测链上的后续条目（调用方需持有全局锁）"""
+        found = self._probe(field, key)
+        if found is None:
+            return
+        hole = found[0]
+        bucket = hole
+        while True:
+            bucket = (bucket + 1) % self._bucket_count
+            entry = self._bucket_entry(field, bucket)
+            if entry == 0:
+                break
+            home = self._home_bucket(self._slot_key(field, entry - 1))
+            # 条目的起始桶不在 (hole, bucket] 区间内时，可以回移到空位
+            if hole < bucket:
+                movable = home <= hole or home > bucket
+            else:
+                movable = hole >= home > bucket
+            if movable:
+                self._set_bucket_entry(field, hole, entry)
+                hole = bucket
+        self._set_bucket_entry(field, hole, 0)
+
+    def _lookup(self, field: int, key: str, locked: bool = False) -> Optional[Tuple[int, int]]:
+        """通过房间ID或密码查找房间，返回 (槽位, 创建序号)"""
+        cache_key = (field, key)
+        cached = self._slot_cache.get(cache_key)
+        if cached is not None and self._serial(cached[0]) == cached[1]:
+            return cached
+        encoded = key.encode('utf-8')
+        found = self._lookup_slot(field, encoded)
+        if found is None and not locked:
+            # 不加锁的探测可能恰好与增删并发而漏掉，持有全局锁再确认一次
+            with self._global_lock():
+                found = self._lookup_slot(field, encoded)
+        if found is None:
+            self._slot_cache.pop(cache_key, None)
+            return None
+        if len(self._slot_cache) >= 2 * self._capacity:
+            self._slot_cache.clear()
+        self._slot_cache[cache_key] = found
+        return found
+
+    def _lookup_slot(self, field: int, key: bytes) -> Optional[Tuple[int, int]]:
+        found = self._probe(field, key)
+        if found is None:
+            return None
+        slot = found[1]
+        serial = self._serial(slot)
+        # 读取序号后再确认一次键，防止槽位在探测期间被删除并复用
+        if serial == 0 or self._slot_key(field, slot) != key or self._serial(slot) != serial:
+            return None
+        return slot, serial
+
+    def _expiry_deadline(self, fields) -> float:
+        ttl = self.finished_ttl if _STATUSES[fields[_STATUS]] in ('finished', 'failed') else self.idle_ttl
+        return min(fields[_LAST_ACTIVE] + ttl, fields[_CREATED_AT] + self.max_age)
+
+    def _expiry_reason(self, fields, now: float) -> str:
+        if fields[_CREATED_AT] + self.max_age <= now:
+            return 'max_age'
+        if _STATUSES[fields[_STATUS]] in ('finished', 'failed'):
+            return 'finished'
+        return 'idle'
+
+    def _remove(self, slot: int, reason: Optional[str] = None):
+        """释放槽位并移除索引，reason 不为空时计入淘汰次数（调用方需持有全局锁）"""
+        with self._slot_lock(slot):
+            fields = self._read(slot)
+            self._index_remove(_ROOM_ID, fields[_ROOM_ID])
+            self._index_remove(_PASSWORD, fields[_PASSWORD])
+            fields[_USED] = 0
+            fields[_SERIAL] = 0
+            fields[_VERSION] += 1
+            self._write(slot, fields)
+        # 下次查找空闲槽位时从这里开始
+        self._next_free = slot
+        counters = self._read_counters()
+        counters[1] -= 1
+        if reason is not None:
+            counters[2 + _EVICTION_REASONS.index(reason)] += 1
+            logger.info(f"房间已淘汰 - 房间ID: {fields[_ROOM_ID].decode('utf-8')}, 原因: {reason}")
+        self._write_counters(counters)
+
+    def sweep_expired_rooms(self) -> int:
+        now = time.time()
+        evicted = 0
+        for slot in range(self._capacity):
+            if not self._mm[self._offset(slot) + _USED_OFFSET]:
+                continue
+            if self._expiry_deadline(_ROOM.unpack_from(self._mm, self._offset(slot))) > now:
+                continue
+            with self._global_lock():
+                fields = self._read(slot)
+                if fields[_USED] and self._expiry_deadline(fields) <= now:
+                    self._remove(slot, self._expiry_reason(fields, now))
+                    evicted += 1
+        return evicted
+
+    def get_stats(self) -> Dict:
+        counters = self._read_counters()
+        return {
+            'rooms': counters[1],
+            'max_rooms': min(self.max_rooms, self._capacity),
+            'evictions': dict(zip(_EVICTION_REASONS, counters[2:]))
+        }
+
+    def get_voter_stats(self) -> Optional[Dict]:
+        # 不加锁读取，与并发修改交错时结果可能略有偏差
+        started = completed = 0
+        for slot in range(self._capacity):
+            offset = self._offset(slot)
+            if self._mm[offset + _USED_OFFSET]:
+                fields = _ROOM.unpack_from(self._mm, offset)
+                started += fields[_STARTED_COUNT]
+                completed += fields[_COMPLETED_COUNT]
+        return {'started': started, 'completed': completed}
+
+    def _load(self, field: int, key: str, touch: bool) -> Optional[RoomSnapshot]:
+        """读取房间快照，(创建序号, 版本号) 与缓存一致时直接复用"""
+        found = self._lookup(field, key)
+        if found is None:
+            return None
+        slot, serial = found
+        offset = self._offset(slot)
+        if touch:
+            _LAST_ACTIVE_FIELD.pack_into(self._mm, offset + _LAST_ACTIVE_OFFSET, time.time())
+        cached = self._snapshots.get(slot)
+        if cached is not None and cached[0] == (serial, _VERSION_SERIAL.unpack_from(self._mm, offset)[0]):
+            return cached[1]
+        with self._slot_lock(slot):
+            fields = self._read(slot)
+            if fields[_SERIAL] != serial:
+                return None
+            voters = self._voters(slot, fields[_VOTER_COUNT])
+            # 英雄列表只在 pending 房间获取到比赛数据时写入一次，之后同一个房间直接复用已解析的列表
+            if cached is not None and cached[1].status != 'pending' and cached[0][0] == serial:
+                heroes = cached[1].heroes
+            else:
+                start = offset + _ROOM.size
+                heroes = json.loads(self._mm[start:start + fields[_HEROES_LEN]])
+        player_order = tuple(fields[_PLAYER_ORDER])
+        room = RoomState(
+            room_id=fields[_ROOM_ID].decode('utf-8'),
+            room_password=fields[_PASSWORD].decode('utf-8'),
+            match_id=fields[_MATCH_ID],
+            max_votes=fields[_MAX_VOTES],
+            votes_per_user=fields[_VOTES_PER_USER],
+            creator_username=fields[_CREATOR_USERNAME].decode('utf-8'),
+            creator_fingerprint=fields[_CREATOR_FINGERPRINT].decode('utf-8'),
+            heroes=heroes,
+            show_only_winner_votes=bool(fields[_SHOW_WINNER]),
+            status=_STATUSES[fields[_STATUS]],
+            created_at=datetime.fromtimestamp(fields[_CREATED_AT]),
+            votes=list(fields[_VOTES:_VOTES + PLAYER_COUNT]),
+            voted_users={
+                voter[0].decode('utf-8'): VoterState(voter[3], voter[1].decode('utf-8') or None, bool(voter[2]))
+                for voter in voters
+            },
+            started_voters=fields[_STARTED_COUNT],
+            completed_voters=fields[_COMPLETED_COUNT],
+            player_order=player_order if player_order[0] else None,
+            order_generation_count=fields[_ORDER_COUNT],
+            version=fields[_VERSION]
+        )
+        snapshot = RoomSnapshot.from_state(room)
+        self._snapshots[slot] = ((serial, fields[_VERSION]), snapshot)
+        return snapshot
+
+    def find_room(self, room_id: str) -> Optional[RoomSnapshot]:
+        return self._load(_ROOM_ID, room_id, False)
+
+    def _current_version(self, slot: int, serial: int) -> Optional[int]:
+        version, current_serial = _VERSION_SERIAL.unpack_from(self._mm, self._offset(slot))
+        return version if current_serial == serial else None
+
+    def get_room_version(self, room_id: str) -> Optional[int]:
+        found = self._lookup(_ROOM_ID, room_id)
+        if found is None:
+            return None
+        return self._current_version(*found)
+
+    def wait_for_version(self, room_id: str, since: int, timeout: float) -> Optional[int]:
+        found = self._lookup(_ROOM_ID, room_id)
+        if found is None:
+            return None
+        deadline = time.monotonic() + timeout
+        while True:
+            version = self._current_version(*found)
+            if version is None or version > since:
+                return version
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return version
+            time.sleep(min(self.poll_interval, remaining))
+
+    async def wait_for_version_async(self, room_id: str, since: int, timeout: float) -> Optional[int]:
+        return await self._async_waiters.wait_for_version(room_id, since, timeout, self.get_room_version)
+
+    def room_exists(self, room_id: str) -> bool:
+        return self._lookup(_ROOM_ID, room_id) is not None
+
+    def room_exists_by_password(self, room_password: str) -> bool:
+        return self._lookup(_PASSWORD, room_password) is not None
+
+    def get_room_snapshot(self, room_password: str) -> Optional[RoomSnapshot]:
+        return self._load(_PASSWORD, room_password, True)
+
+    def get_room_version_by_password(self, room_password: str) -> Optional[Tuple[str, int]]:
+        found = self._lookup(_PASSWORD, room_password)
+        if found is None:
+            return None
+        slot, serial = found
+        _LAST_ACTIVE_FIELD.pack_into(self._mm, self._offset(slot) + _LAST_ACTIVE_OFFSET, time.time())
+        version = self._current_version(slot, serial)
+        if version is None:
+            return None
+        return self._slot_key(_ROOM_ID, slot).decode('utf-8'), version
+
+    def get_room_status(self, room_id: str) -> Optional[str]:
+        found = self._lookup(_ROOM_ID, room_id)
+        if found is None:
+            return None
+        return _STATUSES[self._read(found[0])[_STATUS]]
+
+    def create_room(
+        self,
+        room_id: str,
+        room_password: str,
+        match_id: int,
+        max_votes: int,
+        votes_per_user: int,
+        creator_username: str,
+        creator_fingerprint: str,
+        heroes: Optional[List[Dict]],
+        show_only_winner_votes: bool = True
+    ) -> RoomSnapshot:
+        room = RoomState(
+            room_id=room_id,
+            room_password=room_password,
+            match_id=match_id,
+            max_votes=max_votes,
+            votes_per_user=votes_per_user,
+            creator_username=creator_username,
+            creator_fingerprint=creator_fingerprint,
+            heroes=heroes if heroes is not None else [],
+            show_only_winner_votes=show_only_winner_votes,
+            status='init' if heroes is not None else 'pending'
+        )
+        if not 0 < max_votes <= MAX_VOTERS:
+            raise ValueError(f'最大投票人数必须在 1 到 {MAX_VOTERS} 之间')
+        room_id_bytes = _encode(room_id, 32, '房间ID')
+        password_bytes = _encode(room_password, 64, '房间密码')
+        fingerprint_bytes = _encode(creator_fingerprint, 64, '用户指纹')
+        heroes_bytes = _encode(json.dumps(room.heroes, ensure_ascii=False), MAX_HEROES_BYTES, '英雄数据')
+
+        limit = min(self.max_rooms, self._capacity)
+        # 淘汰候选：None 表示还没有扫描过
+        candidates = None
+        while True:
+            with self._global_lock():
+                if self._lookup(_ROOM_ID, room_id, locked=True) is not None:
+                    raise RoomCreateError('ROOM_ID_EXISTS')
+                if self._lookup(_PASSWORD, room_password, locked=True) is not None:
+                    raise RoomCreateError('ROOM_PASSWORD_EXISTS')
+                # 房间数达到上限时，淘汰不持有全局锁时选出的最接近过期的房间（槽位未被复用时）
+                for slot, serial in candidates or ():
+                    if not 0 < self._read_counters()[1] >= limit:
+                        break
+                    if self._serial(slot) == serial:
+                        self._remove(slot, 'capacity')
+                excess = self._read_counters()[1] - limit + 1
+                if excess <= 0 or candidates == []:
+                    slot = self._free_slot()
+                    counters = self._read_counters()
+                    counters[0] += 1
+                    counters[1] += 1
+                    serial = counters[0]
+                    self._write_counters(counters)
+                    with self._slot_lock(slot):
+                        start = self._offset(slot) + _ROOM.size
+                        self._mm[start:start + len(heroes_bytes)] = heroes_bytes
+                        self._write(slot, [
+                            room.version, serial, room.created_at.timestamp(), room.last_active, match_id,
+                            max_votes, votes_per_user, 0, 1, _STATUSES.index(room.status),
+                            1 if show_only_winner_votes else 0, 0,
+                            *([0] * PLAYER_COUNT), 0, 0, *([0] * PLAYER_COUNT),
+                            room_id_bytes, password_bytes, _truncate(creator_username, 64), fingerprint_bytes,
+                            len(heroes_bytes)
+                        ])
+                    self._index_insert(_ROOM_ID, room_id_bytes, slot)
+                    self._index_insert(_PASSWORD, password_bytes, slot)
+                    break
+            # 第一次达到上限，或候选已被其他 worker 淘汰：释放全局锁后重新扫描，扫描期间不阻塞其他 worker
+            candidates = self._eviction_candidates(excess)
+        snapshot = RoomSnapshot.from_state(room)
+        self._snapshots[slot] = ((serial, room.version), snapshot)
+        return snapshot
+
+    def check_room_limits(
+        self,
+        room_password: str,
+        max_votes: int,
+        creator_fingerprint: str,
+        heroes: Optional[List[Dict]]
+    ) -> Optional[str]:
+        if not 0 < max_votes <= MAX_VOTERS:
+            return f'最大投票人数必须在 1 到 {MAX_VOTERS} 之间'
+        try:
+            _encode(room_password, 64, '房间密码')
+            _encode(creator_fingerprint, 64, '用户指纹')
+            if heroes is not None:
+                _encode(json.dumps(heroes, ensure_ascii=False), MAX_HEROES_BYTES, '英雄数据')
+        except ValueError as e:
+            return str(e)
+        return None
+
+    def _free_slot(self) -> int:
+        """查找空闲槽位（调用方需持有全局锁，且已确认房间数未满）"""
+        for step in range(self._capacity):
+            slot = (self._next_free + step) % self._capacity
+            if not self._mm[self._offset(slot) + _USED_OFFSET]:
+                self._next_free = (slot + 1) % self._capacity
+                return slot
+        raise RuntimeError('共享内存中没有空闲的房间槽位')
+
+    def _eviction_candidates(self, count: int) -> List[Tuple[int, int]]:
+        """不加锁地找出最接近过期的 count 个房间，返回 [(槽位, 序号)]
+
+        读取可能与其他 worker 的写入交错，淘汰前需要持有全局锁确认槽位的序号未变。
+        """
+        rooms = []
+        for slot in range(self._capacity):
+            offset = self._offset(slot)
+            if self._mm[offset + _USED_OFFSET]:
+                fields = _ROOM.unpack_from(self._mm, offset)
+                rooms.append((self._expiry_deadline(fields), slot, fields[_SERIAL]))
+        return [(slot, serial) for _, slot, serial in heapq.nsmallest(count, rooms)]
+
+    def complete_room(self, room_id: str, heroes: List[Dict]) -> bool:
+        heroes_bytes = _encode(json.dumps(heroes, ensure_ascii=False), MAX_HEROES_BYTES, '英雄数据')
+        with self._locked_room(room_id) as found:
+            if found is None or _STATUSES[found[1][_STATUS]] != 'pending':
+                return False
+            slot, fields = found
+            start = self._offset(slot) + _ROOM.size
+            self._mm[start:start + len(heroes_bytes)] = heroes_bytes
+            fields[_HEROES_LEN] = len(heroes_bytes)
+            fields[_STATUS] = _STATUSES.index('init')
+            self._bump(slot, fields)
+            return True
+
+    def fail_room(self, room_id: str) -> bool:
+        with self._locked_room(room_id) as found:
+            if found is None or _STATUSES[found[1][_STATUS]] != 'pending':
+                return False
+            slot, fields = found
+            fields[_STATUS] = _STATUSES.index('failed')
+            self._bump(slot, fields)
+            return True
+
+    def delete_room(self, room_id: str) -> bool:
+        with self._global_lock():
+            found = self._lookup(_ROOM_ID, room_id, locked=True)
+            if found is None:
+                return False
+            self._remove(found[0])
+            return True
+
+    @contextmanager
+    def _locked_room(self, room_id: str):
+        """持有槽位锁并返回 (槽位, 房间字段)，房间不存在时返回 None"""
+        found = self._lookup(_ROOM_ID, room_id)
+        if found is None:
+            yield None
+            return
+        slot, serial = found
+        with self._slot_lock(slot):
+            fields = self._read(slot)
+            # 等待锁期间房间可能已被删除
+            yield (slot, fields) if fields[_SERIAL] == serial else None
+
+    def start_voting(self, room_id: str):
+        with self._locked_room(room_id) as found:
+            if found is None:
+                raise KeyError(f'房间不存在: {room_id}')
+            slot, fields = found
+            fields[_STATUS] = _STATUSES.index('voting')
+            self._bump(slot, fields)
+
+    def start_user_voting(self, room_id: str, user_fingerprint: str):
+        fingerprint = _encode(user_fingerprint, 64, '用户指纹')
+        with self._locked_room(room_id) as found:
+            if found is None:
+                raise KeyError(f'房间不存在: {room_id}')
+            slot, fields = found
+            index, voter = self._find_voter(slot, fields[_VOTER_COUNT], fingerprint)
+            if voter is None:
+                if fields[_VOTER_COUNT] >= MAX_VOTERS:
+                    raise ValueError(VOTE_ERROR_MESSAGES['ROOM_FULL'])
+                index = fields[_VOTER_COUNT]
+                voter = [fingerprint, b'', 1, 0]
+                fields[_VOTER_COUNT] += 1
+            elif not voter[2]:
+                voter[2] = 1
+            else:
+                return
+            fields[_STARTED_COUNT] += 1
+            self._write_voter(slot, index, voter)
+            self._bump(slot, fields)
+
+    def vote_many(
+        self,
+        room_id: str,
+        user_fingerprint: str,
+        player_indices: Sequence[int],
+        username: str = None
+    ) -> Dict:
+        ballot = ballot_mask(player_indices)
+        # 这里不会写入新的投票用户，超长的指纹不可能已开始投票，按未开始投票处理
+        fingerprint = user_fingerprint.encode('utf-8')
+        name = _truncate(username, 64) if username else b''
+        with self._locked_room(room_id) as found:
+            if found is None:
+                raise KeyError(f'房间不存在: {room_id}')
+            slot, fields = found
+
+            index, voter = self._find_voter(slot, fields[_VOTER_COUNT], fingerprint)
+            # 投票用户的槽位只在开始投票时分配，未开始投票的用户不占用名额
+            if voter is None or not voter[2]:
+                return vote_error('VOTING_NOT_STARTED')
+            if name and not voter[1]:
+                voter[1] = name
+                # 补充用户名会影响已投票用户名列表
+                self._write_voter(slot, index, voter)
+                self._bump(slot, fields)
+
+            votes_per_user = fields[_VOTES_PER_USER]
+            if voter[3].bit_count() >= votes_per_user:
+                return vote_error('ALREADY_VOTED')
+
+            if voter[3] & ballot or ballot.bit_count() != len(player_indices):
+                return vote_error('DUPLICATE_VOTE')
+
+            if voter[3].bit_count() + len(player_indices) > votes_per_user:
+                return vote_error('TOO_MANY_VOTES')
+
+            voter[3] |= ballot
+            for player_index in player_indices:
+                fields[_VOTES + player_index - 1] += 1
+            self._write_voter(slot, index, voter)
+            if voter[3].bit_count() == votes_per_user:
+                fields[_COMPLETED_COUNT] += 1
+
+            # 已投票用户数达到最大投票人数，且所有已投票的用户都完成了所有投票时，投票结束
+            current_votes = fields[_VOTER_COUNT]
+            finished = current_votes >= fields[_MAX_VOTES] and fields[_COMPLETED_COUNT] == current_votes
+            if finished:
+                fields[_STATUS] = _STATUSES.index('finished')
+            self._bump(slot, fields)
+
+            return vote_result(
+                finished,
+                current_votes,
+                fields[_MAX_VOTES],
+                list(VoterState(voter[3]).voted_players),
+                votes_per_user - voter[3].bit_count()
+            )
+
+    def reset_voting(self, room_id: str, creator_fingerprint: str) -> Dict:
+        with self._locked_room(room_id) as found:
+            if found is None:
+                return {
+                    'success': False,
+                    'error': 'ROOM_NOT_FOUND',
+                    'message': '房间不存在'
+                }
+            slot, fields = found
+
+            if fields[_CREATOR_FINGERPRINT] != creator_fingerprint.encode('utf-8'):
+                return {
+                    'success': False,
+                    'error': 'UNAUTHORIZED',
+                    'message': '只有房主可以重置投票'
+                }
+
+            fields[_STATUS] = _STATUSES.index('init')
+            fields[_VOTES:_VOTES + PLAYER_COUNT] = [0] * PLAYER_COUNT
+            fields[_VOTER_COUNT] = 0
+            fields[_STARTED_COUNT] = fields[_COMPLETED_COUNT] = 0
+            fields[_ORDER_COUNT] = 0
+            fields[_PLAYER_ORDER] = [0] * PLAYER_COUNT
+            self._bump(slot, fields)
+
+            return {
+                'success': True,
+                'message': '投票已重置'
+            }
+
+    def generate_player_order(self, room_id: str, creator_fingerprint: str) -> Dict:
+        with self._locked_room(room_id) as found:
+            if found is None:
+                return {
+                    'success': False,
+                    'error': 'ROOM_NOT_FOUND',
+                    'message': '房间不存在'
+                }
+            slot, fields = found
+
+            if fields[_CREATOR_FINGERPRINT] != creator_fingerprint.encode('utf-8'):
+                return {
+                    'success': False,
+                    'error': 'UNAUTHORIZED',
+                    'message': '只有房主可以生成排序'
+                }
+
+            # 生成1-5的随机排序
+            order = list(range(1, PLAYER_COUNT + 1))
+            random.shuffle(order)
+            fields[_PLAYER_ORDER] = order
+            fields[_ORDER_COUNT] += 1
+            self._bump(slot, fields)
+
+            return {
+                'success': True,
+                'message': '排序已生成',
+                'order': order,
+                'generation_count': fields[_ORDER_COUNT]
+            }
@@ -0,0 +1,233 @@
+"""
+OpenDotaService 的测试，上游使用本地 http.server 模拟的 OpenDota API。
+
+在 backend 目录下执行：python manage.py test app.api
+"""
+import json
+import threading
+import time
+import unittest
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from app.api.services import OpenDotaService
+
+
+def match_data(match_id):
+    """天辉获胜的比赛，夜魇（player_slot 128-132）为失败方"""
+    players = [
+        {'player_slot': slot, 'hero_id': index + 1, 'personaname': f'玩家{index + 1}', 'isRadiant': slot < 128}
+        for index, slot in enumerate([0, 1, 2, 3, 4, 128, 129, 130, 131, 132])
+    ]
+    return {'match_id': match_id, 'radiant_win': True, 'players': players}
+
+
+class _OpenDotaHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 保持连接，客户端可以复用
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        match_id = int(self.path.rsplit('/', 1)[-1])
+        status, delay = self.server.next_response(match_id, self.client_address)
+        if delay:
+            time.sleep(delay)
+        body = json.dumps(match_data(match_id) if status == 200 else {'error': 'error'}).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _OpenDotaStub(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _OpenDotaHandler)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            # 比赛ID -> 依次返回的状态码（用完后返回 200），比赛ID -> 响应延迟（秒）
+            self.statuses = {}
+            self.delays = {}
+            self.requests = []
+            self.clients = set()
+
+    def next_response(self, match_id, client_address):
+        with self._lock:
+            self.requests.append(match_id)
+            self.clients.add(client_address)
+            statuses = self.statuses.get(match_id)
+            status = statuses.pop(0) if statuses else 200
+            return status, self.delays.get(match_id, 0)
+
+    def request_count(self, match_id=None):
+        with self._lock:
+            if match_id is None:
+                return len(self.requests)
+            return self.requests.count(match_id)
+
+
+class OpenDotaServiceTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = _OpenDotaStub()
+        cls.server_thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.server_thread.start()
+        cls.saved = {name: getattr(OpenDotaService, name) for name in (
+            'BASE_URL', 'cache_size', 'cache_ttl', '_session', '_match_cache', '_inflight', '_cache_stats',
+            '_disk_cache'
+        )}
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        for name, value in cls.saved.items():
+            setattr(OpenDotaService, name, value)
+
+    def setUp(self):
+        self.server.reset()
+        # 每个测试使用新的连接池和空缓存，不使用磁盘缓存
+        OpenDotaService.BASE_URL = f'http://127.0.0.1:{self.server.server_address[1]}/api'
+        OpenDotaService.cache_size = 1024
+        OpenDotaService.cache_ttl = 60
+        OpenDotaService._session = None
+        OpenDotaService._match_cache = OrderedDict()
+        OpenDotaService._inflight = {}
+        OpenDotaService._cache_stats = {'hits': 0, 'misses': 0, 'shared': 0, 'disk_hits': 0}
+        OpenDotaService._disk_cache = None
+        self.service = OpenDotaService()
+
+    def tearDown(self):
+        if OpenDotaService._session is not None:
+            OpenDotaService._session.close()
+            OpenDotaService._session = None
+
+    def test_losing_team_heroes(self):
+        heroes = self.service.get_losing_team_heroes(1001)
+        self.assertEqual([player['player_slot'] for player in heroes], [128, 129, 130, 131, 132])
+        self.assertEqual([player['hero_id'] for player in heroes], [6, 7, 8, 9, 10])
+        self.assertEqual(heroes[0]['nickname'], '玩家6')
+
+    def test_connection_reuse(self):
+        for match_id in range(2001, 2006):
+            self.service.get_losing_team_heroes(match_id)
+        self.assertEqual(self.server.request_count(), 5)
+        # 依次发出的请求共用同一个连接
+        self.assertEqual(len(self.server.clients), 1)
+
+    def test_cache_hit(self):
+        first = self.service.get_losing_team_heroes(3001)
+        second = self.service.get_losing_team_heroes(3001)
+        self.assertEqual(first, second)
+        self.assertEqual(self.server.request_count(3001), 1)
+        self.assertEqual(self.service.get_cached_losing_team_heroes(3001), first)
+        stats = OpenDotaService.get_cache_stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['size']), (2, 1, 1))
+        # 返回的是副本，修改不影响缓存
+        second[0]['nickname'] = 'changed'
+        self.assertEqual(self.service.get_losing_team_heroes(3001), first)
+
+    def test_cache_expiry(self):
+        OpenDotaService.configure(cache_ttl=0.2)
+        self.service.get_losing_team_heroes(4001)
+        self.service.get_losing_team_heroes(4001)
+        self.assertEqual(self.server.request_count(4001), 1)
+        time.sleep(0.3)
+        self.assertIsNone(self.service.get_cached_losing_team_heroes(4001))
+        self.service.get_losing_team_heroes(4001)
+        self.assertEqual(self.server.request_count(4001), 2)
+
+    def test_concurrent_requests_share_fetch(self):
+        self.server.delays[5001] = 0.3
+        threads = 8
+        barrier = threading.Barrier(threads)
+        results = []
+
+        def fetch():
+            barrier.wait()
+            results.append(OpenDotaService().get_losing_team_heroes(5001))
+
+        workers = [threading.Thread(target=fetch) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(self.server.request_count(5001), 1)
+        self.assertEqual(len(results), threads)
+        self.assertTrue(all(result == results[0] for result in results))
+        stats = OpenDotaService.get_cache_stats()
+        self.assertEqual((stats['misses'], stats['shared']), (1, threads - 1))
+
+    def test_retry_then_success(self):
+        self.server.statuses[6001] = [503]
+        heroes = self.service.get_losing_team_heroes(6001)
+        self.assertEqual(len(heroes), 5)
+        self.assertEqual(self.server.request_count(6001), 2)
+        # 重试成功的结果正常缓存
+        self.service.get_losing_team_heroes(6001)
+        self.assertEqual(self.server.request_count(6001), 2)
+
+    def test_failure_after_retries_not_cached(self):
+        self.server.statuses[7001] = [500, 500, 500]
+        with self.assertRaises(requests.RequestException):
+            self.service.get_losing_team_heroes(7001)
+        # 第一次请求加 2 次重试
+        self.assertEqual(self.server.request_count(7001), 3)
+        self.assertIsNone(self.service.get_cached_losing_team_heroes(7001))
+        self.assertEqual(OpenDotaService._inflight, {})
+
+        # 失败结果不缓存，下一次重新请求上游
+        self.assertEqual(len(self.service.get_losing_team_heroes(7001)), 5)
+        self.assertEqual(self.server.request_count(7001), 4)
+
+    def test_client_error_not_retried_or_cached(self):
+        self.server.statuses[8001] = [404]
+        with self.assertRaises(requests.HTTPError):
+            self.service.get_losing_team_heroes(8001)
+        self.assertEqual(self.server.request_count(8001), 1)
+        self.assertIsNone(self.service.get_cached_losing_team_heroes(8001))
+
+        self.assertEqual(len(self.service.get_losing_team_heroes(8001)), 5)
+        self.assertEqual(self.server.request_count(8001), 2)
+
+    def test_concurrent_failure_shared_not_cached(self):
+        self.server.statuses[9001] = [404]
+        self.server.delays[9001] = 0.3
+        threads = 4
+        barrier = threading.Barrier(threads)
+        errors = []
+
+        def fetch():
+            barrier.wait()
+            try:
+                OpenDotaService().get_losing_team_heroes(9001)
+            except requests.HTTPError as e:
+                errors.append(e)
+
+        workers = [threading.Thread(target=fetch) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        # 等待中的请求共享同一个失败结果
+        self.assertEqual(len(errors), threads)
+        self.assertEqual(self.server.request_count(9001), 1)
+        self.server.delays[9001] = 0
+        self.service.get_losing_team_heroes(9001)
+        self.assertEqual(self.server.request_count(9001), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,200 @@
+"""
+RedisRoomBackend 的测试，使用 fakeredis 代替 Redis 服务（需要 fakeredis[lua] 执行 Lua 脚本，见 requirements-dev.txt）。
+
+在 backend 目录下执行：python manage.py test app.api
+"""
+import unittest
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+from app.api.services import RoomCreateError
+from bench._common import HEROES
+
+if fakeredis is not None:
+    from app.api.redis_backend import RedisRoomBackend
+
+
+@unittest.skipIf(fakeredis is None, '需要安装 fakeredis')
+class RedisRoomBackendTests(unittest.TestCase):
+
+    def setUp(self):
+        # 每个测试使用独立的 fakeredis 服务，互不影响
+        client = fakeredis.FakeRedis(server=fakeredis.FakeServer(), decode_responses=True)
+        self.backend = RedisRoomBackend(client=client)
+
+    def create_room(self, room_id='room-1', room_password='password-1', max_votes=2, votes_per_user=1,
+                    heroes=HEROES):
+        return self.backend.create_room(
+            room_id=room_id,
+            room_password=room_password,
+            match_id=7000000000,
+            max_votes=max_votes,
+            votes_per_user=votes_per_user,
+            creator_username='房主',
+            creator_fingerprint='creator',
+            heroes=heroes
+        )
+
+    def start_and_vote(self, user_fingerprint, player_index, room_id='room-1'):
+        self.backend.start_user_voting(room_id, user_fingerprint)
+        return self.backend.vote(room_id, user_fingerprint, player_index, f'用户-{user_fingerprint}')
+
+    def test_create_room(self):
+        snapshot = self.create_room()
+        self.assertEqual(snapshot.room_id, 'room-1')
+        self.assertEqual(snapshot.status, 'init')
+
+        room = self.backend.get_room_snapshot('password-1')
+        self.assertEqual(room.room_id, 'room-1')
+        self.assertEqual(room.match_id, 7000000000)
+        self.assertEqual(room.max_votes, 2)
+        self.assertEqual(room.creator_username, '房主')
+        self.assertEqual(room.heroes, HEROES)
+        self.assertEqual(room.status, 'init')
+        self.assertEqual(dict(room.votes), {})
+        self.assertEqual(dict(room.voted_users), {})
+        self.assertTrue(self.backend.room_exists('room-1'))
+        self.assertTrue(self.backend.room_exists_by_password('password-1'))
+        self.assertEqual(self.backend.get_room_version_by_password('password-1'), ('room-1', room.version))
+        self.assertIsNone(self.backend.get_room_snapshot('unknown'))
+
+    def test_create_room_collision(self):
+        self.create_room()
+        with self.assertRaises(RoomCreateError) as context:
+            self.create_room(room_id='room-2')
+        self.assertEqual(context.exception.code, 'ROOM_PASSWORD_EXISTS')
+        with self.assertRaises(RoomCreateError) as context:
+            self.create_room(room_password='password-2')
+        self.assertEqual(context.exception.code, 'ROOM_ID_EXISTS')
+        # 冲突的创建不会修改已有房间
+        self.assertFalse(self.backend.room_exists('room-2'))
+        self.assertFalse(self.backend.room_exists_by_password('password-2'))
+
+    def test_start_voting(self):
+        self.create_room()
+        version = self.backend.get_room_version('room-1')
+        self.backend.start_voting('room-1')
+        self.backend.start_user_voting('room-1', 'voter-1')
+
+        room = self.backend.find_room('room-1')
+        self.assertEqual(room.status, 'voting')
+        self.assertTrue(room.voted_users['voter-1'].started)
+        self.assertEqual(room.started_voters, 1)
+        self.assertGreater(room.version, version)
+        with self.assertRaises(KeyError):
+            self.backend.start_user_voting('unknown', 'voter-1')
+
+    def test_vote(self):
+        self.create_room(votes_per_user=2)
+        self.assertEqual(self.backend.vote('room-1', 'voter-1', 1)['error'], 'VOTING_NOT_STARTED')
+
+        result = self.start_and_vote('voter-1', 3)
+        self.assertTrue(result['success'])
+        self.assertFalse(result['finished'])
+        self.assertEqual(result['user_voted_players'], [3])
+        self.assertEqual(result['user_remaining_votes'], 1)
+
+        room = self.backend.find_room('room-1')
+        self.assertEqual(dict(room.votes), {'3': 1})
+        self.assertEqual(room.voted_users['voter-1'].voted_players, (3,))
+        self.assertEqual(room.voted_usernames, ('用户-voter-1',))
+
+    def test_vote_many(self):
+        self.create_room(votes_per_user=3)
+        self.backend.start_user_voting('room-1', 'voter-1')
+        result = self.backend.vote_many('room-1', 'voter-1', [2, 4], '用户')
+        self.assertTrue(result['success'])
+        self.assertEqual(result['user_voted_players'], [2, 4])
+        self.assertEqual(result['user_remaining_votes'], 1)
+        self.assertEqual(self.backend.vote_many('room-1', 'voter-1', [1, 5])['error'], 'TOO_MANY_VOTES')
+        # 任何一票不合法时都不写入
+        self.assertEqual(dict(self.backend.find_room('room-1').votes), {'2': 1, '4': 1})
+
+    def test_duplicate_vote(self):
+        self.create_room(votes_per_user=2)
+        self.start_and_vote('voter-1', 1)
+        self.assertEqual(self.backend.vote('room-1', 'voter-1', 1)['error'], 'DUPLICATE_VOTE')
+        self.assertEqual(self.backend.vote_many('room-1', 'voter-1', [2, 2])['error'], 'DUPLICATE_VOTE')
+        self.assertTrue(self.backend.vote('room-1', 'voter-1', 2)['success'])
+        self.assertEqual(self.backend.vote('room-1', 'voter-1', 3)['error'], 'ALREADY_VOTED')
+        self.assertEqual(dict(self.backend.find_room('room-1').votes), {'1': 1, '2': 1})
+
+    def test_finish(self):
+        self.create_room(max_votes=2)
+        self.backend.start_voting('room-1')
+        self.assertFalse(self.start_and_vote('voter-1', 1)['finished'])
+        result = self.start_and_vote('voter-2', 1)
+        self.assertTrue(result['finished'])
+        self.assertEqual(result['current_votes'], 2)
+
+        room = self.backend.find_room('room-1')
+        self.assertEqual(room.status, 'finished')
+        self.assertEqual(room.completed_voters, 2)
+
+    def test_reset(self):
+        self.create_room(max_votes=1)
+        self.start_and_vote('voter-1', 2)
+        self.assertEqual(self.backend.reset_voting('room-1', 'voter-1')['error'], 'UNAUTHORIZED')
+        self.assertEqual(self.backend.reset_voting('unknown', 'creator')['error'], 'ROOM_NOT_FOUND')
+
+        self.assertTrue(self.backend.reset_voting('room-1', 'creator')['success'])
+        room = self.backend.find_room('room-1')
+        self.assertEqual(room.status, 'init')
+        self.assertEqual(dict(room.votes), {})
+        self.assertEqual(dict(room.voted_users), {})
+        self.assertEqual((room.started_voters, room.completed_voters), (0, 0))
+        # 重置后同一用户可以重新投票
+        self.assertTrue(self.start_and_vote('voter-1', 4)['success'])
+
+    def test_generate_player_order(self):
+        self.create_room()
+        self.assertEqual(self.backend.generate_player_order('room-1', 'voter-1')['error'], 'UNAUTHORIZED')
+
+        result = self.backend.generate_player_order('room-1', 'creator')
+        self.assertTrue(result['success'])
+        self.assertEqual(sorted(result['order']), [1, 2, 3, 4, 5])
+        self.assertEqual(result['generation_count'], 1)
+
+        room = self.backend.find_room('room-1')
+        self.assertEqual(list(room.player_order), result['order'])
+        self.assertEqual(room.order_generation_count, 1)
+
+    def test_delete_room(self):
+        self.create_room()
+        self.assertTrue(self.backend.delete_room('room-1'))
+        self.assertFalse(self.backend.delete_room('room-1'))
+        self.assertIsNone(self.backend.find_room('room-1'))
+        self.assertIsNone(self.backend.get_room_snapshot('password-1'))
+        self.assertFalse(self.backend.room_exists_by_password('password-1'))
+        # 删除后房间ID和密码可以再次使用
+        self.create_room()
+        self.assertEqual(self.backend.get_room_snapshot('password-1').status, 'init')
+
+    def test_pending_room_complete(self):
+        snapshot = self.create_room(heroes=None)
+        self.assertEqual(snapshot.status, 'pending')
+        self.assertEqual(self.backend.find_room('room-1').heroes, [])
+
+        self.assertTrue(self.backend.complete_room('room-1', HEROES))
+        room = self.backend.get_room_snapshot('password-1')
+        self.assertEqual(room.status, 'init')
+        self.assertEqual(room.heroes, HEROES)
+        # 只有 pending 房间可以写入英雄或标记失败
+        self.assertFalse(self.backend.complete_room('room-1', HEROES))
+        self.assertFalse(self.backend.fail_room('room-1'))
+
+    def test_pending_room_failed(self):
+        self.create_room(heroes=None)
+        self.assertTrue(self.backend.fail_room('room-1'))
+        room = self.backend.find_room('room-1')
+        self.assertEqual(room.status, 'failed')
+        self.assertEqual(room.heroes, [])
+        self.assertFalse(self.backend.complete_room('room-1', HEROES))
+        self.assertFalse(self.backend.fail_room('unknown'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,15 +1,25 @@
 """
 API URL configuration.
 """
+from django.conf import settings
 from django.urls import path
 from . import views
 
+# ASGI 部署时，会长时间挂起的接口和创建房间使用异步视图
+if settings.ROOM_ASYNC_VIEWS:
+    from . import async_views as room_views
+else:
+    room_views = views
+
 urlpatterns = [
     # 注意：更具体的路由必须放在前面，避免被通用路由拦截
     path('rooms/<str:room_id>/start', views.RoomStartView.as_view(), name='room-start'),
     path('rooms/<str:room_id>/vote', views.RoomVoteView.as_view(), name='room-vote'),
+    path('rooms/<str:room_id>/votes', views.RoomVotesView.as_view(), name='room-votes'),
     path('rooms/<str:room_id>/reset', views.RoomResetView.as_view(), name='room-reset'),
+    path('rooms/<str:room_id>/events', room_views.RoomEventsView.as_view(), name='room-events'),
     path('rooms/<str:room_id>/generate-order', views.RoomGenerateOrderView.as_view(), name='room-generate-order'),
-    path('rooms/<str:room_id>', views.RoomDetailView.as_view(), name='room-detail'),
-    path('rooms', views.RoomCreateView.as_view(), name='room-create'),
+    path('rooms/<str:room_id>', room_views.RoomDetailView.as_view(), name='room-detail'),
+    path('rooms', room_views.RoomCreateView.as_view(), name='room-create'),
+    path('stats', views.RoomStatsView.as_view(), name='room-stats'),
 ]
@@ -4,89 +4,258 @@ API views for rooms and voting.
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views import View
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
-from .services import get_room_service, OpenDotaService
+from ..metrics import CONTENT_TYPE, REGISTRY, Counter, Family, process_families
+from ..middleware import profile_token_matches
+from ..profiling import get_profiler
+from .renderers import ORJSONRenderer
+from .services import (
+    PLAYER_COUNT,
+    OpenDotaService,
+    RoomCreateError,
+    RoomSnapshot,
+    VoterState,
+    get_room_heroes_fetcher,
+    get_room_service
+)
+import hashlib
+import os
+import random
+import threading
 import uuid
 import time
 import logging
+from typing import Dict, List, Optional, Tuple
 
 logger = logging.getLogger('app.api.views')
 
+# 房间详情缓存（按快照版本）的命中情况：hit 直接使用，miss 重新序列化
+_PAYLOAD_CACHE = Counter('mole_room_payload_cache_total', '房间详情序列化缓存的查找次数', ('result',))
+_PAYLOAD_HIT = ('hit',)
+_PAYLOAD_MISS = ('miss',)
 
-@method_decorator(csrf_exempt, name='dispatch')
-class RoomCreateView(APIView):
-    """创建房间接口"""
+# 房间ID冲突时创建房间的最多尝试次数
+_CREATE_ROOM_ATTEMPTS = 3
 
-    def post(self, request):
-        match_id = request.data.get('match_id')
-        room_password = request.data.get('room_password')
-        max_votes = request.data.get('max_votes', 5)
-        votes_per_user = request.data.get('votes_per_user', 1)
-        username = request.data.get('username')
-        show_only_winner_votes = request.data.get('show_only_winner_votes', True)
-        user_fingerprint = request.headers.get('X-User-Fingerprint')
+# 同时保持的 SSE 连接数上限，每条连接会占用一个工作线程
+_event_stream_slots = threading.BoundedSemaphore(settings.ROOM_EVENTS_MAX_STREAMS)
+# 同时阻塞等待的长轮询请求数上限，超出时直接按普通轮询返回，避免占满线程池
+_long_poll_slots = threading.BoundedSemaphore(settings.ROOM_LONG_POLL_MAX_WAITERS)
 
-        if not match_id:
-            return Response({
-                'success': False,
-                'error': 'VALIDATION_ERROR',
-                'message': '比赛ID不能为空'
-            }, status=status.HTTP_400_BAD_REQUEST)
 
-        if not username:
-            return Response({
-                'success': False,
-                'error': 'VALIDATION_ERROR',
-                'message': '用户名不能为空'
-            }, status=status.HTTP_400_BAD_REQUEST)
+def _room_etag(room_id: str, version: int, user_fingerprint: str = None) -> str:
+    """根据房间版本和用户指纹生成 ETag（不同用户看到的房间详情不同）"""
+    digest = hashlib.md5(f'{room_id}:{version}:{user_fingerprint or ""}'.encode('utf-8')).hexdigest()
+    return f'"{digest[:16]}"'
 
-        if not user_fingerprint:
-            return Response({
-                'success': False,
-                'error': 'UNAUTHORIZED',
-                'message': '请提供用户指纹'
-            }, status=status.HTTP_401_UNAUTHORIZED)
 
-        try:
-            match_id = int(match_id)
-            max_votes = int(max_votes)
-            votes_per_user = int(votes_per_user)
-        except (ValueError, TypeError):
-            return Response({
-                'success': False,
-                'error': 'VALIDATION_ERROR',
-                'message': '参数格式错误'
-            }, status=status.HTTP_400_BAD_REQUEST)
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """判断 If-None-Match 请求头是否包含指定 ETag（忽略弱校验前缀 W/）"""
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
 
-        # 房间ID使用时间戳生成
-        room_id = str(int(time.time() * 1000))
-        
-        # 如果没有提供房间密码，自动生成
-        if not room_password:
-            room_password = str(uuid.uuid4())
 
-        room_service = get_room_service()
-        # 检查房间密码是否已被使用
-        if room_service.room_exists_by_password(room_password):
-            return Response({
-                'success': False,
-                'error': 'ROOM_PASSWORD_EXISTS',
-                'message': '该房间密码已被使用，请更换房间密码'
-            }, status=status.HTTP_400_BAD_REQUEST)
+def _render_fields(renderer: ORJSONRenderer, data: Dict) -> bytes:
+    """序列化字典并去掉两端的花括号，得到可以拼接到其他对象中的 "key":value 片段"""
+    return renderer.render(data)[1:-1]
 
-        try:
-            heroes = OpenDotaService().get_losing_team_heroes(match_id)
-        except Exception as e:
-            return Response({
-                'success': False,
-                'error': 'INVALID_MATCH_ID',
-                'message': f'无法获取比赛数据，请检查比赛ID是否正确'
-            }, status=status.HTTP_400_BAD_REQUEST)
 
+def _viewer_fragments() -> Dict[Tuple[int, bool], bytes]:
+    """当前用户投票信息的 JSON 片段：(投票位图, 是否已开始投票) -> ,"user_voted_players":[...],"user_started_voting":..."""
+    renderer = ORJSONRenderer()
+    return {
+        (mask, started): b',' + _render_fields(renderer, {
+            'user_voted_players': VoterState(mask).voted_players,
+            'user_started_voting': started
+        })
+        for mask in range(1 << PLAYER_COUNT)
+        for started in (False, True)
+    }
+
+
+# 投票位图和开始状态的组合只有 64 种，预先序列化
+_VIEWER_FRAGMENTS = _viewer_fragments()
+
+
+class _RoomPayload:
+    """某个快照版本下序列化后的房间详情
+
+    所有观众共享的字段只序列化一次并缓存在快照上，快照随房间版本更新而替换，缓存随之失效；
+    每个请求只需要在共享部分之间插入当前用户的投票信息片段。
+    没有用户指纹、未参与投票的用户以及已结束的房间直接返回缓存的完整结果。
+    """
+
+    # 房间详情接口的响应体：{"success":true,"data":<房间详情>}
+    _RESPONSE_HEAD = b'{"success":true,"data":'
+    _RESPONSE_TAIL = b'}'
+
+    __slots__ = ('voted_users', 'anonymous', 'spectator', 'head', 'tail')
+
+    def __init__(self, snapshot: RoomSnapshot):
+        renderer = ORJSONRenderer()
+        data = snapshot.to_dict()
+        # 只引用投票用户映射而不引用快照本身，避免快照与缓存之间形成循环引用
+        self.voted_users = snapshot.voted_users
+        # 以下各项都是 (房间详情, 接口响应体) 两种形式
+        anonymous = renderer.render(data)
+        self.anonymous = (anonymous, self._RESPONSE_HEAD + anonymous + self._RESPONSE_TAIL)
+        if snapshot.status == 'finished':
+            # 已结束的房间不包含用户投票信息
+            self.head = self.tail = None
+            self.spectator = self.anonymous
+            return
+        # 用户投票信息位于基础字段和已投票用户名列表之间
+        voted_usernames = data.pop('voted_usernames')
+        head = renderer.render(data)[:-1]
+        tail = b',' + _render_fields(renderer, {'voted_usernames': voted_usernames}) + b'}'
+        self.head = (head, self._RESPONSE_HEAD + head)
+        self.tail = (tail, tail + self._RESPONSE_TAIL)
+        spectator = head + _VIEWER_FRAGMENTS[0, False] + tail
+        self.spectator = (spectator, self._RESPONSE_HEAD + spectator + self._RESPONSE_TAIL)
+
+    @classmethod
+    def of(cls, snapshot: RoomSnapshot) -> '_RoomPayload':
+        payload = snapshot.derived.get('payload')
+        if payload is None:
+            payload = snapshot.derived['payload'] = cls(snapshot)
+            _PAYLOAD_CACHE.inc(_PAYLOAD_MISS)
+        else:
+            _PAYLOAD_CACHE.inc(_PAYLOAD_HIT)
+        return payload
+
+    def _render(self, user_fingerprint: Optional[str], form: int) -> bytes:
+        if not user_fingerprint:
+            return self.anonymous[form]
+        voter = self.voted_users.get(user_fingerprint) if self.head is not None else None
+        if voter is None:
+            return self.spectator[form]
+        return b''.join((self.head[form], _VIEWER_FRAGMENTS[voter.voted_mask, voter.started], self.tail[form]))
+
+    def data(self, user_fingerprint: str = None) -> bytes:
+        """当前用户视角下的房间详情，与 JSONRenderer().render(snapshot.to_dict(user_fingerprint)) 相同"""
+        return self._render(user_fingerprint, 0)
+
+    def response(self, user_fingerprint: str = None) -> bytes:
+        """房间详情接口的响应体，与 JSONRenderer().render({'success': True, 'data': ...}) 相同"""
+        return self._render(user_fingerprint, 1)
+
+
+def _room_not_ready_response(room):
+    """pending / failed 房间还没有英雄数据，不能投票或进行房主操作，其他状态返回 None"""
+    if room.status == 'pending':
+        return Response({
+            'success': False,
+            'error': 'ROOM_PENDING',
+            'message': '正在获取比赛数据，请稍候'
+        }, status=status.HTTP_409_CONFLICT)
+    if room.status == 'failed':
+        return Response({
+            'success': False,
+            'error': 'INVALID_MATCH_ID',
+            'message': '无法获取比赛数据，请检查比赛ID是否正确'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    return None
+
+
+def _new_room_id() -> str:
+    """生成房间ID：毫秒时间戳加 3 位随机数
+
+    共享存储（Redis / 共享内存）时多个 worker 可能在同一毫秒内创建房间，随机后缀让冲突极少发生，
+    冲突时 _create_room 重新生成。
+    """
+    return f'{int(time.time() * 1000)}{random.randrange(1000):03d}'
+
+
+def _create_room(data, user_fingerprint: str, submit_fetch) -> Tuple[Dict, int]:
+    """创建房间，返回 (响应数据, 状态码)，同步和异步视图共用
+
+    比赛数据已缓存时直接创建房间；否则创建 pending 房间，调用 submit_fetch(房间ID, 比赛ID) 交给后台获取。
+    """
+    match_id = data.get('match_id')
+    room_password = data.get('room_password')
+    max_votes = data.get('max_votes', 5)
+    votes_per_user = data.get('votes_per_user', 1)
+    username = data.get('username')
+    show_only_winner_votes = data.get('show_only_winner_votes', True)
+
+    if not match_id:
+        return {
+            'success': False,
+            'error': 'VALIDATION_ERROR',
+            'message': '比赛ID不能为空'
+        }, status.HTTP_400_BAD_REQUEST
+
+    if not username:
+        return {
+            'success': False,
+            'error': 'VALIDATION_ERROR',
+            'message': '用户名不能为空'
+        }, status.HTTP_400_BAD_REQUEST
+
+    if not user_fingerprint:
+        return {
+            'success': False,
+            'error': 'UNAUTHORIZED',
+            'message': '请提供用户指纹'
+        }, status.HTTP_401_UNAUTHORIZED
+
+    try:
+        match_id = int(match_id)
+        max_votes = int(max_votes)
+        votes_per_user = int(votes_per_user)
+    except (ValueError, TypeError):
+        return {
+            'success': False,
+            'error': 'VALIDATION_ERROR',
+            'message': '参数格式错误'
+        }, status.HTTP_400_BAD_REQUEST
+
+    if max_votes < 1 or votes_per_user < 1:
+        return {
+            'success': False,
+            'error': 'VALIDATION_ERROR',
+            'message': '最大投票人数和每人票数必须大于 0'
+        }, status.HTTP_400_BAD_REQUEST
+
+    # 如果没有提供房间密码，自动生成
+    if not room_password:
+        room_password = str(uuid.uuid4())
+
+    room_service = get_room_service()
+    # 检查房间密码是否已被使用
+    if room_service.room_exists_by_password(room_password):
+        return {
+            'success': False,
+            'error': 'ROOM_PASSWORD_EXISTS',
+            'message': '该房间密码已被使用，请更换房间密码'
+        }, status.HTTP_400_BAD_REQUEST
+
+    # 未缓存的比赛不在请求线程中访问 OpenDota，heroes 为 None 时创建 pending 房间
+    heroes = OpenDotaService().get_cached_losing_team_heroes(match_id)
+
+    # 存储后端的上限（共享内存后端的投票人数和字段长度）
+    limit_error = room_service.check_room_limits(room_password, max_votes, user_fingerprint, heroes)
+    if limit_error is not None:
+        return {
+            'success': False,
+            'error': 'VALIDATION_ERROR',
+            'message': limit_error
+        }, status.HTTP_400_BAD_REQUEST
+
+    attempts = _CREATE_ROOM_ATTEMPTS
+    while True:
         try:
             room = room_service.create_room(
-                room_id=room_id,
+                room_id=_new_room_id(),
                 room_password=room_password,
                 match_id=match_id,
                 max_votes=max_votes,
@@ -96,101 +265,171 @@ class RoomCreateView(APIView):
                 heroes=heroes,
                 show_only_winner_votes=show_only_winner_votes
             )
+            break
+        except RoomCreateError as e:
+            # 检查之后、创建之前密码被其他请求（或其他 worker）占用
+            if e.code == 'ROOM_PASSWORD_EXISTS':
+                return {
+                    'success': False,
+                    'error': 'ROOM_PASSWORD_EXISTS',
+                    'message': str(e)
+                }, status.HTTP_400_BAD_REQUEST
+            # 房间ID冲突时重新生成
+            attempts -= 1
+            if attempts > 0:
+                continue
+            return {
+                'success': False,
+                'error': 'CREATE_ROOM_ERROR',
+                'message': f'创建房间失败: {str(e)}'
+            }, status.HTTP_500_INTERNAL_SERVER_ERROR
         except Exception as e:
-            return Response({
+            return {
                 'success': False,
                 'error': 'CREATE_ROOM_ERROR',
                 'message': f'创建房间失败: {str(e)}'
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            }, status.HTTP_500_INTERNAL_SERVER_ERROR
+
+    if heroes is None and not submit_fetch(room.room_id, match_id):
+        room_service.delete_room(room.room_id)
+        return {
+            'success': False,
+            'error': 'SERVICE_BUSY',
+            'message': '创建房间的请求过多，请稍后重试'
+        }, status.HTTP_503_SERVICE_UNAVAILABLE
+
+    # 打印房间创建成功信息
+    logger.info(
+        f"房间创建成功 - 比赛ID: {room.match_id}, "
+        f"房间ID: {room.room_id}, "
+        f"房间密码: {room.room_password}, "
+        f"创建者: {room.creator_username}, "
+        f"最大投票人数: {room.max_votes}, "
+        f"每人票数: {room.votes_per_user}, "
+        f"状态: {room.status}, "
+        f"只展示内鬼得票: {room.show_only_winner_votes}, "
+        f"英雄数量: {len(room.heroes) if room.heroes else 0}"
+    )
+
+    return {
+        'success': True,
+        'data': {
+            'room_id': room.room_id,
+            'room_password': room.room_password,
+            'match_id': room.match_id,
+            'status': room.status,
+            'max_votes': room.max_votes,
+            'votes_per_user': room.votes_per_user,
+            'creator_username': room.creator_username,
+            'heroes': room.heroes,
+            'show_only_winner_votes': room.show_only_winner_votes
+        }
+    }, status.HTTP_202_ACCEPTED if room.status == 'pending' else status.HTTP_200_OK
 
-        # 打印房间创建成功信息
-        logger.info(
-            f"房间创建成功 - 比赛ID: {room['match_id']}, "
-            f"房间ID: {room['room_id']}, "
-            f"房间密码: {room['room_password']}, "
-            f"创建者: {room['creator_username']}, "
-            f"最大投票人数: {room['max_votes']}, "
-            f"每人票数: {room['votes_per_user']}, "
-            f"状态: {room['status']}, "
-            f"只展示内鬼得票: {room.get('show_only_winner_votes', True)}, "
-            f"英雄数量: {len(room['heroes']) if room.get('heroes') else 0}"
-        )
 
-        return Response({
-            'success': True,
-            'data': {
-                'room_id': room['room_id'],
-                'room_password': room['room_password'],
-                'match_id': room['match_id'],
-                'status': room['status'],
-                'max_votes': room['max_votes'],
-                'votes_per_user': room['votes_per_user'],
-                'creator_username': room['creator_username'],
-                'heroes': room['heroes'],
-                'show_only_winner_votes': room.get('show_only_winner_votes', True)
-            }
-        })
+@method_decorator(csrf_exempt, name='dispatch')
+class RoomCreateView(APIView):
+    """创建房间接口
+
+    比赛数据已缓存时直接创建房间；否则创建 pending 房间并交给后台获取，立即返回 202，
+    客户端进入房间后通过房间详情（长轮询 / SSE 推送）得知英雄数据已就绪（init）或获取失败（failed）。
+    """
+
+    def post(self, request):
+        data, status_code = _create_room(
+            request.data, request.headers.get('X-User-Fingerprint'), get_room_heroes_fetcher().submit
+        )
+        return Response(data, status=status_code)
+
+
+def _long_poll_target(room_service, room_password: str, since, wait) -> Optional[Tuple[str, int, float]]:
+    """解析长轮询参数，需要等待时返回 (房间ID, since, 等待秒数)
+
+    参数缺失或格式错误、房间不存在或版本号已超过 since 时返回 None，不需要等待。
+    """
+    try:
+        since = int(since)
+        wait = min(float(wait), settings.ROOM_LONG_POLL_MAX_WAIT)
+    except (TypeError, ValueError):
+        return None
+    if wait <= 0:
+        return None
+
+    room_version = room_service.get_room_version_by_password(room_password)
+    if room_version is None or room_version[1] > since:
+        return None
+    return room_version[0], since, wait
+
+
+def _wait_for_room_change(room_service, room_password: str, since, wait):
+    """长轮询：房间版本号不超过 since 时阻塞等待变化，最多等待 wait 秒
+
+    参数缺失或格式错误时不等待；等待名额已满时也立即返回，退化为普通轮询。
+    """
+    target = _long_poll_target(room_service, room_password, since, wait)
+    if target is None:
+        return
+
+    if not _long_poll_slots.acquire(blocking=False):
+        return
+    try:
+        room_service.wait_for_version(*target)
+    finally:
+        _long_poll_slots.release()
+
+
+def _room_detail(
+    room_service, room_password: str, user_fingerprint: str, if_none_match: str
+) -> Tuple[bytes, int, Dict[str, str]]:
+    """构建房间详情响应，返回 (JSON 响应体, 状态码, 响应头)，房间未变化时响应体为空（304）"""
+    # 房间未变化时直接返回 304，不再构建响应数据
+    if if_none_match:
+        room_version = room_service.get_room_version_by_password(room_password)
+        if room_version is not None:
+            etag = _room_etag(room_version[0], room_version[1], user_fingerprint)
+            if _etag_matches(if_none_match, etag):
+                return b'', status.HTTP_304_NOT_MODIFIED, {
+                    'ETag': etag,
+                    'X-Room-Version': str(room_version[1])
+                }
+
+    # 通过房间密码获取当前用户视角下的房间快照
+    snapshot = room_service.get_room_snapshot(room_password)
+    if snapshot is None:
+        return ORJSONRenderer().render({
+            'success': False,
+            'error': 'ROOM_NOT_FOUND',
+            'message': '房间不存在'
+        }), status.HTTP_404_NOT_FOUND, {}
+
+    return _RoomPayload.of(snapshot).response(user_fingerprint), status.HTTP_200_OK, {
+        'ETag': _room_etag(snapshot.room_id, snapshot.version, user_fingerprint),
+        'X-Room-Version': str(snapshot.version)
+    }
 
 
 @method_decorator(csrf_exempt, name='dispatch')
 class RoomDetailView(APIView):
-    """获取房间信息接口"""
+    """获取房间信息接口
+
+    支持长轮询：带上 ?since=<版本号>&wait=<秒数> 时，房间版本号超过 since 或超时后才返回。
+    当前版本号通过 X-Room-Version 响应头返回。
+    """
 
     def get(self, request, room_id):
         try:
             user_fingerprint = request.headers.get('X-User-Fingerprint')
             room_service = get_room_service()
 
-            # 通过房间密码查找房间
-            room = room_service.get_room_by_password(room_id)
-            if not room:
-                return Response({
-                    'success': False,
-                    'error': 'ROOM_NOT_FOUND',
-                    'message': '房间不存在'
-                }, status=status.HTTP_404_NOT_FOUND)
-
-            response_data = {
-                'room_id': room.get('room_id', ''),
-                'room_password': room.get('room_password', ''),
-                'match_id': room.get('match_id', 0),
-                'status': room.get('status', 'init'),
-                'max_votes': room.get('max_votes', 5),
-                'votes_per_user': room.get('votes_per_user', 1),
-                'current_votes': room.get('current_votes', 0),
-                'creator_username': room.get('creator_username', ''),
-                'creator_fingerprint': room.get('creator_fingerprint', ''),
-                'heroes': room.get('heroes', []),
-                'show_only_winner_votes': room.get('show_only_winner_votes', True),
-                'player_order': room.get('player_order'),
-                'order_generation_count': room.get('order_generation_count', 0)
-            }
-
-            room_status = room.get('status', 'init')
-            if room_status == 'finished':
-                response_data['votes'] = room.get('votes', {})
-            else:
-                # init 和 voting 状态都返回用户投票信息
-                if user_fingerprint:
-                    try:
-                        user_voted_players = room_service.get_user_voted_players(room['room_id'], user_fingerprint)
-                        if user_voted_players is not None:
-                            response_data['user_voted_players'] = user_voted_players
-                        # 检查用户是否已开始投票
-                        user_started = room_service.has_user_started_voting(room['room_id'], user_fingerprint)
-                        response_data['user_started_voting'] = user_started
-                    except Exception:
-                        pass
-                try:
-                    voted_usernames = room_service.get_voted_usernames(room['room_id'])
-                    response_data['voted_usernames'] = voted_usernames
-                except Exception:
-                    response_data['voted_usernames'] = []
+            _wait_for_room_change(
+                room_service, room_id, request.query_params.get('since'), request.query_params.get('wait')
+            )
 
-            return Response({
-                'success': True,
-                'data': response_data
-            })
+            content, status_code, headers = _room_detail(
+                room_service, room_id, user_fingerprint, request.headers.get('If-None-Match')
+            )
+            # 响应体已经序列化，直接返回，不再经过 DRF 的渲染器
+            return HttpResponse(content, status=status_code, headers=headers, content_type='application/json')
         except Exception as e:
             return Response({
                 'success': False,
@@ -199,6 +438,92 @@ class RoomDetailView(APIView):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class _RoomEventStream:
+    """房间状态的 SSE 事件流：房间变化时推送快照，空闲时发送心跳
+
+    连接名额（slots）在 close() 中释放；WSGI 服务器无论流是否被迭代过都会调用 close()。
+    """
+
+    slots = _event_stream_slots
+
+    def __init__(self, room_service, room_password: str, room_id: str, user_fingerprint: str):
+        self.room_service = room_service
+        self.room_password = room_password
+        self.room_id = room_id
+        self.user_fingerprint = user_fingerprint
+        self.closed = False
+
+    def __iter__(self):
+        deadline = time.monotonic() + settings.ROOM_EVENTS_MAX_DURATION
+        last_version = None
+        yield 'retry: 3000\n\n'
+        while True:
+            snapshot = self.room_service.get_room_snapshot(self.room_password)
+            if snapshot is None or snapshot.room_id != self.room_id:
+                yield 'event: deleted\ndata: {}\n\n'
+                return
+
+            # 所有变更都会递增版本号，版本未变时无需重新推送
+            if snapshot.version != last_version:
+                last_version = snapshot.version
+                payload = _RoomPayload.of(snapshot).data(self.user_fingerprint).decode('utf-8')
+                yield f'event: room\ndata: {payload}\n\n'
+
+            # 连接保持一段时间后主动断开，由浏览器自动重连，避免线程被长期占用
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            version = self.room_service.wait_for_version(
+                self.room_id, last_version, min(settings.ROOM_EVENTS_HEARTBEAT, remaining)
+            )
+            if version == last_version:
+                yield ': heartbeat\n\n'
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.slots.release()
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class RoomEventsView(View):
+    """房间状态 SSE 推送接口
+
+    EventSource 无法设置请求头，因此用户指纹通过 fingerprint 查询参数传递。
+    """
+
+    def get(self, request, room_id):
+        user_fingerprint = request.GET.get('fingerprint') or request.headers.get('X-User-Fingerprint')
+        room_service = get_room_service()
+
+        # 通过房间密码查找房间
+        room = room_service.get_room_snapshot(room_id)
+        if room is None:
+            return JsonResponse({
+                'success': False,
+                'error': 'ROOM_NOT_FOUND',
+                'message': '房间不存在'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        # 连接数已满时返回 503，前端会退回到轮询
+        if not _event_stream_slots.acquire(blocking=False):
+            return JsonResponse({
+                'success': False,
+                'error': 'TOO_MANY_STREAMS',
+                'message': '实时推送连接数已满，请稍后重试'
+            }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        response = StreamingHttpResponse(
+            _RoomEventStream(room_service, room_id, room.room_id, user_fingerprint),
+            content_type='text/event-stream; charset=utf-8'
+        )
+        response['Cache-Control'] = 'no-cache'
+        # 关闭反向代理（如 nginx）的响应缓冲
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
 @method_decorator(csrf_exempt, name='dispatch')
 class RoomStartView(APIView):
     """开始投票接口"""
@@ -216,24 +541,21 @@ class RoomStartView(APIView):
         room_service = get_room_service()
 
         # 通过房间密码查找房间
-        room = room_service.get_room_by_password(room_id)
-        if not room:
+        room = room_service.get_room_snapshot(room_id)
+        if room is None:
             return Response({
                 'success': False,
                 'error': 'ROOM_NOT_FOUND',
                 'message': '房间不存在'
             }, status=status.HTTP_404_NOT_FOUND)
 
-        try:
-            actual_room_id = room['room_id']
-        except KeyError:
-            return Response({
-                'success': False,
-                'error': 'ROOM_NOT_FOUND',
-                'message': '房间不存在'
-            }, status=status.HTTP_404_NOT_FOUND)
+        actual_room_id = room.room_id
 
-        if room['status'] == 'finished':
+        not_ready = _room_not_ready_response(room)
+        if not_ready is not None:
+            return not_ready
+
+        if room.status == 'finished':
             return Response({
                 'success': False,
                 'error': 'ROOM_FINISHED',
@@ -241,7 +563,15 @@ class RoomStartView(APIView):
             }, status=status.HTTP_400_BAD_REQUEST)
 
         # 标记当前用户已开始投票（用户级别，不影响房间状态）
-        room_service.start_user_voting(actual_room_id, user_fingerprint)
+        try:
+            room_service.start_user_voting(actual_room_id, user_fingerprint)
+        except ValueError as e:
+            # 共享内存后端的投票人数 / 字段长度有上限
+            return Response({
+                'success': False,
+                'error': 'VALIDATION_ERROR',
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
 
         return Response({
             'success': True,
@@ -251,6 +581,59 @@ class RoomStartView(APIView):
         })
 
 
+def _submit_votes(room_password: str, user_fingerprint: str, player_indices: List[int], username: str) -> Response:
+    """查找房间并提交投票（参数已校验），返回接口响应"""
+    room_service = get_room_service()
+
+    # 通过房间密码查找房间
+    room = room_service.get_room_snapshot(room_password)
+    if room is None:
+        return Response({
+            'success': False,
+            'error': 'ROOM_NOT_FOUND',
+            'message': '房间不存在'
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    actual_room_id = room.room_id
+
+    not_ready = _room_not_ready_response(room)
+    if not_ready is not None:
+        return not_ready
+
+    if room.status == 'finished':
+        return Response({
+            'success': False,
+            'error': 'ROOM_FINISHED',
+            'message': '投票已结束'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    if len(player_indices) == 1:
+        result = room_service.vote(actual_room_id, user_fingerprint, player_indices[0], username)
+    else:
+        result = room_service.vote_many(actual_room_id, user_fingerprint, player_indices, username)
+
+    if not result['success']:
+        return Response({
+            'success': False,
+            'error': result['error'],
+            'message': result['message']
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    response_data = {
+        'message': result['message'],
+        'finished': result['finished'],
+        'current_votes': result['current_votes'],
+        'max_votes': result['max_votes'],
+        'user_voted_players': result['user_voted_players'],
+        'user_remaining_votes': result['user_remaining_votes']
+    }
+
+    return Response({
+        'success': True,
+        'data': response_data
+    })
+
+
 @method_decorator(csrf_exempt, name='dispatch')
 class RoomVoteView(APIView):
     """提交投票接口"""
@@ -290,55 +673,44 @@ class RoomVoteView(APIView):
                 'message': '玩家索引必须在 1-5 范围内'
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        room_service = get_room_service()
+        return _submit_votes(room_id, user_fingerprint, [player_index], username)
 
-        # 通过房间密码查找房间
-        room = room_service.get_room_by_password(room_id)
-        if not room:
-            return Response({
-                'success': False,
-                'error': 'ROOM_NOT_FOUND',
-                'message': '房间不存在'
-            }, status=status.HTTP_404_NOT_FOUND)
 
-        try:
-            actual_room_id = room['room_id']
-        except KeyError:
+@method_decorator(csrf_exempt, name='dispatch')
+class RoomVotesView(APIView):
+    """一次提交多票接口（全部成功或全部不写入），返回结果与提交投票接口相同"""
+
+    def post(self, request, room_id):
+        user_fingerprint = request.headers.get('X-User-Fingerprint')
+        username = request.data.get('username', '')
+        player_indices = request.data.get('player_indices')
+
+        if not user_fingerprint:
             return Response({
                 'success': False,
-                'error': 'ROOM_NOT_FOUND',
-                'message': '房间不存在'
-            }, status=status.HTTP_404_NOT_FOUND)
+                'error': 'UNAUTHORIZED',
+                'message': '请提供用户指纹'
+            }, status=status.HTTP_401_UNAUTHORIZED)
 
-        if room['status'] == 'finished':
+        if not player_indices or not isinstance(player_indices, list):
             return Response({
                 'success': False,
-                'error': 'ROOM_FINISHED',
-                'message': '投票已结束'
+                'error': 'VALIDATION_ERROR',
+                'message': '玩家索引列表不能为空'
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        result = room_service.vote(actual_room_id, user_fingerprint, player_index, username)
-
-        if not result['success']:
+        try:
+            player_indices = [int(player_index) for player_index in player_indices]
+        except (ValueError, TypeError):
+            player_indices = None
+        if player_indices is None or any(player_index < 1 or player_index > 5 for player_index in player_indices):
             return Response({
                 'success': False,
-                'error': result['error'],
-                'message': result['message']
+                'error': 'INVALID_PLAYER_INDEX',
+                'message': '玩家索引必须在 1-5 范围内'
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        response_data = {
-            'message': result['message'],
-            'finished': result['finished'],
-            'current_votes': result['current_votes'],
-            'max_votes': result['max_votes'],
-            'user_voted_players': result['user_voted_players'],
-            'user_remaining_votes': result['user_remaining_votes']
-        }
-
-        return Response({
-            'success': True,
-            'data': response_data
-        })
+        return _submit_votes(room_id, user_fingerprint, player_indices, username)
 
 
 @method_decorator(csrf_exempt, name='dispatch')
@@ -358,22 +730,19 @@ class RoomResetView(APIView):
         room_service = get_room_service()
 
         # 通过房间密码查找房间
-        room = room_service.get_room_by_password(room_id)
-        if not room:
+        room = room_service.get_room_snapshot(room_id)
+        if room is None:
             return Response({
                 'success': False,
                 'error': 'ROOM_NOT_FOUND',
                 'message': '房间不存在'
             }, status=status.HTTP_404_NOT_FOUND)
 
-        try:
-            actual_room_id = room['room_id']
-        except KeyError:
-            return Response({
-                'success': False,
-                'error': 'ROOM_NOT_FOUND',
-                'message': '房间不存在'
-            }, status=status.HTTP_404_NOT_FOUND)
+        actual_room_id = room.room_id
+
+        not_ready = _room_not_ready_response(room)
+        if not_ready is not None:
+            return not_ready
 
         result = room_service.reset_voting(actual_room_id, user_fingerprint)
 
@@ -413,22 +782,19 @@ class RoomGenerateOrderView(APIView):
         room_service = get_room_service()
 
         # 通过房间密码查找房间
-        room = room_service.get_room_by_password(room_id)
-        if not room:
+        room = room_service.get_room_snapshot(room_id)
+        if room is None:
             return Response({
                 'success': False,
                 'error': 'ROOM_NOT_FOUND',
                 'message': '房间不存在'
             }, status=status.HTTP_404_NOT_FOUND)
 
-        try:
-            actual_room_id = room['room_id']
-        except KeyError:
-            return Response({
-                'success': False,
-                'error': 'ROOM_NOT_FOUND',
-                'message': '房间不存在'
-            }, status=status.HTTP_404_NOT_FOUND)
+        actual_room_id = room.room_id
+
+        not_ready = _room_not_ready_response(room)
+        if not_ready is not None:
+            return not_ready
 
         result = room_service.generate_player_order(actual_room_id, user_fingerprint)
 
@@ -451,3 +817,111 @@ class RoomGenerateOrderView(APIView):
                 'order': result['order']
             }
         })
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class RoomStatsView(APIView):
+    """房间统计接口：当前房间数、各类淘汰计数、比赛缓存命中情况和后台获取任务数"""
+
+    def get(self, request):
+        data = get_room_service().get_stats()
+        data['match_cache'] = OpenDotaService.get_cache_stats()
+        data['match_fetch'] = get_room_heroes_fetcher().get_stats()
+        return Response({
+            'success': True,
+            'data': data
+        })
+
+
+def _labelled(label: str, values: Dict) -> List:
+    return [(((label, key),), value) for key, value in values.items()]
+
+
+def _room_metric_families() -> List[Family]:
+    """存储后端的房间数、淘汰次数和投票用户数（与 /api/stats 相同的数据）"""
+    room_service = get_room_service()
+    stats = room_service.get_stats()
+    backend = (('backend', stats['backend']),)
+    families = [
+        ('mole_rooms', 'gauge', '当前房间数', [(backend, stats['rooms'])]),
+        ('mole_rooms_max', 'gauge', '房间数上限', [(backend, stats['max_rooms'])]),
+        ('mole_room_evictions_total', 'counter', '按原因统计的房间淘汰次数', _labelled('reason', stats['evictions'])),
+    ]
+    voters = room_service.get_voter_stats()
+    if voters is not None:
+        families.append((
+            'mole_room_voters', 'gauge', '所有房间中的投票用户数（started 已开始投票，completed 已投完）',
+            _labelled('state', voters)
+        ))
+    return families
+
+
+def _match_metric_families() -> List[Family]:
+    """比赛数据缓存和后台获取任务（与 /api/stats 的 match_cache、match_fetch 相同）"""
+    cache = OpenDotaService.get_cache_stats()
+    fetch = get_room_heroes_fetcher().get_stats()
+    return [
+        (
+            'mole_match_cache_lookups_total', 'counter',
+            '比赛数据缓存的查找次数（hits 内存命中，disk_hits 磁盘命中，shared 等待进行中的请求，misses 未命中）',
+            _labelled('result', {key: cache[key] for key in ('hits', 'disk_hits', 'shared', 'misses')})
+        ),
+        ('mole_match_cache_entries', 'gauge', '内存中缓存的比赛数', [((), cache['size'])]),
+        ('mole_match_fetch_pending', 'gauge', '进行中和排队的比赛数据获取任务数', [((), fetch['pending'])]),
+        (
+            'mole_match_fetch_total', 'counter', '后台比赛数据获取任务数（按结果）',
+            _labelled('result', {key: fetch[key] for key in ('completed', 'failed', 'rejected')})
+        ),
+    ]
+
+
+class MetricsView(View):
+    """
+    Prometheus 指标接口（GET /metrics，文本格式）
+
+    请求数和耗时、锁等待、投票数、OpenDota 请求等由各模块记录（app/metrics.py），
+    房间数、投票用户数和缓存命中等在这里读取已有的统计。
+    """
+
+    def get(self, request):
+        families = process_families()
+        try:
+            families += _room_metric_families()
+        except Exception:
+            # 存储后端（Redis）不可用时仍然输出进程内的指标
+            logger.exception('读取房间统计失败')
+        families += _match_metric_families()
+        return HttpResponse(REGISTRY.render(families), content_type=CONTENT_TYPE)
+
+
+# 不带令牌时允许访问 /debug/profile 的客户端地址
+_LOOPBACK_ADDRESSES = frozenset(('127.0.0.1', '::1'))
+
+
+class ProfileView(View):
+    """
+    请求性能分析结果（GET /debug/profile?seconds=N，火焰图折叠栈格式，见 app/profiling.py）
+
+    需要请求头 X-Profile-Token 与 PROFILE_TOKEN 相同，或者从本机直接访问（不经过反向代理）；
+    未开启性能分析或没有权限时返回 404。
+    """
+
+    def get(self, request):
+        if not settings.PROFILE_SAMPLE_RATE and not settings.PROFILE_TOKEN:
+            return HttpResponse(status=404)
+        meta = request.META
+        local = meta.get('REMOTE_ADDR') in _LOOPBACK_ADDRESSES and 'HTTP_X_FORWARDED_FOR' not in meta
+        if not local and not profile_token_matches(request):
+            return HttpResponse(status=404)
+        try:
+            seconds = float(request.GET['seconds']) if 'seconds' in request.GET else None
+        except ValueError:
+            return JsonResponse({
+                'success': False,
+                'error': 'VALIDATION_ERROR',
+                'message': 'seconds 参数必须是数字'
+            }, status=400)
+        response = HttpResponse(get_profiler().collapsed(seconds), content_type='text/plain; charset=utf-8')
+        response['Content-Disposition'] = f'inline; filename="profile-{os.getpid()}.folded"'
+        response['Cache-Control'] = 'no-store'
+        return response
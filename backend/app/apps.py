@@ -0,0 +1,62 @@
+"""
+Application configuration.
+"""
+import os
+
+from django.apps import AppConfig
+from django.conf import settings
+
+
+class MoleAppConfig(AppConfig):
+    name = 'app'
+
+    def ready(self):
+        from .api.services import (
+            OpenDotaService, create_room_backend, get_room_heroes_fetcher, get_room_service
+        )
+        from .profiling import get_profiler
+        from .static_files import get_static_files
+
+        OpenDotaService.configure(
+            base_url=settings.OPENDOTA_BASE_URL,
+            timeout=settings.OPENDOTA_TIMEOUT,
+            cache_size=settings.OPENDOTA_CACHE_SIZE,
+            cache_ttl=settings.OPENDOTA_CACHE_TTL,
+            disk_cache_path=settings.OPENDOTA_DISK_CACHE_PATH,
+            disk_cache_size=settings.OPENDOTA_DISK_CACHE_SIZE
+        )
+        get_room_heroes_fetcher().configure(
+            workers=settings.ROOM_FETCH_WORKERS,
+            max_pending=settings.ROOM_FETCH_MAX_PENDING
+        )
+
+        room_service = get_room_service()
+        room_service.configure_backend(create_room_backend(
+            settings.ROOM_BACKEND,
+            redis_url=settings.REDIS_URL,
+            redis_prefix=settings.REDIS_KEY_PREFIX,
+            shm_path=settings.ROOM_SHM_PATH,
+            shm_capacity=settings.ROOM_SHM_CAPACITY,
+            journal_dir=settings.ROOM_JOURNAL_DIR,
+            journal_flush_interval=settings.ROOM_JOURNAL_FLUSH_INTERVAL,
+            journal_snapshot_interval=settings.ROOM_JOURNAL_SNAPSHOT_INTERVAL
+        ))
+        # 按配置设置房间过期策略，并启动后台清理线程
+        room_service.configure_expiry(
+            idle_ttl=settings.ROOM_IDLE_TTL,
+            finished_ttl=settings.ROOM_FINISHED_TTL,
+            max_age=settings.ROOM_MAX_AGE,
+            max_rooms=settings.ROOM_MAX_ROOMS
+        )
+        room_service.start_expiry_sweeper(settings.ROOM_SWEEP_INTERVAL)
+
+        # 前端构建产物读入内存并预先压缩，由 app/urls.py 中的 /static/ 和 index.html 路由提供
+        static_root = next((str(d) for d in settings.STATICFILES_DIRS if os.path.isdir(d)), None)
+        get_static_files().configure(
+            static_root,
+            precompress=settings.STATIC_PRECOMPRESS,
+            max_file_size=settings.STATIC_MAX_FILE_SIZE
+        )
+
+        # 请求性能分析的汇总窗口，由 ProfilingMiddleware 选择请求，结果由 /debug/profile 输出
+        get_profiler().configure(window=settings.PROFILE_WINDOW)
@@ -0,0 +1,23 @@
+"""
+ASGI config for catch-the-mole project.
+
+运行方式（单进程即可保持大量长轮询 / SSE 连接）：
+    uvicorn app.asgi:application --host 0.0.0.0 --port 9000
+或
+    gunicorn app.asgi:application -k uvicorn.workers.UvicornWorker
+"""
+
+import os
+import logging
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+# 房间详情、SSE 推送和创建房间使用异步视图
+os.environ.setdefault('ROOM_ASYNC_VIEWS', 'True')
+
+application = get_asgi_application()
+
+# 初始化日志系统
+logger = logging.getLogger('app')
+logger.info('Django ASGI application initialized')
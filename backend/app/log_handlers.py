@@ -0,0 +1,43 @@
+"""
+Logging handlers.
+
+QueueStreamHandler：请求线程（以及 ASGI 的事件循环）只把日志记录放入队列，由后台线程格式化并写入 stderr，
+写入阻塞（终端、管道或日志收集进程处理不过来）时不会影响请求处理。
+"""
+import logging
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+
+class QueueStreamHandler(QueueHandler):
+    """写入后台线程的 StreamHandler，在 LOGGING 中替代 logging.StreamHandler"""
+
+    def __init__(self, stream=None):
+        super().__init__(queue.SimpleQueue())
+        self.target = logging.StreamHandler(stream)
+        self._listener = None
+        self._start()
+        # gunicorn --preload 等在 fork 前完成配置时，子进程中没有后台线程，需要重新启动
+        os.register_at_fork(after_in_child=self._start)
+
+    def _start(self):
+        self._listener = QueueListener(self.queue, self.target)
+        self._listener.start()
+
+    def setFormatter(self, fmt):
+        # 格式化在后台线程中由 target 完成
+        super().setFormatter(fmt)
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        # 同一进程内的队列不需要像 QueueHandler 默认那样提前格式化和复制记录
+        return record
+
+    def close(self):
+        # 写完队列中剩余的日志后停止后台线程（logging.shutdown 在进程退出时调用）
+        listener, self._listener = self._listener, None
+        if listener is not None:
+            listener.stop()
+        self.target.close()
+        super().close()
@@ -0,0 +1,199 @@
+"""
+Prometheus metrics.
+
+进程内的计数器和直方图，由 /metrics 接口按 Prometheus 文本格式（0.0.4）输出：
+- 每个线程只修改自己的分片，记录时不加锁（同一个值只有一个线程写入）；输出时汇总所有线程的分片，
+  已退出线程的分片合并后释放
+- 房间数、投票用户数、缓存命中等已有统计不在这里重复记录，由 /metrics 视图在输出时读取（见 Registry.render）
+
+多 worker 部署时每个 worker 单独统计，一次抓取只能看到处理该请求的 worker。
+"""
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+# 一组指标：(名称, 类型, 说明, [(标签, 值)])，标签为 ((标签名, 标签值), ...)
+Family = Tuple[str, str, str, List[Tuple[Tuple[Tuple[str, str], ...], float]]]
+
+# 请求处理时间（秒）
+REQUEST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+# 锁等待和持有时间（秒）
+LOCK_BUCKETS = (1e-06, 5e-06, 1e-05, 5e-05, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1)
+# 上游接口请求时间（秒）
+UPSTREAM_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels: Sequence[Tuple[str, str]]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(str(value))}"' for name, value in labels) + '}'
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, int):
+        return str(value)
+    if value == float('inf'):
+        return '+Inf'
+    return repr(value)
+
+
+class _Metric:
+    """按线程分片的指标；子类实现 _merge 把一个分片合并到汇总结果"""
+
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        # (线程, 分片)，分片为 标签值 -> 数据
+        self._shards: List[Tuple[threading.Thread, Dict]] = []
+        # 已退出线程的分片合并后的结果
+        self._retired: Dict = {}
+        self._lock = threading.Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _shard(self) -> Dict:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append((threading.current_thread(), shard))
+            return shard
+
+    def _merge(self, totals: Dict, shard: Dict):
+        raise NotImplementedError
+
+    def collect(self) -> Dict:
+        """汇总所有线程的分片：标签值 -> 数据"""
+        with self._lock:
+            live = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    live.append((thread, shard))
+                else:
+                    self._merge(self._retired, shard)
+            self._shards = live
+            totals = {}
+            self._merge(totals, self._retired)
+        for _, shard in live:
+            # dict.copy() 在持有 GIL 时一次完成，不会与所属线程新增标签冲突
+            self._merge(totals, shard.copy())
+        return totals
+
+    def samples(self) -> Iterable[Tuple[str, Tuple[Tuple[str, str], ...], float]]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """只增不减的计数器"""
+
+    kind = 'counter'
+
+    def inc(self, labels: tuple = (), amount: float = 1):
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def _merge(self, totals: Dict, shard: Dict):
+        for labels, value in shard.items():
+            totals[labels] = totals.get(labels, 0) + value
+
+    def samples(self):
+        for labels, value in sorted(self.collect().items()):
+            yield self.name, tuple(zip(self.labelnames, labels)), value
+
+
+class Histogram(_Metric):
+    """直方图：每个分片按标签值保存各区间的计数（非累计）和总和"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = REQUEST_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def observe(self, value: float, labels: tuple = ()):
+        shard = self._shard()
+        state = shard.get(labels)
+        if state is None:
+            # 各区间的计数 + 超出最大区间的计数 + 总和
+            state = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        state[bisect_left(self.buckets, value)] += 1
+        state[-1] += value
+
+    def _merge(self, totals: Dict, shard: Dict):
+        for labels, state in shard.items():
+            total = totals.get(labels)
+            if total is None:
+                totals[labels] = list(state)
+            else:
+                for index, value in enumerate(state):
+                    total[index] += value
+
+    def samples(self):
+        bounds = [_format_value(bound) for bound in self.buckets] + ['+Inf']
+        for labels, state in sorted(self.collect().items()):
+            labels = tuple(zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, count in zip(bounds, state):
+                cumulative += count
+                yield f'{self.name}_bucket', labels + (('le', bound),), cumulative
+            yield f'{self.name}_sum', labels, state[-1]
+            yield f'{self.name}_count', labels, cumulative
+
+
+class Registry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._lock = threading.Lock()
+
+    @property
+    def metrics(self) -> List[_Metric]:
+        return list(self._metrics)
+
+    def register(self, metric: _Metric):
+        with self._lock:
+            if any(existing.name == metric.name for existing in self._metrics):
+                raise ValueError(f'指标名称重复: {metric.name}')
+            self._metrics.append(metric)
+
+    def render(self, families: Iterable[Family] = ()) -> str:
+        """输出所有已注册的指标，以及调用方在输出时读取的 families"""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        for name, kind, documentation, samples in families:
+            lines.append(f'# HELP {name} {documentation}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in samples:
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+# Prometheus 文本格式的 Content-Type
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_START_TIME = time.time()
+
+
+def process_families() -> List[Family]:
+    """进程的 CPU 时间和启动时间（多 worker 部署时可以区分抓取到的进程）"""
+    return [
+        ('process_cpu_seconds_total', 'counter', '进程使用的 CPU 时间（秒）', [((), time.process_time())]),
+        ('process_start_time_seconds', 'gauge', '进程启动时间（Unix 时间戳）', [((), _START_TIME)]),
+    ]
@@ -1,82 +1,223 @@
 """
-Custom middleware for CORS handling and access logging.
+Custom middleware for CORS handling, access logging, request metrics and request profiling.
 """
+import hmac
+import itertools
 import logging
-from datetime import datetime
+import re
+import time
 
-logger = logging.getLogger('app.middleware')
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
 
+from .metrics import Counter, Histogram
+from .profiling import get_profiler
 
-class AccessLogMiddleware:
-    """记录访问者IP和其他信息的中间件"""
+logger = logging.getLogger('app.middleware')
+
+_REQUESTS = Counter('mole_http_requests_total', 'HTTP 请求数（按视图和状态码类别）', ('view', 'status'))
+_REQUEST_DURATION = Histogram('mole_http_request_duration_seconds', 'HTTP 请求的处理时间（按视图）', ('view',))
+# 状态码类别：状态码 // 100 -> 标签值
+_STATUS_CLASSES = tuple(f'{i}xx' for i in range(10))
+
+# 不记录日志的轮询请求：GET /api/rooms/{room_id}
+_POLL_PATH = re.compile(r'/api/rooms/[^/]*')
+# 需要记录日志的请求方法（其他方法只记录错误请求）
+_LOGGED_METHODS = frozenset(('POST', 'PUT', 'DELETE', 'PATCH'))
+
+
+_CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
+    'Access-Control-Allow-Headers': 'Content-Type, X-User-Fingerprint, If-None-Match, X-Profile-Token',
+}
+# 原来由 SecurityMiddleware 和 XFrameOptionsMiddleware 添加的响应头（使用 Django 的默认配置）
+_SECURITY_HEADERS = {
+    'X-Content-Type-Options': 'nosniff',
+    'Referrer-Policy': 'same-origin',
+    'Cross-Origin-Opener-Policy': 'same-origin',
+    'X-Frame-Options': 'DENY',
+}
+# 响应中已有的同名响应头（例如视图设置的 X-Frame-Options）保持不变，与原来的中间件相同
+_RESPONSE_HEADERS = tuple({
+    **_CORS_HEADERS,
+    'Access-Control-Expose-Headers': 'ETag, X-Room-Version',
+    **_SECURITY_HEADERS,
+}.items())
+_PREFLIGHT_HEADERS = tuple({
+    **_CORS_HEADERS,
+    'Access-Control-Max-Age': '86400',
+    **_SECURITY_HEADERS,
+}.items())
+
+
+class _SyncAndAsyncMiddleware:
+    """同时支持同步（WSGI）和异步（ASGI）请求链的中间件基类
+
+    ASGI 部署时下游是协程，中间件也以协程方式调用，异步视图不会被放到线程中执行。
+    子类实现 process(request, response) 处理响应；preflight(request) 返回响应时不再调用下游。
+    """
 
     def __init__(self, get_response):
         self.get_response = get_response
+        self.async_mode = iscoroutinefunction(self.get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
 
     def __call__(self, request):
-        # 跳过 favicon.ico 的日志记录
-        if request.path == '/favicon.ico':
-            response = self.get_response(request)
-            return response
+        if self.async_mode:
+            return self.__acall__(request)
+        response = self.preflight(request)
+        if response is None:
+            response = self.process(request, self.get_response(request))
+        return response
+
+    async def __acall__(self, request):
+        response = self.preflight(request)
+        if response is None:
+            response = self.process(request, await self.get_response(request))
+        return response
+
+    def preflight(self, request):
+        return None
+
+    def process(self, request, response):
+        return response
 
-        # 处理请求
+
+class MetricsMiddleware(_SyncAndAsyncMiddleware):
+    """
+    按视图统计请求数和处理时间（/metrics），放在中间件列表的最前面以包括其他中间件的时间
+
+    视图标签为 URL 名称（路由没有名称时为 other，CORS 预检请求为 preflight，未匹配任何路由时为 unmatched），带 wait 参数的房间详情长轮询记为 room-detail-wait；
+    流式响应（SSE）只统计到返回响应对象为止。
+    """
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        start = time.perf_counter()
         response = self.get_response(request)
+        self.observe(request, response, start)
+        return response
 
-        # 跳过轮询请求的日志（GET /api/rooms/{room_id}）
-        if request.method == 'GET' and request.path.startswith('/api/rooms/') and len(request.path.split('/')) == 4:
-            return response
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        self.observe(request, response, start)
+        return response
+
+    @staticmethod
+    def observe(request, response, start: float):
+        elapsed = time.perf_counter() - start
+        match = request.resolver_match
+        if match is not None:
+            view = match.url_name or 'other'
+        else:
+            # CORS 预检请求在 URL 解析之前返回
+            view = 'preflight' if request.method == 'OPTIONS' else 'unmatched'
+        if view == 'room-detail' and 'wait=' in request.META.get('QUERY_STRING', ''):
+            view = 'room-detail-wait'
+        _REQUEST_DURATION.observe(elapsed, (view,))
+        _REQUESTS.inc((view, _STATUS_CLASSES[response.status_code // 100]))
+
+
+def profile_token_matches(request) -> bool:
+    """请求头 X-Profile-Token 是否与 PROFILE_TOKEN 相同（未配置令牌时总是 False）"""
+    token = request.META.get('HTTP_X_PROFILE_TOKEN')
+    if not token or not settings.PROFILE_TOKEN:
+        return False
+    # compare_digest 不接受包含非 ASCII 字符的 str
+    return hmac.compare_digest(token.encode('utf-8'), settings.PROFILE_TOKEN.encode('utf-8'))
 
-        # 只记录重要操作（POST/PUT/DELETE）和错误请求（4xx, 5xx）
+
+class ProfilingMiddleware(_SyncAndAsyncMiddleware):
+    """
+    记录每 PROFILE_SAMPLE_RATE 个请求中 1 个，以及带管理员令牌（X-Profile-Token）的请求的调用栈（app/profiling.py）
+
+    PROFILE_SAMPLE_RATE 为 0 且没有配置 PROFILE_TOKEN 时不加入中间件链，不增加任何开销。
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILE_SAMPLE_RATE and not settings.PROFILE_TOKEN:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        self.sample_rate = settings.PROFILE_SAMPLE_RATE
+        # next() 在持有 GIL 时完成，多个线程共用不需要加锁
+        self._requests = itertools.count(1)
+
+    def should_profile(self, request) -> bool:
+        if self.sample_rate and next(self._requests) % self.sample_rate == 0:
+            return True
+        return profile_token_matches(request)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.should_profile(request):
+            return self.get_response(request)
+        with get_profiler().profiling():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        if not self.should_profile(request):
+            return await self.get_response(request)
+        with get_profiler().profiling():
+            return await self.get_response(request)
+
+
+class AccessLogMiddleware(_SyncAndAsyncMiddleware):
+    """记录访问者IP和其他信息的中间件"""
+
+    def process(self, request, response):
+        # 只记录重要操作（POST/PUT/DELETE/PATCH）和错误请求（4xx, 5xx），其他请求不做任何处理
         status_code = response.status_code
-        should_log = (
-            request.method in ['POST', 'PUT', 'DELETE', 'PATCH'] or
-            status_code >= 400
-        )
+        method = request.method
+        if status_code < 400 and method not in _LOGGED_METHODS:
+            return response
 
-        if not should_log:
+        # 跳过 favicon.ico 和轮询请求（GET /api/rooms/{room_id}）的日志记录
+        path = request.path
+        if path == '/favicon.ico' or (method == 'GET' and _POLL_PATH.fullmatch(path)):
             return response
 
         # 获取客户端IP地址
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+        meta = request.META
+        x_forwarded_for = meta.get('HTTP_X_FORWARDED_FOR')
         if x_forwarded_for:
             ip = x_forwarded_for.split(',')[0].strip()
         else:
-            ip = request.META.get('REMOTE_ADDR', 'Unknown')
+            ip = meta.get('REMOTE_ADDR', 'Unknown')
 
-        # 获取其他信息
-        user_agent = request.META.get('HTTP_USER_AGENT', 'Unknown')
-        method = request.method
-        path = request.path
-        referer = request.META.get('HTTP_REFERER', '-')
-
-        # 记录访问日志
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        # 记录访问日志（时间由日志格式添加，消息在日志的后台线程中格式化）
         logger.info(
-            f"[{timestamp}] {ip} - {method} {path} {status_code} - "
-            f"User-Agent: {user_agent[:100]} - Referer: {referer}"
+            '%s - %s %s %s - User-Agent: %.100s - Referer: %s',
+            ip, method, path, status_code, meta.get('HTTP_USER_AGENT', 'Unknown'), meta.get('HTTP_REFERER', '-')
         )
 
         return response
 
 
-class CorsMiddleware:
-    """Simple CORS middleware for development."""
+class CorsMiddleware(_SyncAndAsyncMiddleware):
+    """
+    Simple CORS middleware for development.
 
-    def __init__(self, get_response):
-        self.get_response = get_response
+    同时添加原来由 SecurityMiddleware / XFrameOptionsMiddleware 设置的安全响应头。
+    """
 
-    def __call__(self, request):
+    def preflight(self, request):
         if request.method == 'OPTIONS':
-            from django.http import HttpResponse
             response = HttpResponse()
-            response['Access-Control-Allow-Origin'] = '*'
-            response['Access-Control-Allow-Methods'] = 'GET, POST, PUT, DELETE, OPTIONS'
-            response['Access-Control-Allow-Headers'] = 'Content-Type, X-User-Fingerprint'
-            response['Access-Control-Max-Age'] = '86400'
+            headers = response.headers
+            for name, value in _PREFLIGHT_HEADERS:
+                headers.setdefault(name, value)
             return response
+        return None
 
-        response = self.get_response(request)
-        response['Access-Control-Allow-Origin'] = '*'
-        response['Access-Control-Allow-Methods'] = 'GET, POST, PUT, DELETE, OPTIONS'
-        response['Access-Control-Allow-Headers'] = 'Content-Type, X-User-Fingerprint'
+    def process(self, request, response):
+        headers = response.headers
+        for name, value in _RESPONSE_HEADERS:
+            headers.setdefault(name, value)
         return response
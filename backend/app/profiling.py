@@ -0,0 +1,281 @@
+"""
+Request profiler.
+
+按需开启的请求级性能分析：被选中的请求（每 PROFILE_SAMPLE_RATE 个请求 1 个，或带管理员令牌的请求，见
+ProfilingMiddleware）在处理期间通过 sys.setprofile 记录所在线程的每次函数调用（包括 C 函数，例如锁等待、
+序列化），按完整调用路径累计自身耗时；请求结束后合并到按时间分段的汇总中，/debug/profile 输出最近
+PROFILE_WINDOW 秒内的结果。
+
+输出为折叠栈格式（collapsed stacks，每行 "调用方;...;被调用方 自身耗时（微秒）"），可以直接交给
+flamegraph.pl、speedscope 或 inferno 生成火焰图。
+
+- 只影响被选中的请求，这些请求的处理时间会变为原来的 10 倍以上。回调本身的耗时不计入结果，
+  每个事件中无法排除的部分按启动时的校准值扣除，但绝对耗时仍然偏大，应比较各调用路径的相对大小
+- 垃圾回收的耗时记在触发回收的调用下的 [gc] 节点；记录时每次调用都会创建帧对象，回收比平时频繁，[gc] 偏大
+- 不使用后台线程定时采样：大部分请求在 1 毫秒内完成，短于 GIL 的切换间隔（5 毫秒），
+  采样线程在请求处理期间几乎得不到执行机会
+- ASGI 部署时请求在事件循环线程中处理，请求等待期间事件循环执行的其他协程也会记录在该请求下；
+  同步视图通过 sync_to_async 在线程池中执行，不会被记录
+- 多 worker 部署时每个 worker 单独汇总，一次请求只能看到处理该请求的 worker
+"""
+import gc
+import os
+import sys
+import sysconfig
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, List, Optional, Tuple
+
+from .metrics import Counter
+
+_PROFILED_REQUESTS = Counter('mole_profiled_requests_total', '被记录调用栈的请求数')
+
+# 汇总窗口分成的时间段数，过期数据按段丢弃
+_BUCKETS_PER_WINDOW = 10
+# 单个时间段内最多保留的不同调用路径数，超出的耗时计入 _TRUNCATED
+_MAX_STACKS = 20000
+_TRUNCATED = '[truncated]'
+
+# 垃圾回收耗时在火焰图中的帧名称（作为触发回收的调用的子节点）
+_GC_FRAME = '[gc]'
+
+_CALL_EVENTS = frozenset(('call', 'c_call'))
+_RETURN_EVENTS = frozenset(('return', 'c_return', 'c_exception'))
+
+
+class _RequestTrace:
+    """
+    一个请求的调用记录（sys.setprofile 的回调，只在请求所在线程中调用，不需要加锁）
+
+    调用路径保存为树：节点编号 -> (父节点, 帧名称)，节点编号 -> {帧名称: 子节点编号}；
+    栈中保存节点编号，每个事件只需要一次字典查找，请求结束后再展开为折叠栈字符串。
+    已有的调用路径不会分配新的容器对象，记录本身不会额外触发垃圾回收。
+    """
+
+    __slots__ = ('_label', '_nodes', '_children', '_stack', '_self_ns', '_events', '_last')
+
+    def __init__(self, label, root: str):
+        self._label = label
+        self._nodes: List[Tuple[int, str]] = [(-1, root)]
+        self._children: List[Dict[str, int]] = [{}]
+        self._stack: List[int] = [0]
+        self._self_ns: Dict[int, int] = {}
+        # 节点编号 -> 该节点作为栈顶时的事件数，用于扣除每次回调中无法排除的耗时
+        self._events: Dict[int, int] = {}
+        self._last = time.perf_counter_ns()
+
+    def __call__(self, frame, event, arg):
+        if frame.f_code in _UNTRACED_CODES:
+            return
+        now = time.perf_counter_ns()
+        stack = self._stack
+        node = stack[-1]
+        self._self_ns[node] = self._self_ns.get(node, 0) + now - self._last
+        self._events[node] = self._events.get(node, 0) + 1
+        if event in _CALL_EVENTS:
+            name = self._label(frame.f_code) if event == 'call' else f'{arg.__qualname__} (built-in)'
+            stack.append(self._child(node, name))
+        elif event in _RETURN_EVENTS and len(stack) > 1:
+            # 开始记录之前已经在栈上的帧（中间件及其调用方）返回时不出栈
+            stack.pop()
+        # 回调本身的耗时不计入任何调用路径
+        self._last = time.perf_counter_ns()
+
+    def _child(self, node: int, name: str) -> int:
+        children = self._children[node]
+        child = children.get(name)
+        if child is None:
+            child = children[name] = len(self._nodes)
+            self._nodes.append((node, name))
+            self._children.append({})
+        return child
+
+    def collect_garbage(self, phase: str):
+        """垃圾回收开始和结束（gc.callbacks），回收耗时记在 [gc] 节点下"""
+        now = time.perf_counter_ns()
+        stack = self._stack
+        node = stack[-1]
+        self._self_ns[node] = self._self_ns.get(node, 0) + now - self._last
+        if phase == 'start':
+            stack.append(self._child(node, _GC_FRAME))
+        elif len(stack) > 1 and self._nodes[node][1] == _GC_FRAME:
+            stack.pop()
+        self._last = time.perf_counter_ns()
+
+    def finish(self):
+        now = time.perf_counter_ns()
+        node = self._stack[-1]
+        self._self_ns[node] = self._self_ns.get(node, 0) + now - self._last
+
+    def collapsed(self, overhead_ns: float = 0) -> Dict[str, int]:
+        """折叠栈 -> 自身耗时（微秒），每个事件扣除 overhead_ns，忽略不到 1 微秒的路径"""
+        paths: Dict[int, str] = {}
+
+        def path(node: int) -> str:
+            result = paths.get(node)
+            if result is None:
+                parent, name = self._nodes[node]
+                result = paths[node] = name if parent < 0 else f'{path(parent)};{name}'
+            return result
+
+        stacks = {}
+        events = self._events
+        for node, elapsed in self._self_ns.items():
+            elapsed -= int(events.get(node, 0) * overhead_ns)
+            if elapsed >= 1000:
+                stacks[path(node)] = elapsed // 1000
+        return stacks
+
+
+class RequestProfiler:
+    """记录被选中请求的调用路径，按时间段累计各折叠栈的自身耗时"""
+
+    def __init__(self):
+        self.window = 600
+        # (时间段开始时间, 折叠栈 -> 自身耗时（微秒）)
+        self._buckets: Deque[Tuple[float, Dict[str, int]]] = deque()
+        # 代码对象 -> 火焰图中的帧名称（只增不减，数量受代码对象数量限制）
+        self._labels: Dict[object, str] = {}
+        self._prefixes = self._path_prefixes()
+        self._lock = threading.Lock()
+        # 每个事件中回调之外、无法排除的耗时（纳秒），第一次记录请求时测量
+        self._overhead_ns: Optional[float] = None
+        # 当前线程正在记录的请求（垃圾回收回调据此找到记录对象）
+        self._local = threading.local()
+
+    def configure(self, window: int = 600):
+        self.window = max(window, 1)
+        with self._lock:
+            self._buckets.clear()
+
+    @staticmethod
+    def _path_prefixes() -> List[str]:
+        """帧名称中去掉的路径前缀（backend 目录、第三方包和标准库目录），最长的在前"""
+        backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        paths = sysconfig.get_paths()
+        prefixes = {backend_dir, paths['purelib'], paths['platlib'], paths['stdlib']}
+        return sorted((prefix.rstrip(os.sep) + os.sep for prefix in prefixes if prefix), key=len, reverse=True)
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            filename = code.co_filename
+            for prefix in self._prefixes:
+                if filename.startswith(prefix):
+                    filename = filename[len(prefix):]
+                    break
+            # 折叠栈用 ; 分隔帧、用最后一个空格分隔数值，帧名称中不能出现 ;
+            label = f'{code.co_qualname} ({filename}:{code.co_firstlineno})'.replace(';', ',')
+            self._labels[code] = label
+        return label
+
+    def _calibrate(self) -> float:
+        """
+        测量每个事件计入调用方的额外耗时（与标准库 profile.Profile.calibrate 相同的思路）：
+        分别在记录和不记录的情况下执行同一组空函数调用，记录结果多出的时间按事件数平均
+        """
+        def empty():
+            pass
+
+        def calls(count=2000):
+            for _ in range(count):
+                empty()
+
+        estimates = []
+        for _ in range(5):
+            start = time.perf_counter_ns()
+            calls()
+            plain = time.perf_counter_ns() - start
+            trace = _RequestTrace(self._label, '')
+            previous = sys.getprofile()
+            sys.setprofile(trace)
+            try:
+                calls()
+            finally:
+                sys.setprofile(previous)
+            trace.finish()
+            estimates.append((sum(trace._self_ns.values()) - plain) / sum(trace._events.values()))
+        return max(min(estimates), 0.0)
+
+    @contextmanager
+    def profiling(self):
+        """记录 with 块执行期间当前线程的调用，结束后计入汇总"""
+        if getattr(self._local, 'trace', None) is not None:
+            # ASGI 时同一事件循环线程中已经有请求在记录，不再记录这个请求（两个记录会互相覆盖）
+            yield
+            return
+        if self._overhead_ns is None:
+            with self._lock:
+                if self._overhead_ns is None:
+                    self._overhead_ns = self._calibrate()
+                    gc.callbacks.append(self._collect_garbage)
+        # 开始记录时已经在栈上的帧（线程入口到调用方）作为所有调用路径的公共前缀
+        frame = sys._getframe(2)
+        labels = []
+        while frame is not None:
+            labels.append(self._label(frame.f_code))
+            frame = frame.f_back
+        trace = _RequestTrace(self._label, ';'.join(reversed(labels)))
+        previous = sys.getprofile()
+        self._local.trace = trace
+        sys.setprofile(trace)
+        try:
+            yield
+        finally:
+            sys.setprofile(previous)
+            self._local.trace = None
+            trace.finish()
+            self._record(trace.collapsed(self._overhead_ns))
+            _PROFILED_REQUESTS.inc()
+
+    def _collect_garbage(self, phase: str, info: dict):
+        trace = getattr(self._local, 'trace', None)
+        if trace is not None:
+            trace.collect_garbage(phase)
+
+    def _record(self, stacks: Dict[str, int]):
+        if not stacks:
+            return
+        now = time.monotonic()
+        span = self.window / _BUCKETS_PER_WINDOW
+        with self._lock:
+            if not self._buckets or now - self._buckets[-1][0] >= span:
+                self._buckets.append((now, {}))
+                while now - self._buckets[0][0] >= self.window + span:
+                    self._buckets.popleft()
+            counts = self._buckets[-1][1]
+            for stack, elapsed in stacks.items():
+                if stack not in counts and len(counts) >= _MAX_STACKS:
+                    stack = _TRUNCATED
+                counts[stack] = counts.get(stack, 0) + elapsed
+
+    def collapsed(self, seconds: Optional[float] = None) -> str:
+        """最近 seconds 秒（默认整个窗口）的折叠栈，按自身耗时从多到少排列"""
+        now = time.monotonic()
+        seconds = self.window if seconds is None else min(seconds, self.window)
+        span = self.window / _BUCKETS_PER_WINDOW
+        totals: Dict[str, int] = {}
+        with self._lock:
+            # 时间段按开始时间判断，与窗口部分重叠的时间段整段计入
+            buckets = [counts.copy() for start, counts in self._buckets if now - start < seconds + span]
+        for counts in buckets:
+            for stack, elapsed in counts.items():
+                totals[stack] = totals.get(stack, 0) + elapsed
+        lines = [f'{stack} {elapsed}' for stack, elapsed in sorted(totals.items(), key=lambda item: -item[1])]
+        return '\n'.join(lines) + '\n' if lines else ''
+
+
+# 垃圾回收回调本身的调用不记录（回收开始时入栈的 [gc] 节点会被它们的 return 事件弹出）
+_UNTRACED_CODES = frozenset((
+    RequestProfiler._collect_garbage.__code__,
+    _RequestTrace.collect_garbage.__code__,
+    _RequestTrace._child.__code__,
+))
+
+_profiler = RequestProfiler()
+
+
+def get_profiler() -> RequestProfiler:
+    return _profiler
@@ -4,6 +4,7 @@ Django settings for catch-the-mole project.
 
 from pathlib import Path
 import os
+import tempfile
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -21,11 +22,14 @@ INSTALLED_APPS = [
     'app',
 ]
 
+# 接口都是 csrf_exempt 且没有会话和表单，不使用 CsrfViewMiddleware；
+# SecurityMiddleware / XFrameOptionsMiddleware 的默认响应头由 CorsMiddleware 一并添加
 MIDDLEWARE = [
-    'django.middleware.security.SecurityMiddleware',
+    # 请求数和处理时间（/metrics），放在最前面以包括其他中间件的时间
+    'app.middleware.MetricsMiddleware',
+    # 按需记录请求的调用栈（PROFILE_SAMPLE_RATE / PROFILE_TOKEN 都未配置时不启用）
+    'app.middleware.ProfilingMiddleware',
     'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'app.middleware.AccessLogMiddleware',
     'app.middleware.CorsMiddleware',
 ]
@@ -63,12 +67,17 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 STATICFILES_DIRS = [
     BASE_DIR / 'static',
 ]
+# 前端构建产物（STATICFILES_DIRS 中第一个存在的目录）在启动时读入内存并预先压缩，见 app/static_files.py
+STATIC_PRECOMPRESS = os.environ.get('STATIC_PRECOMPRESS', 'True') == 'True'
+# 超过该大小（字节）的文件不放入内存，每次从磁盘读取
+STATIC_MAX_FILE_SIZE = int(os.environ.get('STATIC_MAX_FILE_SIZE', str(10 * 1024 * 1024)))
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
+    # 输出与 JSONRenderer 相同，安装了 orjson 时序列化更快，未安装时自动使用标准库 json
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'app.api.renderers.ORJSONRenderer',
     ],
     'DEFAULT_PARSER_CLASSES': [
         'rest_framework.parsers.JSONParser',
@@ -77,6 +86,80 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [],
 }
 
+# 房间存储后端：memory（进程内，只能单 worker 运行）、shm（同一台机器上的多个 worker 共享）
+# 或 redis（多 worker / 多实例共享）
+ROOM_BACKEND = os.environ.get('ROOM_BACKEND', 'memory')
+# shm 后端映射的文件路径和容量（最多保存的房间数，修改后需删除旧文件）
+ROOM_SHM_PATH = os.environ.get('ROOM_SHM_PATH', os.path.join(tempfile.gettempdir(), 'catch-the-mole-rooms'))
+ROOM_SHM_CAPACITY = int(os.environ.get('ROOM_SHM_CAPACITY', os.environ.get('ROOM_MAX_ROOMS', '10000')))
+REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+# Redis 中房间数据键名的前缀，多个部署共用一个 Redis 时用于区分
+REDIS_KEY_PREFIX = os.environ.get('REDIS_KEY_PREFIX', 'mole:')
+# memory 后端的持久化目录（日志 + 快照），设置后重启时恢复房间；默认为空，不持久化
+ROOM_JOURNAL_DIR = os.environ.get('ROOM_JOURNAL_DIR', '')
+# 日志组提交间隔（秒），进程崩溃时最多丢失这段时间内的变更
+ROOM_JOURNAL_FLUSH_INTERVAL = float(os.environ.get('ROOM_JOURNAL_FLUSH_INTERVAL', '0.05'))
+# 写入快照（并清理旧日志）的间隔（秒）
+ROOM_JOURNAL_SNAPSHOT_INTERVAL = float(os.environ.get('ROOM_JOURNAL_SNAPSHOT_INTERVAL', '300'))
+
+# OpenDota 接口配置
+OPENDOTA_BASE_URL = os.environ.get('OPENDOTA_BASE_URL', 'https://api.opendota.com/api')
+# 读取超时（秒）
+OPENDOTA_TIMEOUT = float(os.environ.get('OPENDOTA_TIMEOUT', '10'))
+# 比赛结果缓存的最大条数和缓存时间（秒），比赛结束后数据不会再变化
+OPENDOTA_CACHE_SIZE = int(os.environ.get('OPENDOTA_CACHE_SIZE', '1024'))
+OPENDOTA_CACHE_TTL = int(os.environ.get('OPENDOTA_CACHE_TTL', str(24 * 60 * 60)))
+# 比赛结果的磁盘缓存（SQLite），重启后仍然有效；路径设为空字符串时禁用
+OPENDOTA_DISK_CACHE_PATH = os.environ.get(
+    'OPENDOTA_DISK_CACHE_PATH', os.path.join(tempfile.gettempdir(), 'catch-the-mole-matches.sqlite3')
+)
+OPENDOTA_DISK_CACHE_SIZE = int(os.environ.get('OPENDOTA_DISK_CACHE_SIZE', '100000'))
+# 后台获取比赛数据（未缓存的比赛先创建 pending 房间）：线程数，以及进行中和排队的任务总数上限
+ROOM_FETCH_WORKERS = int(os.environ.get('ROOM_FETCH_WORKERS', '4'))
+ROOM_FETCH_MAX_PENDING = int(os.environ.get('ROOM_FETCH_MAX_PENDING', '64'))
+
+# 房间过期配置（秒）
+# 闲置房间（无任何读写）的保留时间
+ROOM_IDLE_TTL = int(os.environ.get('ROOM_IDLE_TTL', str(2 * 60 * 60)))
+# 投票已结束的房间在最后一次读写后的保留时间
+ROOM_FINISHED_TTL = int(os.environ.get('ROOM_FINISHED_TTL', str(30 * 60)))
+# 房间自创建起的最长保留时间
+ROOM_MAX_AGE = int(os.environ.get('ROOM_MAX_AGE', str(24 * 60 * 60)))
+# 同时保留的最大房间数，超出时淘汰最接近过期的房间
+ROOM_MAX_ROOMS = int(os.environ.get('ROOM_MAX_ROOMS', '10000'))
+# 后台清理过期房间的间隔
+ROOM_SWEEP_INTERVAL = int(os.environ.get('ROOM_SWEEP_INTERVAL', '30'))
+
+# 房间状态 SSE 推送配置
+# 心跳间隔（秒），用于保持连接并及时发现已断开的客户端
+ROOM_EVENTS_HEARTBEAT = int(os.environ.get('ROOM_EVENTS_HEARTBEAT', '15'))
+# 单条连接的最长保持时间（秒），到期后由浏览器自动重连
+ROOM_EVENTS_MAX_DURATION = int(os.environ.get('ROOM_EVENTS_MAX_DURATION', '300'))
+# 同时保持的连接数上限，应小于 gunicorn 线程数，为普通请求留出线程
+ROOM_EVENTS_MAX_STREAMS = int(os.environ.get('ROOM_EVENTS_MAX_STREAMS', '16'))
+
+# 房间详情长轮询（?since=<版本号>&wait=<秒数>）配置
+# 单次请求最长等待时间（秒），应小于反向代理的超时时间
+ROOM_LONG_POLL_MAX_WAIT = float(os.environ.get('ROOM_LONG_POLL_MAX_WAIT', '25'))
+# 同时阻塞等待的请求数上限，超出后立即返回；与 SSE 连接数之和应小于 gunicorn 线程数
+ROOM_LONG_POLL_MAX_WAITERS = int(os.environ.get('ROOM_LONG_POLL_MAX_WAITERS', '8'))
+
+# ASGI 部署（app/asgi.py 会默认开启）：房间详情、SSE 推送和创建房间使用 app/api/async_views.py 中的异步视图
+ROOM_ASYNC_VIEWS = os.environ.get('ROOM_ASYNC_VIEWS', 'False') == 'True'
+# 异步视图中同时等待的长轮询请求和 SSE 连接总数上限（等待不占用线程，只受内存和文件描述符限制）
+ROOM_ASYNC_MAX_WAITERS = int(os.environ.get('ROOM_ASYNC_MAX_WAITERS', '10000'))
+
+# 日志由后台线程写入 stderr（app/log_handlers.py），请求线程不会因为写日志阻塞；设为 False 时在请求线程中直接写入
+LOG_QUEUE = os.environ.get('LOG_QUEUE', 'True') == 'True'
+
+# 请求性能分析（app/profiling.py）：每 PROFILE_SAMPLE_RATE 个请求记录 1 个请求的调用栈，0 为关闭
+PROFILE_SAMPLE_RATE = int(os.environ.get('PROFILE_SAMPLE_RATE', '0'))
+# 管理员令牌：请求头 X-Profile-Token 与之相同的请求一定被记录，并且可以从任意地址读取 /debug/profile；
+# 留空时不能通过请求头触发记录，/debug/profile 只允许本机访问
+PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN', '')
+# /debug/profile 汇总的时间窗口（秒）
+PROFILE_WINDOW = int(os.environ.get('PROFILE_WINDOW', '600'))
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -93,7 +176,7 @@ LOGGING = {
     },
     'handlers': {
         'console': {
-            'class': 'logging.StreamHandler',
+            'class': 'app.log_handlers.QueueStreamHandler' if LOG_QUEUE else 'logging.StreamHandler',
             'formatter': 'verbose',
         },
     },
@@ -137,5 +220,16 @@ LOGGING = {
             'level': 'INFO',
             'propagate': False,
         },
+        'app.api.services': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        # httpx 默认为每个请求输出一条 INFO 日志
+        'httpx': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
     },
 }
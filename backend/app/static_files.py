@@ -0,0 +1,230 @@
+"""
+In-process static file serving for the built frontend.
+
+前端构建产物（backend/static，即 Vite 的 dist 目录）的进程内静态文件服务，替代 django.views.static.serve：
+- 启动时把文件读入内存，并为文本类文件预先生成 gzip / brotli 压缩版本（构建产物中已有 .gz / .br 文件时直接使用），
+  请求时按 Accept-Encoding 选择，不再读取磁盘或临时压缩；brotli 需要安装 Brotli 库，未安装时只提供 gzip
+- Vite 输出到 assets/ 下的文件名带内容哈希，内容不会变化，返回一年的 Cache-Control: immutable；
+  其他文件（包括 index.html）每次都需要向服务器确认，未变化时返回 304
+- 非哈希文件在修改时间变化时重新读取（重新构建前端后不需要重启服务）；超过 max_file_size 的文件不放入内存，
+  由 django.views.static.serve 从磁盘读取
+"""
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import posixpath
+import re
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, Optional
+
+try:
+    import brotli
+except ImportError:  # 可选依赖，未安装时只提供 gzip 压缩版本
+    brotli = None
+
+from django.http import Http404, HttpResponse, HttpResponseNotModified
+from django.views.static import serve as static_serve
+
+logger = logging.getLogger('app')
+
+# Vite 默认的输出文件名：assets/[name]-[hash].[ext]
+_HASHED_NAME = re.compile(r'^assets/.+-[A-Za-z0-9_-]{8,}\.[A-Za-z0-9]+$')
+_IMMUTABLE = 'public, max-age=31536000, immutable'
+_REVALIDATE = 'no-cache'
+
+# 值得压缩的文件类型（图片、字体等已经是压缩格式）
+_COMPRESSIBLE_TYPES = re.compile(r'^(text/|application/(javascript|json|xml|manifest\+json)|image/svg\+xml)')
+# 小于该大小的文件压缩收益不大
+_MIN_COMPRESS_SIZE = 256
+
+# Accept-Encoding 中 q=0 表示不接受该编码
+_REJECTED = re.compile(r'q\s*=\s*0(\.0*)?\s*$')
+# 非哈希文件两次检查修改时间的最小间隔（秒）
+_CHECK_INTERVAL = 1.0
+
+
+class _Asset:
+    """内存中的静态文件：各编码的内容和响应头"""
+
+    __slots__ = ('path', 'content_type', 'etag', 'immutable', 'mtime', 'checked', 'variants', 'headers')
+
+    def __init__(self, path: str, content_type: str, etag: str, immutable: bool, mtime: float,
+                 variants: Dict[str, bytes]):
+        self.path = path
+        self.content_type = content_type
+        self.etag = etag
+        self.immutable = immutable
+        self.mtime = mtime
+        self.checked = time.monotonic()
+        # 编码（identity / gzip / br）-> 内容
+        self.variants = variants
+        # 编码 -> 响应头（304 响应使用 identity 的响应头）
+        headers = {'ETag': etag, 'Cache-Control': _IMMUTABLE if immutable else _REVALIDATE}
+        if len(variants) > 1:
+            headers['Vary'] = 'Accept-Encoding'
+        self.headers = {
+            encoding: headers if encoding == 'identity' else {**headers, 'Content-Encoding': encoding}
+            for encoding in variants
+        }
+
+
+@lru_cache(maxsize=64)
+def _accepted_encodings(header: str) -> frozenset:
+    """解析 Accept-Encoding 请求头，返回接受的编码（浏览器发送的请求头种类很少，结果直接缓存）"""
+    accepted = set()
+    for part in header.split(','):
+        token, _, params = part.partition(';')
+        token = token.strip().lower()
+        if token and not _REJECTED.search(params):
+            accepted.add(token)
+    return frozenset(accepted)
+
+
+class StaticFiles:
+    """前端构建产物的静态文件服务"""
+
+    def __init__(self):
+        self.root: Optional[str] = None
+        self.precompress = True
+        self.max_file_size = 10 * 1024 * 1024
+        self._assets: Dict[str, _Asset] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, root: str, precompress: bool = True, max_file_size: int = 10 * 1024 * 1024):
+        """设置静态文件目录并加载全部文件（目录不存在时不加载，index 退回到 Django 模板）"""
+        self.root = root if root and os.path.isdir(root) else None
+        self.precompress = precompress
+        self.max_file_size = max_file_size
+        assets = {}
+        if self.root is not None:
+            for directory, _, names in os.walk(self.root):
+                for name in names:
+                    if name.endswith(('.gz', '.br')):
+                        continue
+                    relative = os.path.relpath(os.path.join(directory, name), self.root).replace(os.sep, '/')
+                    asset = self._load(relative)
+                    if asset is not None:
+                        assets[relative] = asset
+            logger.info(f'已加载静态文件 - 目录: {self.root}, 数量: {len(assets)}, brotli: {brotli is not None}')
+        self._assets = assets
+
+    def _full_path(self, relative: str) -> str:
+        return os.path.join(self.root, *relative.split('/'))
+
+    def _load(self, relative: str) -> Optional[_Asset]:
+        """读取文件并生成压缩版本，文件不存在或超过 max_file_size 时返回 None"""
+        path = self._full_path(relative)
+        try:
+            stat = os.stat(path)
+            if stat.st_size > self.max_file_size:
+                return None
+            with open(path, 'rb') as f:
+                content = f.read()
+        except OSError:
+            return None
+
+        content_type = mimetypes.guess_type(relative)[0] or 'application/octet-stream'
+        variants = {'identity': content}
+        if self.precompress and len(content) >= _MIN_COMPRESS_SIZE and _COMPRESSIBLE_TYPES.match(content_type):
+            for encoding, suffix, compress in (
+                ('br', '.br', brotli.compress if brotli is not None else None),
+                ('gzip', '.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0))
+            ):
+                compressed = self._read_precompressed(path + suffix, stat.st_mtime)
+                if compressed is None and compress is not None:
+                    compressed = compress(content)
+                # 压缩后没有明显变小时不提供该编码
+                if compressed is not None and len(compressed) < len(content) * 0.95:
+                    variants[encoding] = compressed
+
+        return _Asset(
+            path=path,
+            content_type=content_type,
+            # 各编码的内容相同，使用弱 ETag
+            etag=f'W/"{hashlib.md5(content).hexdigest()[:16]}"',
+            immutable=_HASHED_NAME.match(relative) is not None,
+            mtime=stat.st_mtime,
+            variants=variants
+        )
+
+    @staticmethod
+    def _read_precompressed(path: str, mtime: float) -> Optional[bytes]:
+        """读取构建时生成的压缩文件（比原文件旧时忽略）"""
+        try:
+            if os.stat(path).st_mtime < mtime:
+                return None
+            with open(path, 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _lookup(self, relative: str) -> Optional[_Asset]:
+        """
+        查找文件；非哈希文件每隔 _CHECK_INTERVAL 秒检查一次修改时间，变化时重新读取，
+        启动后新增的文件在首次请求时读取
+        """
+        asset = self._assets.get(relative)
+        if asset is not None:
+            if asset.immutable:
+                return asset
+            now = time.monotonic()
+            if now - asset.checked < _CHECK_INTERVAL:
+                return asset
+            asset.checked = now
+        if self.root is None:
+            return None
+        try:
+            mtime = os.stat(self._full_path(relative)).st_mtime
+        except OSError:
+            return None
+        if asset is not None and asset.mtime == mtime:
+            return asset
+        with self._lock:
+            asset = self._load(relative)
+            if asset is not None:
+                self._assets[relative] = asset
+        return asset
+
+    @staticmethod
+    def _response(request, asset: _Asset) -> HttpResponse:
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match and asset.etag in [tag.strip() for tag in if_none_match.split(',')]:
+            return HttpResponseNotModified(headers=asset.headers['identity'])
+        encoding = 'identity'
+        if len(asset.variants) > 1:
+            accepted = _accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+            for candidate in ('br', 'gzip'):
+                if candidate in asset.variants and candidate in accepted:
+                    encoding = candidate
+                    break
+        return HttpResponse(asset.variants[encoding], content_type=asset.content_type, headers=asset.headers[encoding])
+
+    def serve(self, request, path: str):
+        """/static/<path> 视图"""
+        relative = posixpath.normpath(path).lstrip('/')
+        if self.root is None or relative.startswith('..') or relative in ('', '.'):
+            raise Http404('文件不存在')
+        asset = self._lookup(relative)
+        if asset is None:
+            # 超过 max_file_size 的文件直接从磁盘读取，不存在时由 static_serve 返回 404
+            return static_serve(request, path, document_root=self.root)
+        return self._response(request, asset)
+
+    def index(self, request) -> HttpResponse:
+        """前端入口 index.html"""
+        asset = self._lookup('index.html')
+        if asset is None:
+            raise Http404('index.html 不存在')
+        return self._response(request, asset)
+
+
+_static_files = StaticFiles()
+
+
+def get_static_files() -> StaticFiles:
+    """获取静态文件服务单例（由 AppConfig.ready 按配置加载）"""
+    return _static_files
@@ -5,25 +5,25 @@ from django.urls import path, include
 from django.views.generic import TemplateView
 from django.conf import settings
 from django.conf.urls.static import static
-from django.views.static import serve as static_serve
-from django.http import FileResponse, HttpResponseRedirect, HttpResponse
+from django.http import FileResponse, Http404, HttpResponseRedirect, HttpResponse
 import os
 from pathlib import Path
 
+from .api.views import MetricsView, ProfileView
+from .static_files import get_static_files
+
 def serve_index(request):
     """提供前端构建后的 index.html（用于 Vue Router 的客户端路由）"""
     try:
-        index_path = Path(settings.BASE_DIR) / 'static' / 'index.html'
-        if index_path.exists():
+        static_files = get_static_files()
+        if static_files.root is not None:
             try:
-                with open(index_path, 'rb') as f:
-                    content = f.read()
-                response = HttpResponse(content, content_type='text/html')
-                return response
-            except Exception:
-                # 如果读取文件失败，返回 Django 模板（开发环境）
+                # index.html 缓存在内存中，文件修改后自动重新读取
+                return static_files.index(request)
+            except Http404:
+                # 如果文件不存在，返回 Django 模板（开发环境）
                 return TemplateView.as_view(template_name='index.html')(request)
-        # 如果文件不存在，返回 Django 模板（开发环境）
+        # 如果没有前端构建产物，返回 Django 模板（开发环境）
         return TemplateView.as_view(template_name='index.html')(request)
     except Exception:
         # 如果所有操作都失败，返回一个简单的 HTML 页面，包含重定向脚本
@@ -53,6 +53,10 @@ def favicon_view(request):
 urlpatterns = [
     # API 路由必须在前面，避免被前端路由拦截
     path('api/', include('app.api.urls')),
+    # Prometheus 指标
+    path('metrics', MetricsView.as_view(), name='metrics'),
+    # 请求性能分析结果（火焰图折叠栈格式，需要管理员令牌或本机访问）
+    path('debug/profile', ProfileView.as_view(), name='debug-profile'),
     # favicon.ico 路由，避免 404 日志
     path('favicon.ico', favicon_view, name='favicon'),
     # 房间路由直接重定向到首页
@@ -65,15 +69,9 @@ urlpatterns = [
 ]
 
 # 静态文件服务配置
-# 在生产环境下，直接从 STATICFILES_DIRS 提供静态文件
-# 因为前端构建产物已经复制到了 backend/static 目录
-static_dirs = settings.STATICFILES_DIRS if hasattr(settings, 'STATICFILES_DIRS') else []
-if not static_dirs:
-    static_dirs = [Path(settings.BASE_DIR) / 'static']
-
-for static_dir in static_dirs:
-    static_path = Path(static_dir)
-    if static_path.exists():
-        urlpatterns += [
-            path('static/<path:path>', static_serve, {'document_root': str(static_path)}),
-        ]
+# 前端构建产物已经复制到了 backend/static 目录（STATICFILES_DIRS），启动时读入内存并预先压缩，
+# 带哈希的文件名返回 Cache-Control: immutable，见 app/static_files.py
+if get_static_files().root is not None:
+    urlpatterns += [
+        path('static/<path:path>', get_static_files().serve, name='static'),
+    ]
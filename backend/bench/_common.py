@@ -0,0 +1,60 @@
+"""
+bench 脚本共用的初始化、测试数据和工具函数。
+
+脚本在 backend 目录下以 python bench/<脚本>.py 运行，bench 目录在 sys.path 开头，通过 from _common import ... 使用；
+导入本模块时把 backend 目录加入 sys.path，之后可以导入 app。
+"""
+import os
+import platform
+import socket
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+# 房间的失败方 5 名玩家（hero_id 需要在 heroes.json 中）
+HEROES = [
+    {'player_slot': 128 + i, 'hero_id': i + 1, 'hero_name': name, 'nickname': f'玩家{i + 1}'}
+    for i, name in enumerate(['敌法师', '斧王', '祈求者', '帕吉', '水晶室女'])
+]
+
+
+def setup_django():
+    """按 app.settings 初始化 Django，日志不输出到终端"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+    import django
+
+    # 日志处理器在 django.setup() 时绑定 sys.stderr
+    stderr, sys.stderr = sys.stderr, open(os.devnull, 'w')
+    try:
+        django.setup()
+    finally:
+        sys.stderr = stderr
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def run_metadata() -> dict:
+    """本次运行的代码版本和环境，便于对比不同提交的结果"""
+    def git(*args):
+        try:
+            result = subprocess.run(['git', *args], cwd=BACKEND_DIR, capture_output=True, text=True, timeout=10)
+        except (OSError, subprocess.SubprocessError):
+            return None
+        return result.stdout.strip() if result.returncode == 0 else None
+
+    return {
+        'commit': git('rev-parse', '--short', 'HEAD'),
+        'dirty': bool(git('status', '--porcelain', '--untracked-files=no')),
+        'time': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
@@ -0,0 +1,77 @@
+"""
+对比两次基准测试的 JSON 结果（bench/room_micro.py、bench/room_load.py 的输出）。
+
+按 results 中的每个数值逐项列出前后两次的结果和变化比例，变化超过 --threshold 的项用 * 标出；
+两次运行的配置（config）不同时先列出不同的配置项，这种情况下结果不能直接比较。
+
+用法（在 backend 目录下执行）：
+    python bench/compare.py before.json after.json
+    python bench/compare.py before.json after.json --threshold 10
+"""
+import argparse
+import json
+
+
+def flatten(value, prefix=''):
+    """嵌套字典 -> {以 . 连接的键: 数值}"""
+    if isinstance(value, dict):
+        items = {}
+        for key, child in value.items():
+            items.update(flatten(child, f'{prefix}.{key}' if prefix else str(key)))
+        return items
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return {prefix: value}
+    return {}
+
+
+def describe(report):
+    meta = report.get('meta', {})
+    commit = meta.get('commit') or '?'
+    if meta.get('dirty'):
+        commit += '（有未提交的修改）'
+    return f'{commit} {meta.get("time", "")}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='对比两次基准测试的结果')
+    parser.add_argument('before')
+    parser.add_argument('after')
+    parser.add_argument('--threshold', type=float, default=5.0, help='标出变化超过该百分比的项')
+    args = parser.parse_args()
+
+    with open(args.before, encoding='utf-8') as f:
+        before = json.load(f)
+    with open(args.after, encoding='utf-8') as f:
+        after = json.load(f)
+    if before.get('benchmark') != after.get('benchmark'):
+        raise SystemExit(f'不是同一个基准测试: {before.get("benchmark")} / {after.get("benchmark")}')
+
+    unit = before.get('unit')
+    print(f'{before.get("benchmark")}（{unit}）' if unit else before.get('benchmark'))
+    print(f'before: {describe(before)}')
+    print(f'after:  {describe(after)}')
+    before_config, after_config = before.get('config', {}), after.get('config', {})
+    for key in sorted(set(before_config) | set(after_config)):
+        if before_config.get(key) != after_config.get(key):
+            print(f'配置不同 {key}: {before_config.get(key)} -> {after_config.get(key)}')
+
+    before_results, after_results = flatten(before.get('results', {})), flatten(after.get('results', {}))
+    keys = list(before_results) + [key for key in after_results if key not in before_results]
+    width = max((len(key) for key in keys), default=0)
+    print(f'\n{"":<{width}}  {"before":>12}  {"after":>12}  {"change":>8}')
+    for key in keys:
+        old, new = before_results.get(key), after_results.get(key)
+        if old is None or new is None:
+            change, mark = '', ''
+        elif old == 0:
+            change, mark = ('' if new == 0 else 'new'), ''
+        else:
+            ratio = (new - old) / abs(old) * 100
+            change, mark = f'{ratio:+.1f}%', '*' if abs(ratio) >= args.threshold else ''
+        old_text = '-' if old is None else f'{old:,.4g}' if isinstance(old, float) else f'{old:,}'
+        new_text = '-' if new is None else f'{new:,.4g}' if isinstance(new, float) else f'{new:,}'
+        print(f'{key:<{width}}  {old_text:>12}  {new_text:>12}  {change:>8} {mark}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+房间详情读取的内存分配统计（tracemalloc）。
+
+统计每次读取新分配的内存块数量和字节数：
+- service：get_room_snapshot().to_dict()，只读取已发布的快照
+- view：通过 RoomDetailView 完整处理一次请求（不经过中间件）
+
+用法（在 backend 目录下执行）：
+    python bench/room_alloc.py
+"""
+import tracemalloc
+
+from _common import HEROES, setup_django
+
+setup_django()
+
+from django.test import RequestFactory  # noqa: E402
+
+from app.api.services import get_room_service  # noqa: E402
+from app.api.views import RoomDetailView  # noqa: E402
+
+REQUESTS = 2000
+VOTER_COUNTS = [10, 100, 1000]
+
+
+def setup_room(room_service, room_id, voters):
+    room_service.create_room(
+        room_id=room_id,
+        room_password=f'{room_id}-password',
+        match_id=1,
+        max_votes=voters + 1,
+        votes_per_user=1,
+        creator_username='bench',
+        creator_fingerprint='bench',
+        heroes=HEROES
+    )
+    for i in range(voters):
+        fingerprint = f'voter-{i}'
+        room_service.start_user_voting(room_id, fingerprint)
+        room_service.vote(room_id, fingerprint, i % 5 + 1, f'用户{i}')
+
+
+def measure(func):
+    """返回 (每次调用分配的内存块数, 每次调用分配的字节数)"""
+    func()
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    before = tracemalloc.take_snapshot()
+    results = [func() for _ in range(REQUESTS)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    del results
+    stats = after.compare_to(before, 'filename')
+    blocks = sum(stat.count_diff for stat in stats if stat.count_diff > 0)
+    size = sum(stat.size_diff for stat in stats if stat.size_diff > 0)
+    return blocks / REQUESTS, size / REQUESTS
+
+
+def main():
+    room_service = get_room_service()
+    view = RoomDetailView.as_view()
+    factory = RequestFactory()
+    print(f'{"voters":>6}  {"service blocks":>14}  {"service bytes":>13}  {"view blocks":>11}  {"view bytes":>10}')
+    for voters in VOTER_COUNTS:
+        room_id = f'bench-alloc-{voters}'
+        room_password = f'{room_id}-password'
+        setup_room(room_service, room_id, voters)
+
+        def service_read():
+            return room_service.get_room_snapshot(room_password).to_dict('voter-0')
+
+        def view_read():
+            request = factory.get(f'/api/rooms/{room_password}', HTTP_X_USER_FINGERPRINT='voter-0')
+            return view(request, room_id=room_password).content
+
+        service_blocks, service_bytes = measure(service_read)
+        view_blocks, view_bytes = measure(view_read)
+        print(
+            f'{voters:>6}  {service_blocks:>14.1f}  {service_bytes:>13,.0f}  '
+            f'{view_blocks:>11.1f}  {view_bytes:>10,.0f}'
+        )
+        room_service.delete_room(room_id)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""
+WSGI（gunicorn gthread）与 ASGI（uvicorn）同时保持长轮询连接的能力对比。
+
+两种部署都只启动 1 个进程，房间存储使用 ROOM_BACKEND=shm，房间由本脚本直接写入映射文件，
+不需要访问 OpenDota。对每个并发数 N：
+- 同时发起 N 个长轮询请求 GET /api/rooms/{password}?since={版本号}&wait={WAIT}
+- 等待 SETTLE 秒后统计仍在等待的连接数（其余请求因等待名额已满而立即返回，退化为普通轮询）
+- 在等待期间依次发送 PROBES 个普通请求 GET /api/rooms/{password}，测量延迟
+- 由本脚本修改房间（开始投票），测量所有等待中的请求全部返回所需的时间
+
+WSGI 下每个等待的请求占用一个线程，等待名额为 THREADS - 4；ASGI 下等待只占用事件循环中的一个 future。
+
+用法（在 backend 目录下执行，需要安装 uvicorn）：
+    python bench/room_asgi.py
+"""
+import asyncio
+import http.client
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from _common import BACKEND_DIR, HEROES, free_port
+
+from app.api.shm_backend import SharedMemoryRoomBackend
+
+CLIENT_COUNTS = [100, 1000]
+THREADS = 32
+WAIT = 20
+SETTLE = 2
+PROBES = 20
+CAPACITY = 16
+ROOM_PASSWORD = 'bench-asgi'
+
+SERVERS = {
+    'wsgi': lambda port: [
+        sys.executable, '-m', 'gunicorn', 'app.wsgi:application',
+        '--bind', f'127.0.0.1:{port}',
+        '--workers', '1',
+        '--threads', str(THREADS),
+        # 默认最多 1000 条连接，达到上限后不再接受新连接
+        '--worker-connections', str(max(CLIENT_COUNTS) * 2),
+        '--timeout', str(WAIT * 3)
+    ],
+    'asgi': lambda port: [
+        sys.executable, '-m', 'uvicorn', 'app.asgi:application',
+        '--host', '127.0.0.1',
+        '--port', str(port),
+        '--log-level', 'warning'
+    ],
+}
+
+
+def start_server(kind, path, port):
+    env = dict(
+        os.environ,
+        DJANGO_SETTINGS_MODULE='app.settings',
+        DEBUG='False',
+        ROOM_BACKEND='shm',
+        ROOM_SHM_PATH=path,
+        ROOM_SHM_CAPACITY=str(CAPACITY),
+        ROOM_LONG_POLL_MAX_WAIT=str(WAIT),
+        # 为普通请求留出 4 个线程
+        ROOM_LONG_POLL_MAX_WAITERS=str(THREADS - 4),
+        ROOM_ASYNC_MAX_WAITERS=str(max(CLIENT_COUNTS) * 2)
+    )
+    server = subprocess.Popen(
+        SERVERS[kind](port), cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.time() + 30
+    while True:
+        if time.time() > deadline:
+            server.kill()
+            raise RuntimeError(f'{kind} 服务启动超时')
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            conn.request('GET', '/api/stats')
+            if conn.getresponse().status == 200:
+                conn.close()
+                return server
+        except OSError:
+            time.sleep(0.1)
+
+
+async def request(port, url):
+    """发送一个 GET 请求并读取到连接关闭，返回完成时间"""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(
+        f'GET {url} HTTP/1.1\r\nHost: 127.0.0.1\r\nX-User-Fingerprint: bench\r\nConnection: close\r\n\r\n'.encode()
+    )
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    if not response.startswith(b'HTTP/1.1 200'):
+        raise RuntimeError(f'GET {url} 返回 {response[:40]!r}')
+    return time.perf_counter()
+
+
+async def run(port, backend, room_id, clients):
+    """返回 (等待中的连接数, 普通请求 p50 毫秒, 修改后全部返回的毫秒数)"""
+    version = backend.get_room_version(room_id)
+    url = f'/api/rooms/{ROOM_PASSWORD}?since={version}&wait={WAIT}'
+    start = time.perf_counter()
+    polls = [asyncio.create_task(request(port, url)) for _ in range(clients)]
+    await asyncio.sleep(SETTLE)
+
+    latencies = []
+    for _ in range(PROBES):
+        probe_start = time.perf_counter()
+        latencies.append(await request(port, f'/api/rooms/{ROOM_PASSWORD}') - probe_start)
+    latencies.sort()
+
+    changed = time.perf_counter()
+    held = sum(not poll.done() for poll in polls)
+    backend.start_user_voting(room_id, f'bench-{version}')
+    finished = await asyncio.gather(*polls)
+    # 超时返回的请求说明没有被及时唤醒
+    woken = max(finished) - changed
+    if woken >= WAIT - SETTLE - (changed - start):
+        woken = float('nan')
+    return held, latencies[len(latencies) // 2] * 1000, woken * 1000
+
+
+def main():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    needed = max(CLIENT_COUNTS) * 2 + 256
+    if soft < needed:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(needed, hard), hard))
+
+    print(f'{"server":>6}  {"clients":>7}  {"held":>6}  {"probe p50 (ms)":>14}  {"wake all (ms)":>13}')
+    for kind in SERVERS:
+        fd, path = tempfile.mkstemp(prefix='bench-rooms-')
+        os.close(fd)
+        os.remove(path)
+        backend = SharedMemoryRoomBackend(path, capacity=CAPACITY)
+        room_id = 'bench-asgi-room'
+        backend.create_room(room_id, ROOM_PASSWORD, 1, 10, 1, 'bench', 'bench', HEROES)
+        port = free_port()
+        server = start_server(kind, path, port)
+        try:
+            for clients in CLIENT_COUNTS:
+                held, probe, woken = asyncio.run(run(port, backend, room_id, clients))
+                print(f'{kind:>6}  {clients:>7}  {held:>6}  {probe:>14.2f}  {woken:>13.1f}')
+        finally:
+            server.terminate()
+            server.wait()
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
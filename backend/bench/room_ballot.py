@@ -0,0 +1,100 @@
+"""
+一张 BALLOT_SIZE 票的选票：逐票提交（多次 POST /vote）与一次提交（POST /votes）的延迟对比。
+
+按 room_workers 的方式以 1 个 worker 启动 gunicorn（ROOM_BACKEND=shm，房间由本脚本直接写入映射文件，不需要访问 OpenDota），
+每种方式使用一批新的房间和投票用户（都已开始投票），CLIENTS 个客户端进程各自在一条长连接上依次提交选票，
+统计每张选票从第一个请求发出到最后一个响应返回的耗时。
+
+用法（在 backend 目录下执行）：
+    python bench/room_ballot.py
+"""
+import http.client
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+
+from _common import HEROES, free_port
+
+from app.api.shm_backend import MAX_VOTERS, PLAYER_COUNT, SharedMemoryRoomBackend
+# 与 room_workers 使用相同的 gunicorn 启动方式（映射文件容量需与其 CAPACITY 一致）
+from bench.room_workers import CAPACITY, start_server
+
+BALLOT_SIZE = 3
+BALLOTS = 2000
+CLIENTS = 4
+WORKERS = 1
+
+
+def setup_voters(backend, prefix):
+    """创建足够容纳 BALLOTS 个投票用户的房间，返回 (房间密码, 指纹, 选票) 列表"""
+    ballots = []
+    for room in range((BALLOTS + MAX_VOTERS - 1) // MAX_VOTERS):
+        room_id = f'{prefix}-{room}'
+        backend.create_room(room_id, room_id, 1, MAX_VOTERS, BALLOT_SIZE, 'bench', 'bench', HEROES)
+        for voter in range(min(MAX_VOTERS, BALLOTS - len(ballots))):
+            fingerprint = f'{room_id}-{voter}'
+            backend.start_user_voting(room_id, fingerprint)
+            players = [(voter + i) % PLAYER_COUNT + 1 for i in range(BALLOT_SIZE)]
+            ballots.append((room_id, fingerprint, players))
+    return ballots
+
+
+def run_client(args):
+    """单个客户端进程：在一条长连接上依次提交选票，返回每张选票的耗时"""
+    port, batch, ballots = args
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    latencies = []
+    for password, fingerprint, players in ballots:
+        if batch:
+            requests = [(f'/api/rooms/{password}/votes', {'player_indices': players})]
+        else:
+            requests = [(f'/api/rooms/{password}/vote', {'player_index': player}) for player in players]
+        start = time.perf_counter()
+        for url, body in requests:
+            conn.request('POST', url, body=json.dumps(body), headers={
+                'X-User-Fingerprint': fingerprint,
+                'Content-Type': 'application/json'
+            })
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                raise RuntimeError(f'POST {url} 返回 {response.status}')
+        latencies.append(time.perf_counter() - start)
+    conn.close()
+    return latencies
+
+
+def main():
+    fd, path = tempfile.mkstemp(prefix='bench-rooms-')
+    os.close(fd)
+    os.remove(path)
+    backend = SharedMemoryRoomBackend(path, capacity=CAPACITY)
+    modes = [
+        ('per-vote', False, setup_voters(backend, 'bench-single')),
+        ('batch', True, setup_voters(backend, 'bench-batch'))
+    ]
+
+    port = free_port()
+    server = start_server(path, WORKERS, port)
+    print(f'{BALLOT_SIZE} 票 / 选票，{CLIENTS} 个客户端')
+    print(f'{"mode":>8}  {"ballots/s":>9}  {"p50 (ms)":>8}  {"p99 (ms)":>8}')
+    try:
+        with multiprocessing.Pool(CLIENTS) as pool:
+            for name, batch, ballots in modes:
+                chunks = [(port, batch, ballots[i::CLIENTS]) for i in range(CLIENTS)]
+                start = time.perf_counter()
+                latencies = sorted(sum(pool.map(run_client, chunks), []))
+                elapsed = time.perf_counter() - start
+                p50 = latencies[len(latencies) // 2] * 1000
+                p99 = latencies[int(len(latencies) * 0.99)] * 1000
+                print(f'{name:>8}  {len(ballots) / elapsed:>9,.0f}  {p50:>8.2f}  {p99:>8.2f}')
+    finally:
+        server.terminate()
+        server.wait()
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
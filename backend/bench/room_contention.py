@@ -0,0 +1,84 @@
+"""
+RoomService 多线程争用基准测试。
+
+每个线程在各自的房间里循环执行 start_user_voting / vote / get_room /
+get_user_voted_players，统计不同线程数下的总吞吐量；
+另外测一组所有线程挤在同一个房间里的情况作为对照。
+
+用法（在 backend 目录下执行）：
+    python bench/room_contention.py
+"""
+import threading
+import time
+
+import _common  # noqa: F401（导入时把 backend 目录加入 sys.path）
+
+from app.api.services import get_room_service
+
+THREAD_COUNTS = [1, 2, 4, 8]
+DURATION = 2.0
+
+
+def create_rooms(room_service, count, prefix):
+    room_ids = []
+    for i in range(count):
+        room_id = f'{prefix}-{i}'
+        room_service.create_room(
+            room_id=room_id,
+            room_password=f'{prefix}-password-{i}',
+            match_id=i,
+            max_votes=10 ** 9,
+            votes_per_user=1,
+            creator_username='bench',
+            creator_fingerprint='bench',
+            heroes=[]
+        )
+        room_ids.append(room_id)
+    return room_ids
+
+
+def worker(room_service, room_id, thread_index, stop, results):
+    ops = 0
+    n = 0
+    while not stop.is_set():
+        fingerprint = f't{thread_index}-u{n}'
+        room_service.start_user_voting(room_id, fingerprint)
+        room_service.vote(room_id, fingerprint, n % 5 + 1)
+        room_service.get_room(room_id)
+        room_service.get_user_voted_players(room_id, fingerprint)
+        ops += 4
+        n += 1
+    results[thread_index] = ops
+
+
+def run(room_service, room_ids):
+    stop = threading.Event()
+    results = [0] * len(room_ids)
+    threads = [
+        threading.Thread(target=worker, args=(room_service, room_id, i, stop, results))
+        for i, room_id in enumerate(room_ids)
+    ]
+    for t in threads:
+        t.start()
+    time.sleep(DURATION)
+    stop.set()
+    for t in threads:
+        t.join()
+    return sum(results) / DURATION
+
+
+def main():
+    room_service = get_room_service()
+    print(f'{"threads":>7}  {"separate rooms (ops/s)":>24}  {"same room (ops/s)":>19}')
+    for thread_count in THREAD_COUNTS:
+        separate = create_rooms(room_service, thread_count, f'sep{thread_count}')
+        shared = create_rooms(room_service, 1, f'shared{thread_count}')
+        separate_ops = run(room_service, separate)
+        shared_ops = run(room_service, shared * thread_count)
+        print(f'{thread_count:>7}  {separate_ops:>24,.0f}  {shared_ops:>19,.0f}')
+        for room_id in separate + shared:
+            room_service.delete_room(room_id)
+
+
+if __name__ == '__main__':
+    main()
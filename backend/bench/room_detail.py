@@ -0,0 +1,104 @@
+"""
+房间详情读取的吞吐量对比。
+
+- legacy：按旧的方式分别调用 get_room_by_password / get_user_voted_players /
+  has_user_started_voting / get_voted_usernames 并拼装响应数据（四次持锁）
+- snapshot：读取一次已发布的快照 get_room_snapshot().to_dict()（不加锁）
+- view：通过 RoomDetailView 完整处理一次请求（不经过中间件）
+
+用法（在 backend 目录下执行）：
+    python bench/room_detail.py
+"""
+import time
+
+from _common import HEROES, setup_django
+
+setup_django()
+
+from django.test import RequestFactory  # noqa: E402
+
+from app.api.services import get_room_service  # noqa: E402
+from app.api.views import RoomDetailView  # noqa: E402
+
+DURATION = 1.0
+VOTER_COUNTS = [10, 100, 1000]
+
+
+def setup_room(room_service, room_id, voters):
+    room_service.create_room(
+        room_id=room_id,
+        room_password=f'{room_id}-password',
+        match_id=1,
+        max_votes=voters + 1,
+        votes_per_user=1,
+        creator_username='bench',
+        creator_fingerprint='bench',
+        heroes=HEROES
+    )
+    for i in range(voters):
+        fingerprint = f'voter-{i}'
+        room_service.start_user_voting(room_id, fingerprint)
+        room_service.vote(room_id, fingerprint, i % 5 + 1, f'用户{i}')
+
+
+def legacy_detail(room_service, room_password, user_fingerprint):
+    room = room_service.get_room_by_password(room_password)
+    data = {
+        'room_id': room.get('room_id', ''),
+        'room_password': room.get('room_password', ''),
+        'match_id': room.get('match_id', 0),
+        'status': room.get('status', 'init'),
+        'max_votes': room.get('max_votes', 5),
+        'votes_per_user': room.get('votes_per_user', 1),
+        'current_votes': room.get('current_votes', 0),
+        'creator_username': room.get('creator_username', ''),
+        'creator_fingerprint': room.get('creator_fingerprint', ''),
+        'heroes': room.get('heroes', []),
+        'show_only_winner_votes': room.get('show_only_winner_votes', True),
+        'player_order': room.get('player_order'),
+        'order_generation_count': room.get('order_generation_count', 0)
+    }
+    data['user_voted_players'] = room_service.get_user_voted_players(room['room_id'], user_fingerprint)
+    data['user_started_voting'] = room_service.has_user_started_voting(room['room_id'], user_fingerprint)
+    data['voted_usernames'] = room_service.get_voted_usernames(room['room_id'])
+    return data
+
+
+def snapshot_detail(room_service, room_password, user_fingerprint):
+    return room_service.get_room_snapshot(room_password).to_dict(user_fingerprint)
+
+
+def rate(func, *args):
+    count = 0
+    start = time.perf_counter()
+    deadline = start + DURATION
+    while time.perf_counter() < deadline:
+        for _ in range(100):
+            func(*args)
+        count += 100
+    return count / (time.perf_counter() - start)
+
+
+def view_request(view, factory, room_password):
+    request = factory.get(f'/api/rooms/{room_password}', HTTP_X_USER_FINGERPRINT='voter-0')
+    return view(request, room_id=room_password).content
+
+
+def main():
+    room_service = get_room_service()
+    view = RoomDetailView.as_view()
+    factory = RequestFactory()
+    print(f'{"voters":>6}  {"legacy (req/s)":>15}  {"snapshot (req/s)":>17}  {"view (req/s)":>13}')
+    for voters in VOTER_COUNTS:
+        room_id = f'bench-detail-{voters}'
+        room_password = f'{room_id}-password'
+        setup_room(room_service, room_id, voters)
+        legacy = rate(legacy_detail, room_service, room_password, 'voter-0')
+        snapshot = rate(snapshot_detail, room_service, room_password, 'voter-0')
+        view_rate = rate(view_request, view, factory, room_password)
+        print(f'{voters:>6}  {legacy:>15,.0f}  {snapshot:>17,.0f}  {view_rate:>13,.0f}')
+        room_service.delete_room(room_id)
+
+
+if __name__ == '__main__':
+    main()
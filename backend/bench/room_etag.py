@@ -0,0 +1,71 @@
+"""
+房间详情接口 304 路径与完整路径的延迟对比。
+
+直接调用 RoomDetailView（不经过中间件），分别测量：
+- 不带 If-None-Match 的完整响应
+- 带匹配 ETag 的 304 响应
+
+用法（在 backend 目录下执行）：
+    python bench/room_etag.py
+"""
+import time
+
+from _common import HEROES, setup_django
+
+setup_django()
+
+from django.test import RequestFactory  # noqa: E402
+
+from app.api.services import get_room_service  # noqa: E402
+from app.api.views import RoomDetailView  # noqa: E402
+
+REQUESTS = 5000
+VOTERS = 10
+
+
+def setup_room(room_service):
+    room_service.create_room(
+        room_id='bench-etag',
+        room_password='bench-etag-password',
+        match_id=1,
+        max_votes=VOTERS,
+        votes_per_user=1,
+        creator_username='bench',
+        creator_fingerprint='bench',
+        heroes=HEROES
+    )
+    for i in range(VOTERS - 1):
+        fingerprint = f'voter-{i}'
+        room_service.start_user_voting('bench-etag', fingerprint)
+        room_service.vote('bench-etag', fingerprint, i % 5 + 1, f'用户{i}')
+
+
+def bench(view, factory, headers):
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        request = factory.get('/api/rooms/bench-etag-password', **headers)
+        response = view(request, room_id='bench-etag-password')
+    return (time.perf_counter() - start) / REQUESTS * 1e6, response
+
+
+def main():
+    room_service = get_room_service()
+    setup_room(room_service)
+    view = RoomDetailView.as_view()
+    factory = RequestFactory()
+    headers = {'HTTP_X_USER_FINGERPRINT': 'voter-0'}
+
+    full_us, response = bench(view, factory, headers)
+    assert response.status_code == 200 and response.content
+    etag = response['ETag']
+    not_modified_us, response = bench(view, factory, dict(headers, HTTP_IF_NONE_MATCH=etag))
+    assert response.status_code == 304
+
+    print(f'full response (200): {full_us:8.1f} us/request')
+    print(f'not modified  (304): {not_modified_us:8.1f} us/request')
+    print(f'speedup:             {full_us / not_modified_us:8.1f}x')
+    room_service.delete_room('bench-etag')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+大量观众轮询同一个房间时，每个房间详情请求的 CPU 时间和内存分配。
+
+房间中有 VOTERS 个已投票用户，VIEWERS 个观众（其中 VOTERS 个是投票用户，其余只观看）。
+每一轮先让房间发生一次变化（版本号递增），再由所有观众各请求一次房间详情，共 ROUNDS 轮：
+- legacy：按原来的方式 snapshot.to_dict(指纹) 后整体序列化
+- shared：_room_detail（共享部分按快照版本缓存，只拼接当前用户的投票信息）
+- view：通过 RoomDetailView 完整处理一次请求（不经过中间件）
+
+内存为单个请求期间 tracemalloc 统计的峰值增量（临时分配的字节数），按观众类型分别统计。
+
+用法（在 backend 目录下执行）：
+    python bench/room_fanout.py
+"""
+import time
+import tracemalloc
+
+from _common import HEROES, setup_django
+
+setup_django()
+
+from django.test import RequestFactory  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from app.api.services import get_room_service  # noqa: E402
+from app.api.views import RoomDetailView, _room_detail  # noqa: E402
+
+VIEWERS = 500
+VOTERS = 50
+ROUNDS = 20
+ROOM_ID = 'bench-fanout'
+ROOM_PASSWORD = 'bench-fanout-password'
+
+
+def setup_room(room_service):
+    room_service.create_room(
+        room_id=ROOM_ID,
+        room_password=ROOM_PASSWORD,
+        match_id=1,
+        max_votes=VIEWERS + ROUNDS * 3 + 1,
+        votes_per_user=2,
+        creator_username='bench',
+        creator_fingerprint='bench',
+        heroes=HEROES
+    )
+    for i in range(VOTERS):
+        fingerprint = f'viewer-{i}'
+        room_service.start_user_voting(ROOM_ID, fingerprint)
+        room_service.vote(ROOM_ID, fingerprint, i % 5 + 1, f'用户{i}')
+
+
+def legacy(room_service, fingerprint):
+    snapshot = room_service.get_room_snapshot(ROOM_PASSWORD)
+    return JSONRenderer().render({'success': True, 'data': snapshot.to_dict(fingerprint)})
+
+
+def shared(room_service, fingerprint):
+    return _room_detail(room_service, ROOM_PASSWORD, fingerprint, None)[0]
+
+
+def view(room_service, fingerprint, _view=RoomDetailView.as_view(), _factory=RequestFactory()):
+    request = _factory.get(f'/api/rooms/{ROOM_PASSWORD}', HTTP_X_USER_FINGERPRINT=fingerprint)
+    return _view(request, room_id=ROOM_PASSWORD).content
+
+
+def change_room(room_service, round_index):
+    """让房间发生一次变化：新用户开始投票"""
+    room_service.start_user_voting(ROOM_ID, f'{round_index}-{time.perf_counter_ns()}')
+
+
+def cpu_per_request(room_service, func):
+    viewers = [f'viewer-{i}' for i in range(VIEWERS)]
+    elapsed = 0.0
+    for round_index in range(ROUNDS):
+        change_room(room_service, round_index)
+        start = time.process_time()
+        for fingerprint in viewers:
+            func(room_service, fingerprint)
+        elapsed += time.process_time() - start
+    return elapsed / (ROUNDS * VIEWERS) * 1e6
+
+
+def bytes_per_request(room_service, func, fingerprint):
+    """房间变化后的第一个请求之外，同一版本下后续请求的平均峰值内存增量"""
+    change_room(room_service, -1)
+    func(room_service, 'viewer-0')
+    total = 0
+    count = 200
+    tracemalloc.start()
+    for _ in range(count):
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        func(room_service, fingerprint)
+        total += tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    return total / count
+
+
+def main():
+    room_service = get_room_service()
+    setup_room(room_service)
+    print(f'{VIEWERS} 个观众（{VOTERS} 个投票用户），每轮房间变化一次，共 {ROUNDS} 轮')
+    print(f'{"mode":>7}  {"cpu (us/req)":>12}  {"voter (B/req)":>13}  {"spectator (B/req)":>17}')
+    for name, func in (('legacy', legacy), ('shared', shared), ('view', view)):
+        cpu = cpu_per_request(room_service, func)
+        voter = bytes_per_request(room_service, func, 'viewer-1')
+        spectator = bytes_per_request(room_service, func, f'viewer-{VIEWERS - 1}')
+        print(f'{name:>7}  {cpu:>12.2f}  {voter:>13,.0f}  {spectator:>17,.0f}')
+    room_service.delete_room(ROOM_ID)
+
+
+if __name__ == '__main__':
+    main()
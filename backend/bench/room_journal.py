@@ -0,0 +1,112 @@
+"""
+房间日志（ROOM_JOURNAL_DIR）的开销和恢复时间。
+
+1. 投票延迟：对比不持久化和开启日志（组提交间隔 FLUSH_INTERVAL）时 MemoryRoomBackend.vote 的 p50 / p99 / 吞吐量，
+   日志的后台线程同时在写盘
+2. 恢复时间：创建 RECOVERY_ROOMS 个房间（每个房间 VOTERS 人投票），分别测量
+   - 只有日志、没有快照时的恢复时间
+   - 写入快照的耗时和文件大小，以及从快照恢复的时间
+
+用法（在 backend 目录下执行）：
+    python bench/room_journal.py
+"""
+import os
+import shutil
+import tempfile
+import time
+
+from _common import HEROES
+
+from app.api.room_journal import RoomJournal
+from app.api.services import MemoryRoomBackend
+
+VOTE_ROOMS = 2000
+VOTERS = 5
+FLUSH_INTERVAL = 0.05
+RECOVERY_ROOMS = 100000
+
+
+def populate(backend, rooms, vote=True):
+    """创建房间并让每个房间的 VOTERS 个用户开始投票，vote 为 True 时同时完成投票"""
+    for i in range(rooms):
+        room_id = f'bench-{i}'
+        backend.create_room(room_id, room_id, 1, VOTERS, 1, 'bench', 'bench', HEROES)
+        for voter in range(VOTERS):
+            backend.start_user_voting(room_id, f'voter-{voter}')
+            if vote:
+                backend.vote(room_id, f'voter-{voter}', voter + 1, f'用户{voter}')
+
+
+def create_backend(journal):
+    backend = MemoryRoomBackend(journal)
+    backend.configure_expiry(max_rooms=RECOVERY_ROOMS * 2)
+    return backend
+
+
+def bench_votes(journal):
+    backend = create_backend(journal)
+    populate(backend, VOTE_ROOMS, vote=False)
+    latencies = []
+    start = time.perf_counter()
+    for i in range(VOTE_ROOMS):
+        for voter in range(VOTERS):
+            vote_start = time.perf_counter()
+            backend.vote(f'bench-{i}', f'voter-{voter}', voter + 1, f'用户{voter}')
+            latencies.append(time.perf_counter() - vote_start)
+    elapsed = time.perf_counter() - start
+    if journal is not None:
+        journal.close()
+    latencies.sort()
+    return (
+        len(latencies) / elapsed,
+        latencies[len(latencies) // 2] * 1e6,
+        latencies[int(len(latencies) * 0.99)] * 1e6
+    )
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def timed_recovery(path):
+    start = time.perf_counter()
+    backend = create_backend(RoomJournal(path))
+    elapsed = time.perf_counter() - start
+    rooms = len(backend._rooms)
+    backend._journal.close()
+    return rooms, elapsed
+
+
+def main():
+    root = tempfile.mkdtemp(prefix='bench-journal-')
+    try:
+        print(f'{"journal":>8}  {"votes/s":>9}  {"p50 (us)":>8}  {"p99 (us)":>8}')
+        for name in ('off', 'on'):
+            journal = RoomJournal(os.path.join(root, 'votes'), flush_interval=FLUSH_INTERVAL) if name == 'on' else None
+            rps, p50, p99 = bench_votes(journal)
+            print(f'{name:>8}  {rps:>9,.0f}  {p50:>8.1f}  {p99:>8.1f}')
+
+        path = os.path.join(root, 'recovery')
+        backend = create_backend(RoomJournal(path, flush_interval=FLUSH_INTERVAL, snapshot_interval=3600))
+        populate(backend, RECOVERY_ROOMS)
+        backend._journal.close()
+        del backend
+        print(f'\n{RECOVERY_ROOMS:,} 个房间，每个房间 {VOTERS} 人投票')
+        print(f'日志大小: {directory_size(path) / 1e6:.1f} MB')
+        rooms, elapsed = timed_recovery(path)
+        print(f'从日志恢复: {rooms:,} 个房间, {elapsed:.2f} 秒')
+
+        backend = create_backend(RoomJournal(path, snapshot_interval=3600))
+        start = time.perf_counter()
+        backend._journal.write_snapshot()
+        print(f'写入快照: {time.perf_counter() - start:.2f} 秒, 大小: {directory_size(path) / 1e6:.1f} MB')
+        backend._journal.close()
+        del backend
+        rooms, elapsed = timed_recovery(path)
+        print(f'从快照恢复: {rooms:,} 个房间, {elapsed:.2f} 秒')
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    main()
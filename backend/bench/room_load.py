@@ -0,0 +1,371 @@
+"""
+房间接口的端到端压测：启动本地服务和模拟的 OpenDota 接口，按真实的房间生命周期发送请求，
+以 JSON 输出各接口延迟的 p50 / p99 和吞吐量，用 bench/compare.py 对比不同提交的结果。
+
+每个房间的流程（房间按 --ramp 秒均匀错开开始）：
+1. 房主创建房间（每个房间使用不同的比赛ID，比赛数据由后台从模拟的 OpenDota 获取，房间先处于 pending 状态）
+2. 房主和 --voters 个投票用户每隔 --poll-interval 秒轮询一次房间详情（带 If-None-Match，与前端相同；
+   --long-poll 时改为前端的长轮询，单独统计为 detail_wait，耗时包括等待房间变化的时间）
+3. 房间就绪后，每个投票用户在 --vote-spread 秒内的随机时间开始投票并投出一票，所有人投完后房间结束
+4. 房主重置投票，重复 --rounds 轮；最后一轮结束后所有人再轮询一次后离开
+
+随机数使用固定的 --seed，房间和投票的时间安排在相同参数下完全相同。压测客户端和服务在同一台机器上，
+服务进程的 CPU 时间（server_cpu_ms_per_request，从 /proc 读取）受客户端的影响比延迟小，适合对比提交。
+服务使用当前环境变量中的配置（例如 ROOM_BACKEND），OpenDota 地址和磁盘缓存由本脚本设置。
+
+用法（在 backend 目录下执行，需要安装 gunicorn、uvicorn 和 httpx）：
+    python bench/room_load.py --output load.json
+    python bench/room_load.py --server asgi --rooms 100 --voters 10 --output load-asgi.json
+"""
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+from _common import BACKEND_DIR, free_port, run_metadata
+
+# 长轮询的等待时间（秒），与前端的 LONG_POLL_WAIT 相同
+LONG_POLL_WAIT = 25
+# 房间就绪前房主查询状态的间隔（秒）
+PENDING_POLL_INTERVAL = 0.2
+# 失败方 5 名玩家（hero_id 需要在 heroes.json 中）
+MATCH_PLAYERS = [
+    {'player_slot': 128 + i, 'hero_id': i + 1, 'personaname': f'玩家{i + 1}', 'isRadiant': False, 'win': 0}
+    for i in range(5)
+] + [
+    {'player_slot': i, 'hero_id': i + 10, 'personaname': f'对手{i + 1}', 'isRadiant': True, 'win': 1}
+    for i in range(5)
+]
+ENDPOINTS = ('create', 'detail', 'detail_wait', 'start', 'vote', 'reset')
+
+
+def start_opendota_stub(delay):
+    """在后台线程中启动模拟的 OpenDota 接口，每个请求等待 delay 秒后返回同一场比赛，返回 (服务, 地址)"""
+    body = json.dumps({'radiant_win': True, 'players': MATCH_PLAYERS}).encode('utf-8')
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            time.sleep(delay)
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
+
+
+def start_server(args, port, opendota_url):
+    env = dict(
+        os.environ,
+        DJANGO_SETTINGS_MODULE='app.settings',
+        DEBUG='False',
+        OPENDOTA_BASE_URL=opendota_url,
+        # 每次压测都从 OpenDota 获取比赛数据
+        OPENDOTA_DISK_CACHE_PATH=''
+    )
+    if args.server == 'asgi':
+        command = [
+            sys.executable, '-m', 'uvicorn', 'app.asgi:application',
+            '--host', '127.0.0.1',
+            '--port', str(port),
+            '--workers', str(args.workers),
+            '--log-level', 'warning'
+        ]
+    else:
+        command = [
+            sys.executable, '-m', 'gunicorn', 'app.wsgi:application',
+            '--bind', f'127.0.0.1:{port}',
+            '--workers', str(args.workers),
+            '--worker-class', 'gthread',
+            '--threads', str(args.threads),
+            '--timeout', str(LONG_POLL_WAIT * 3)
+        ]
+    server = subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while True:
+        if time.time() > deadline or server.poll() is not None:
+            server.kill()
+            raise RuntimeError(f'{args.server} 服务启动失败')
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            conn.request('GET', '/api/stats')
+            ready = conn.getresponse().status == 200
+            conn.close()
+            if ready:
+                return server
+        except OSError:
+            pass
+        time.sleep(0.1)
+
+
+def process_cpu_seconds(pid):
+    """进程及其所有子进程（gunicorn / uvicorn 的 worker）已使用的 CPU 时间，不能读取 /proc 时返回 None"""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        total = (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            children = [int(child) for child in f.read().split()]
+    except (OSError, ValueError, IndexError):
+        return None
+    for child in children:
+        child_seconds = process_cpu_seconds(child)
+        if child_seconds is not None:
+            total += child_seconds
+    return total
+
+
+class LoadClient:
+    """发送请求并按接口记录 (状态码, 耗时)；连接错误记为状态 error"""
+
+    def __init__(self, base_url, connections):
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=httpx.Timeout(LONG_POLL_WAIT + 10),
+            limits=httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+        )
+        self.samples = {endpoint: [] for endpoint in ENDPOINTS}
+
+    async def request(self, endpoint, method, url, fingerprint, **kwargs):
+        headers = kwargs.pop('headers', {})
+        headers['X-User-Fingerprint'] = fingerprint
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, headers=headers, **kwargs)
+        except httpx.HTTPError:
+            self.samples[endpoint].append(('error', time.perf_counter() - start))
+            return None
+        self.samples[endpoint].append((str(response.status_code), time.perf_counter() - start))
+        return response
+
+    async def close(self):
+        await self.client.aclose()
+
+
+class Viewer:
+    """房间页面：定期轮询房间详情，带上次的 ETag；长轮询时带上次的版本号"""
+
+    def __init__(self, client, password, fingerprint, args):
+        self.client = client
+        self.password = password
+        self.fingerprint = fingerprint
+        self.args = args
+        self.etag = None
+        self.version = None
+        self.status = None
+
+    async def poll(self, wait=False):
+        """查询一次房间详情；wait 时使用长轮询（记为 detail_wait，耗时包括等待房间变化的时间）"""
+        url = f'/api/rooms/{self.password}'
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        endpoint, params = 'detail', None
+        if wait and self.version is not None:
+            endpoint, params = 'detail_wait', {'since': self.version, 'wait': LONG_POLL_WAIT}
+        response = await self.client.request(endpoint, 'GET', url, self.fingerprint, headers=headers, params=params)
+        if response is None:
+            return
+        if response.status_code == 200:
+            self.etag = response.headers.get('ETag')
+            self.version = response.headers.get('X-Room-Version')
+            self.status = response.json()['data']['status']
+
+    async def run(self, stop: asyncio.Event, offset: float):
+        """
+        在 stop 之前每隔 poll_interval 秒轮询一次（长轮询时上一次返回后再等待间隔）；
+        stop 时放弃等待中的长轮询（离开页面），再普通轮询一次
+        """
+        await asyncio.sleep(offset)
+        stopped = asyncio.ensure_future(stop.wait())
+        while not stop.is_set():
+            poll = asyncio.ensure_future(self.poll(wait=self.args.long_poll))
+            await asyncio.wait({poll, stopped}, return_when=asyncio.FIRST_COMPLETED)
+            if not poll.done():
+                poll.cancel()
+                break
+            await asyncio.wait({stopped}, timeout=self.args.poll_interval)
+        stopped.cancel()
+        await self.poll()
+
+
+async def room_lifecycle(client, index, args):
+    rng = random.Random(f'{args.seed}-{index}')
+    await asyncio.sleep(index * args.ramp / args.rooms)
+    password = f'load-{args.seed}-{index}'
+    creator = f'{password}-creator'
+    response = await client.request('create', 'POST', '/api/rooms', creator, json={
+        # 每个房间使用不同的比赛，创建时都需要从 OpenDota 获取
+        'match_id': 7000000000 + args.seed * 100000 + index,
+        'room_password': password,
+        'max_votes': args.voters,
+        'votes_per_user': 1,
+        'username': f'房主{index}'
+    })
+    if response is None or response.status_code not in (200, 202):
+        return False
+
+    host = Viewer(client, password, creator, args)
+    while host.status in (None, 'pending'):
+        await host.poll()
+        if host.status in (None, 'pending'):
+            await asyncio.sleep(PENDING_POLL_INTERVAL)
+    if host.status != 'init':
+        return False
+
+    viewers = [host] + [Viewer(client, password, f'{password}-voter-{i}', args) for i in range(args.voters)]
+    stop = asyncio.Event()
+    pollers = [
+        asyncio.create_task(viewer.run(stop, rng.uniform(0, args.poll_interval)))
+        for viewer in viewers
+    ]
+
+    async def vote(viewer, delay):
+        await asyncio.sleep(delay)
+        url = f'/api/rooms/{password}'
+        await client.request('start', 'POST', f'{url}/start', viewer.fingerprint)
+        await client.request('vote', 'POST', f'{url}/vote', viewer.fingerprint, json={
+            'player_index': rng.randint(1, 5),
+            'username': viewer.fingerprint
+        })
+
+    for round_index in range(args.rounds):
+        if round_index:
+            await client.request('reset', 'POST', f'/api/rooms/{password}/reset', creator)
+        await asyncio.gather(*(vote(viewer, rng.uniform(0, args.vote_spread)) for viewer in viewers[1:]))
+        # 所有人投完后等一个轮询间隔，让页面看到结果
+        await asyncio.sleep(args.poll_interval)
+    stop.set()
+    await asyncio.gather(*pollers)
+    return True
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def summarize(samples, duration):
+    """(状态码, 耗时) 列表 -> 请求数、吞吐量、延迟分位数（毫秒）和各状态码的数量"""
+    latencies = sorted(elapsed * 1000 for _, elapsed in samples)
+    statuses = {}
+    for status, _ in samples:
+        statuses[status] = statuses.get(status, 0) + 1
+    return {
+        'count': len(samples),
+        'rps': round(len(samples) / duration, 2),
+        'p50_ms': round(percentile(latencies, 0.5), 3) if latencies else None,
+        'p90_ms': round(percentile(latencies, 0.9), 3) if latencies else None,
+        'p99_ms': round(percentile(latencies, 0.99), 3) if latencies else None,
+        'max_ms': round(latencies[-1], 3) if latencies else None,
+        'statuses': dict(sorted(statuses.items())),
+    }
+
+
+async def run_load(args, base_url):
+    # 每个页面一条连接
+    client = LoadClient(base_url, args.rooms * (args.voters + 1))
+    try:
+        start = time.perf_counter()
+        completed = await asyncio.gather(*(room_lifecycle(client, index, args) for index in range(args.rooms)))
+        duration = time.perf_counter() - start
+    finally:
+        await client.close()
+    return client.samples, duration, sum(completed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='房间接口端到端压测')
+    parser.add_argument('--server', choices=('wsgi', 'asgi'), default='wsgi',
+                        help='wsgi：gunicorn gthread；asgi：uvicorn')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--threads', type=int, default=32, help='gunicorn 每个 worker 的线程数')
+    parser.add_argument('--rooms', type=int, default=50)
+    parser.add_argument('--voters', type=int, default=10, help='每个房间的投票用户数（不含房主）')
+    parser.add_argument('--rounds', type=int, default=2, help='每个房间的投票轮数，轮与轮之间由房主重置')
+    parser.add_argument('--poll-interval', type=float, default=2.0)
+    parser.add_argument('--long-poll', action='store_true', help='使用前端的长轮询代替普通轮询')
+    parser.add_argument('--vote-spread', type=float, default=10.0, help='投票用户在多少秒内陆续投票')
+    parser.add_argument('--ramp', type=float, default=10.0, help='各房间在多少秒内陆续创建')
+    parser.add_argument('--opendota-delay', type=float, default=0.2, help='模拟的 OpenDota 接口响应时间（秒）')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', '-o', help='JSON 结果文件（默认输出到 stdout）')
+    args = parser.parse_args()
+
+    stub, opendota_url = start_opendota_stub(args.opendota_delay)
+    port = free_port()
+    server = start_server(args, port, opendota_url)
+    try:
+        cpu_before = process_cpu_seconds(server.pid)
+        samples, duration, completed = asyncio.run(run_load(args, f'http://127.0.0.1:{port}'))
+        cpu_after = process_cpu_seconds(server.pid)
+    finally:
+        server.terminate()
+        server.wait()
+        stub.shutdown()
+
+    all_samples = [sample for endpoint_samples in samples.values() for sample in endpoint_samples]
+    errors = sum(1 for status, _ in all_samples if status == 'error' or int(status) >= 400)
+    results = {
+        'duration_s': round(duration, 3),
+        'rooms_completed': completed,
+        'errors': errors,
+        # 长轮询的耗时包括等待房间变化的时间，不计入总体的延迟分位数
+        'total': summarize([
+            sample for endpoint, endpoint_samples in samples.items() if endpoint != 'detail_wait'
+            for sample in endpoint_samples
+        ], duration),
+        'endpoints': {endpoint: summarize(samples[endpoint], duration) for endpoint in ENDPOINTS},
+    }
+    if cpu_before is not None and cpu_after is not None and all_samples:
+        results['server_cpu_s'] = round(cpu_after - cpu_before, 3)
+        results['server_cpu_ms_per_request'] = round((cpu_after - cpu_before) * 1000 / len(all_samples), 4)
+
+    total = results['total']
+    print(f'{args.server}: {total["count"]:,} 个请求（不含长轮询），{duration:.1f} 秒，{total["rps"]:,.1f} req/s，'
+          f'p50 {total["p50_ms"]:.2f} ms，p99 {total["p99_ms"]:.2f} ms，'
+          f'完成 {completed}/{args.rooms} 个房间，错误 {errors}', file=sys.stderr)
+    print(f'{"endpoint":>11}  {"count":>7}  {"p50 (ms)":>8}  {"p99 (ms)":>8}  statuses', file=sys.stderr)
+    for endpoint, summary in results['endpoints'].items():
+        if summary['count']:
+            print(f'{endpoint:>11}  {summary["count"]:>7,}  {summary["p50_ms"]:>8.2f}  {summary["p99_ms"]:>8.2f}  '
+                  f'{summary["statuses"]}', file=sys.stderr)
+    if 'server_cpu_ms_per_request' in results:
+        print(f'服务进程 CPU：{results["server_cpu_s"]:.2f} 秒，每个请求 {results["server_cpu_ms_per_request"]:.3f} ms',
+              file=sys.stderr)
+
+    report = {
+        'benchmark': 'room_load',
+        'meta': run_metadata(),
+        'config': {key: value for key, value in vars(args).items() if key != 'output'},
+        'results': results,
+    }
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+按房间密码查找房间的延迟基准测试。
+
+用法（在 backend 目录下执行）：
+    python bench/room_lookup.py
+"""
+import time
+import uuid
+
+import _common  # noqa: F401（导入时把 backend 目录加入 sys.path）
+
+from app.api.services import get_room_service
+
+ROOM_COUNTS = [10, 100, 1000, 10000, 100000]
+LOOKUPS = 20000
+
+
+def populate(room_service, count):
+    """创建 count 个房间，返回 (房间ID列表, 密码列表)"""
+    room_ids = []
+    passwords = []
+    for i in range(count):
+        room_id = f'bench-{i}'
+        password = str(uuid.uuid4())
+        room_service.create_room(
+            room_id=room_id,
+            room_password=password,
+            match_id=i,
+            max_votes=5,
+            votes_per_user=1,
+            creator_username='bench',
+            creator_fingerprint='bench',
+            heroes=[]
+        )
+        room_ids.append(room_id)
+        passwords.append(password)
+    return room_ids, passwords
+
+
+def bench_lookup(room_service, passwords):
+    """返回单次 get_room_by_password 的平均耗时（微秒）"""
+    # 轮流查找不同位置的房间，避免总是命中同一个
+    targets = [passwords[i % len(passwords)] for i in range(0, LOOKUPS * 7919, 7919)]
+    start = time.perf_counter()
+    for password in targets:
+        room_service.get_room_by_password(password)
+    return (time.perf_counter() - start) / len(targets) * 1e6
+
+
+def main():
+    room_service = get_room_service()
+    # 默认容量上限会在建房时淘汰房间，基准测试期间放开
+    room_service.configure_expiry(max_rooms=max(ROOM_COUNTS))
+    print(f'{"rooms":>8}  {"get_room_by_password (us)":>26}  {"room_exists_by_password (us)":>30}')
+    for count in ROOM_COUNTS:
+        room_ids, passwords = populate(room_service, count)
+        lookup_us = bench_lookup(room_service, passwords)
+
+        start = time.perf_counter()
+        for _ in range(LOOKUPS):
+            room_service.room_exists_by_password('missing-password')
+        miss_us = (time.perf_counter() - start) / LOOKUPS * 1e6
+
+        print(f'{count:>8}  {lookup_us:>26.3f}  {miss_us:>30.3f}')
+        for room_id in room_ids:
+            room_service.delete_room(room_id)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+/metrics 指标记录的开销。
+
+完整请求的处理时间（几百微秒）波动比指标开销大得多，因此分别测量每个记录点开启与关闭指标
+（把所有已注册指标的 inc / observe 替换为空函数）时的耗时之差，再按请求类型相加：
+- middleware：MetricsMiddleware（计时、视图标签、请求数和处理时间）
+- room lock：内存存储后端的 _locked_room（房间锁的等待和持有时间）
+- payload：_RoomPayload.of（房间详情缓存命中计数）
+- vote：RoomService.vote（投票数）
+poll（GET /api/rooms/{room_id}）= middleware + payload，vote（POST /vote）= middleware + room lock + vote。
+
+最后输出一次 /metrics 请求的耗时。
+
+用法（在 backend 目录下执行）：
+    python bench/room_metrics.py
+"""
+import time
+
+from _common import HEROES, setup_django
+
+setup_django()
+
+from django.core.handlers.base import BaseHandler  # noqa: E402
+from django.http import HttpResponse  # noqa: E402
+from django.test import RequestFactory  # noqa: E402
+from django.urls import resolve  # noqa: E402
+
+from app.api.services import get_room_service  # noqa: E402
+from app.api.views import _RoomPayload  # noqa: E402
+from app.metrics import REGISTRY, Counter, Histogram, Registry  # noqa: E402
+from app.middleware import MetricsMiddleware  # noqa: E402
+
+CALLS = 100000
+ROOM_PASSWORD = 'bench-metrics'
+
+
+def per_call(func, calls=CALLS):
+    """单次调用的请求线程 CPU 时间（ns），取 3 次中的最小值"""
+    best = None
+    for _ in range(3):
+        start = time.thread_time_ns()
+        for _ in range(calls):
+            func()
+        elapsed = (time.thread_time_ns() - start) / calls
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def set_metrics_enabled(enabled):
+    for metric in REGISTRY.metrics:
+        if enabled:
+            metric.__dict__.pop('inc', None)
+            metric.__dict__.pop('observe', None)
+        else:
+            metric.inc = metric.observe = lambda *args, **kwargs: None
+
+
+def with_and_without(func, calls=CALLS):
+    set_metrics_enabled(False)
+    off = per_call(func, calls)
+    set_metrics_enabled(True)
+    on = per_call(func, calls)
+    return on - off
+
+
+def main():
+    registry = Registry()
+    counter = Counter('bench_total', 'bench', ('view',), registry=registry)
+    histogram = Histogram('bench_seconds', 'bench', ('view',), registry=registry)
+    labels = ('room-detail',)
+    print(f'Counter.inc: {per_call(lambda: counter.inc(labels)):.0f} ns')
+    print(f'Histogram.observe: {per_call(lambda: histogram.observe(0.003, labels)):.0f} ns')
+
+    room_service = get_room_service()
+    snapshot = room_service.create_room(
+        room_id=ROOM_PASSWORD,
+        room_password=ROOM_PASSWORD,
+        match_id=1,
+        max_votes=CALLS * 10,
+        votes_per_user=1,
+        creator_username='bench',
+        creator_fingerprint='bench',
+        heroes=HEROES
+    )
+    backend = room_service._backend
+
+    def locked_room():
+        with backend._locked_room(ROOM_PASSWORD):
+            pass
+
+    def view(request):
+        return HttpResponse(b'{}', content_type='application/json')
+
+    middleware = MetricsMiddleware(view)
+    request = RequestFactory().get(f'/api/rooms/{ROOM_PASSWORD}')
+    request.resolver_match = resolve(request.path)
+
+    # 投票结果为错误（未开始投票）时不计数，这里直接计入一次 Counter.inc
+    costs = {
+        'middleware': with_and_without(lambda: middleware(request)),
+        'room lock': with_and_without(locked_room),
+        'payload': with_and_without(lambda: _RoomPayload.of(snapshot)),
+        'vote': per_call(lambda: counter.inc()),
+    }
+    print(f'{"component":>10}  {"overhead (ns)":>13}')
+    for name, cost in costs.items():
+        print(f'{name:>10}  {cost:>13.0f}')
+    poll = costs['middleware'] + costs['payload']
+    vote = costs['middleware'] + costs['room lock'] + costs['vote']
+    print(f'每个请求的指标开销：poll {poll / 1000:.2f} us，vote {vote / 1000:.2f} us')
+
+    handler = BaseHandler()
+    handler.load_middleware()
+    start = time.perf_counter()
+    response = handler.get_response(RequestFactory().get('/metrics'))
+    print(f'/metrics: {(time.perf_counter() - start) * 1000:.2f} ms, {len(response.content):,} B')
+    room_service.delete_room(ROOM_PASSWORD)
+
+
+if __name__ == '__main__':
+    main()
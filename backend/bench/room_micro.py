@@ -0,0 +1,180 @@
+"""
+房间服务和房间详情的微基准测试，结果以 JSON 输出，用 bench/compare.py 对比不同提交的结果。
+
+对每个房间总数（ROOM_COUNTS）和目标房间的投票用户数（VOTER_COUNTS）的组合测量单次操作耗时（ns）：
+- get_room_by_password：按密码读取房间（旧版字典格式）
+- get_room：按房间ID读取房间（旧版字典格式）
+- vote：一次有效投票（每轮重新创建目标房间，新用户各投一票，逐次计时）
+- detail_serialize：按快照序列化房间详情（不使用按版本缓存的结果，相当于房间变化后的第一个请求）
+- detail_view：通过 RoomDetailView 完整处理一次详情请求（不经过中间件，命中序列化缓存）
+
+房间存储使用 settings 中配置的后端（默认内存）；其他房间按房间总数补齐，每个房间没有投票用户。
+每项取 REPEATS 次测量的中位数。
+
+用法（在 backend 目录下执行）：
+    python bench/room_micro.py --output micro.json
+    python bench/room_micro.py --quick          # 只测较小的组合，结果输出到 stdout
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+
+from _common import HEROES, run_metadata, setup_django
+
+setup_django()
+
+from django.test import RequestFactory  # noqa: E402
+
+from app.api.services import PLAYER_COUNT, get_room_service  # noqa: E402
+from app.api.views import RoomDetailView, _RoomPayload  # noqa: E402
+
+ROOM_COUNTS = [10, 1000, 100000]
+VOTER_COUNTS = [1, 10, 100, 1000]
+QUICK_ROOM_COUNTS = [10, 1000]
+QUICK_VOTER_COUNTS = [1, 100]
+# 读取类操作每次测量的调用次数
+CALLS = 2000
+REPEATS = 5
+# 投票：每轮新用户数，总共计时的投票次数
+VOTES_PER_ROUND = 10
+VOTE_SAMPLES = 200
+
+
+def create_room(room_service, room_id, voters, extra_voters=0):
+    """创建已有 voters 个用户投票的房间，另有 extra_voters 个已开始投票、尚未投票的用户"""
+    room_service.create_room(
+        room_id=room_id,
+        room_password=f'{room_id}-password',
+        match_id=1,
+        max_votes=voters + extra_voters + 1,
+        votes_per_user=1,
+        creator_username='bench',
+        creator_fingerprint='bench',
+        heroes=HEROES
+    )
+    for i in range(voters):
+        fingerprint = f'voter-{i}'
+        room_service.start_user_voting(room_id, fingerprint)
+        room_service.vote(room_id, fingerprint, i % PLAYER_COUNT + 1, f'用户{i}')
+    for i in range(extra_voters):
+        room_service.start_user_voting(room_id, f'extra-{i}')
+
+
+def per_call(func, calls=CALLS):
+    """单次调用耗时（ns），取 REPEATS 次测量的中位数"""
+    samples = []
+    for _ in range(REPEATS):
+        start = time.perf_counter_ns()
+        for _ in range(calls):
+            func()
+        samples.append((time.perf_counter_ns() - start) / calls)
+    return statistics.median(samples)
+
+
+def vote_cost(room_service, voters):
+    """一次有效投票的耗时（ns）：每轮重新创建房间，逐次计时，取中位数"""
+    room_id = f'bench-micro-vote-{voters}'
+    samples = []
+    while len(samples) < VOTE_SAMPLES:
+        create_room(room_service, room_id, voters, VOTES_PER_ROUND)
+        for i in range(VOTES_PER_ROUND):
+            start = time.perf_counter_ns()
+            result = room_service.vote(room_id, f'extra-{i}', i % PLAYER_COUNT + 1, f'新用户{i}')
+            samples.append(time.perf_counter_ns() - start)
+            if not result['success']:
+                raise RuntimeError(f'投票失败: {result}')
+        room_service.delete_room(room_id)
+    return statistics.median(samples)
+
+
+def detail_request(view, request, password):
+    response = view(request, room_id=password)
+    # 序列化缓存命中时视图直接返回 HttpResponse，其余情况返回需要渲染的 DRF Response
+    if hasattr(response, 'render'):
+        response.render()
+    return response
+
+
+def measure(room_service, voters):
+    """目标房间（voters 个投票用户）上各项操作的耗时（ns）"""
+    room_id = f'bench-micro-{voters}'
+    password = f'{room_id}-password'
+    snapshot = room_service.get_room_snapshot(password)
+    view = RoomDetailView.as_view()
+    request = RequestFactory().get(f'/api/rooms/{password}', HTTP_X_USER_FINGERPRINT='voter-0')
+    return {
+        'get_room_by_password': per_call(lambda: room_service.get_room_by_password(password)),
+        'get_room': per_call(lambda: room_service.get_room(room_id)),
+        'vote': vote_cost(room_service, voters),
+        'detail_serialize': per_call(lambda: _RoomPayload(snapshot).response('voter-0')),
+        'detail_view': per_call(lambda: detail_request(view, request, password)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='房间服务微基准测试')
+    parser.add_argument('--output', '-o', help='JSON 结果文件（默认输出到 stdout）')
+    parser.add_argument('--quick', action='store_true', help='只测较小的组合')
+    args = parser.parse_args()
+    room_counts = QUICK_ROOM_COUNTS if args.quick else ROOM_COUNTS
+    voter_counts = QUICK_VOTER_COUNTS if args.quick else VOTER_COUNTS
+
+    room_service = get_room_service()
+    # 默认容量上限会在建房时淘汰房间，基准测试期间放开
+    room_service.configure_expiry(max_rooms=max(room_counts) + len(voter_counts) + 1)
+    for voters in voter_counts:
+        create_room(room_service, f'bench-micro-{voters}', voters)
+
+    results = {}
+    filler = 0
+    log = sys.stderr
+    print(f'{"rooms":>7}  {"voters":>6}  ' + '  '.join(f'{name:>20}' for name in (
+        'get_room_by_password', 'get_room', 'vote', 'detail_serialize', 'detail_view'
+    )) + '  (ns/op)', file=log)
+    for rooms in room_counts:
+        # 补齐其他房间（目标房间也计入房间总数）
+        while filler + len(voter_counts) < rooms:
+            room_service.create_room(
+                room_id=f'bench-micro-filler-{filler}',
+                room_password=f'bench-micro-filler-{filler}-password',
+                match_id=filler,
+                max_votes=5,
+                votes_per_user=1,
+                creator_username='bench',
+                creator_fingerprint='bench',
+                heroes=HEROES
+            )
+            filler += 1
+        for voters in voter_counts:
+            costs = measure(room_service, voters)
+            key = f'rooms={rooms},voters={voters}'
+            for name, cost in costs.items():
+                results.setdefault(name, {})[key] = round(cost, 1)
+            print(f'{rooms:>7}  {voters:>6}  ' + '  '.join(f'{cost:>20,.0f}' for cost in costs.values()), file=log)
+
+    report = {
+        'benchmark': 'room_micro',
+        'meta': run_metadata(),
+        'config': {
+            'backend': type(room_service._backend).__name__,
+            'room_counts': room_counts,
+            'voter_counts': voter_counts,
+            'calls': CALLS,
+            'repeats': REPEATS,
+            'vote_samples': VOTE_SAMPLES,
+        },
+        'unit': 'ns/op',
+        'results': results,
+    }
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+中间件链的单请求开销。
+
+用一个直接返回固定响应的视图代替 URL 解析和接口处理，分别按以下配置组装中间件链：
+- none：没有中间件
+- django：原来的配置（SecurityMiddleware、CommonMiddleware、CsrfViewMiddleware、XFrameOptionsMiddleware
+  加上本项目的两个中间件）
+- configured：settings.MIDDLEWARE（与 Django 相同，跳过未启用的中间件，例如关闭请求分析时的 ProfilingMiddleware）
+
+对三种请求统计请求线程的 CPU 时间（time.thread_time，不包括日志后台线程的时间）减去 none 的结果：
+- poll：GET /api/rooms/{room_id}（轮询，不记录日志）
+- vote：POST /api/rooms/{room_id}/vote（记录访问日志）
+- preflight：OPTIONS 预检请求（不调用视图）
+
+日志写入 /dev/null。
+
+用法（在 backend 目录下执行）：
+    python bench/room_middleware.py
+"""
+import time
+
+from _common import setup_django
+
+setup_django()
+
+from django.conf import settings  # noqa: E402
+from django.core.exceptions import MiddlewareNotUsed  # noqa: E402
+from django.http import HttpResponse  # noqa: E402
+from django.test import RequestFactory  # noqa: E402
+from django.utils.module_loading import import_string  # noqa: E402
+
+REQUESTS = 20000
+ROOM_PASSWORD = 'bench-middleware-password'
+
+DJANGO_MIDDLEWARE = [
+    'django.middleware.security.SecurityMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'app.middleware.AccessLogMiddleware',
+    'app.middleware.CorsMiddleware',
+]
+
+RESPONSE = b'{"success":true}'
+
+
+def view(request):
+    return HttpResponse(RESPONSE, content_type='application/json')
+
+
+def build_chain(middleware):
+    """与 BaseHandler.load_middleware 相同的顺序组装中间件链，跳过抛出 MiddlewareNotUsed 的中间件"""
+    chain = view
+    for path in reversed(middleware):
+        try:
+            chain = import_string(path)(chain)
+        except MiddlewareNotUsed:
+            continue
+    return chain
+
+
+def build_requests():
+    factory = RequestFactory()
+    headers = {
+        'HTTP_X_USER_FINGERPRINT': 'bench',
+        'HTTP_USER_AGENT': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0',
+        'HTTP_X_FORWARDED_FOR': '203.0.113.7, 10.0.0.1',
+    }
+    return {
+        'poll': factory.get(f'/api/rooms/{ROOM_PASSWORD}', **headers),
+        'vote': factory.post(f'/api/rooms/{ROOM_PASSWORD}/vote', b'{"player_index": 1}',
+                             content_type='application/json', **headers),
+        'preflight': factory.options(f'/api/rooms/{ROOM_PASSWORD}/vote', **headers),
+    }
+
+
+def cpu_per_request(chain, request):
+    # CsrfViewMiddleware 会在 request 上记录状态，每次使用新的副本
+    requests = [request.__class__(request.environ) for _ in range(REQUESTS)]
+    chain(requests[0])
+    start = time.thread_time()
+    for item in requests:
+        chain(item)
+    return (time.thread_time() - start) / REQUESTS * 1e6
+
+
+def main():
+    stacks = {
+        'none': [],
+        'django': DJANGO_MIDDLEWARE,
+        'configured': list(settings.MIDDLEWARE),
+    }
+    requests = build_requests()
+    results = {
+        name: {kind: cpu_per_request(build_chain(middleware), request) for kind, request in requests.items()}
+        for name, middleware in stacks.items()
+    }
+
+    print(f'中间件链开销（请求线程 CPU 时间，减去 none 的结果），configured: {", ".join(settings.MIDDLEWARE)}')
+    print(f'{"stack":>10}  ' + '  '.join(f'{kind + " (us)":>14}' for kind in requests))
+    for name in ('django', 'configured'):
+        print(f'{name:>10}  ' + '  '.join(
+            f'{results[name][kind] - results["none"][kind]:>14.2f}' for kind in requests
+        ))
+
+
+if __name__ == '__main__':
+    main()
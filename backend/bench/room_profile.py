@@ -0,0 +1,110 @@
+"""
+请求性能分析（ProfilingMiddleware + /debug/profile）的开销和输出。
+
+- 未被选中的请求：中间件链中加入 ProfilingMiddleware（PROFILE_SAMPLE_RATE=100）前后，
+  每个请求的请求线程 CPU 时间之差
+- 被选中的请求：记录调用栈时的处理时间与不记录时之比，以及记录结果中的总耗时（已扣除记录开销，
+  不包括 [gc] 时与不记录时的处理时间相比偏大的部分即为剩余的记录误差）
+- 输出记录结果中自身耗时最多的函数（按折叠栈的最后一帧汇总）
+
+用法（在 backend 目录下执行）：
+    python bench/room_profile.py
+"""
+import os
+import time
+
+from _common import HEROES, setup_django
+
+os.environ['PROFILE_SAMPLE_RATE'] = '100'
+setup_django()
+
+from django.core.handlers.base import BaseHandler  # noqa: E402
+from django.http import HttpResponse  # noqa: E402
+from django.test import RequestFactory  # noqa: E402
+
+from app.api.services import get_room_service  # noqa: E402
+from app.middleware import ProfilingMiddleware  # noqa: E402
+from app.profiling import get_profiler  # noqa: E402
+
+CALLS = 200000
+REQUESTS = 2000
+ROOM_PASSWORD = 'bench-profile'
+TOP = 15
+
+
+def per_call(func, calls=CALLS):
+    """单次调用的请求线程 CPU 时间（ns），取 3 次中的最小值"""
+    best = None
+    for _ in range(3):
+        start = time.thread_time_ns()
+        for _ in range(calls):
+            func()
+        elapsed = (time.thread_time_ns() - start) / calls
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    response = HttpResponse(b'{}', content_type='application/json')
+    request = RequestFactory().get(f'/api/rooms/{ROOM_PASSWORD}')
+    middleware = ProfilingMiddleware(lambda request: response)
+    # 只测量未被选中的请求
+    middleware.sample_rate = 0
+    view = per_call(lambda: response)
+    unselected = per_call(lambda: middleware(request))
+    print(f'未被选中的请求: {unselected - view:.0f} ns')
+
+    room_service = get_room_service()
+    room_service.create_room(
+        room_id=ROOM_PASSWORD,
+        room_password=ROOM_PASSWORD,
+        match_id=1,
+        max_votes=10,
+        votes_per_user=1,
+        creator_username='bench',
+        creator_fingerprint='bench',
+        heroes=HEROES
+    )
+    handler = BaseHandler()
+    handler.load_middleware()
+    factory = RequestFactory()
+    requests = [
+        factory.get(f'/api/rooms/{ROOM_PASSWORD}', HTTP_X_USER_FINGERPRINT=f'bench-{i}')
+        for i in range(REQUESTS)
+    ]
+    profiler = get_profiler()
+
+    def run(profiled):
+        start = time.perf_counter()
+        for item in requests:
+            if profiled:
+                with profiler.profiling():
+                    handler.get_response(item)
+            else:
+                handler.get_response(item)
+        return (time.perf_counter() - start) / REQUESTS * 1e6
+
+    # 预热（URL 解析缓存、开销校准）
+    run(False)
+    run(True)
+    profiler.configure(window=600)
+    plain = min(run(False) for _ in range(3))
+    profiled = run(True)
+    lines = profiler.collapsed().splitlines()
+    leaves = {}
+    for line in lines:
+        stack, elapsed = line.rsplit(' ', 1)
+        leaf = stack.rsplit(';', 1)[-1]
+        leaves[leaf] = leaves.get(leaf, 0) + int(elapsed)
+    recorded = sum(leaves.values()) / REQUESTS
+    collecting = leaves.get('[gc]', 0) / REQUESTS
+    print(f'GET /api/rooms/{{room_id}}: 不记录 {plain:.0f} us，记录 {profiled:.0f} us（{profiled / plain:.1f} 倍），'
+          f'记录结果 {recorded:.0f} us（其中 [gc] {collecting:.0f} us），{len(lines)} 条调用路径')
+    print(f'{"self (us/req)":>13}  function')
+    for leaf, elapsed in sorted(leaves.items(), key=lambda item: -item[1])[:TOP]:
+        print(f'{elapsed / REQUESTS:>13.1f}  {leaf}')
+    room_service.delete_room(ROOM_PASSWORD)
+
+
+if __name__ == '__main__':
+    main()
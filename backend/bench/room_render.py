@@ -0,0 +1,82 @@
+"""
+房间接口响应的 JSON 序列化耗时：DRF 的 JSONRenderer（标准库 json）与 ORJSONRenderer（orjson）对比，
+以及房间详情按快照缓存序列化结果（_RoomPayload）后的耗时。
+
+负载为真实的房间详情：5 个中文英雄名 / 玩家昵称，VOTER_COUNTS 个已投票用户（中文用户名），
+分别测量投票中（包含已投票用户名列表）和已结束（包含投票结果）的房间。
+
+用法（在 backend 目录下执行）：
+    python bench/room_render.py
+"""
+import time
+
+from _common import setup_django
+
+setup_django()
+
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from app.api.renderers import ORJSONRenderer, orjson  # noqa: E402
+from app.api.services import MemoryRoomBackend  # noqa: E402
+from app.api.views import _RoomPayload  # noqa: E402
+
+DURATION = 0.5
+VOTER_COUNTS = [5, 100, 1000]
+
+HEROES = [
+    {'player_slot': 128 + i, 'hero_id': i + 1, 'hero_name': name, 'nickname': nickname}
+    for i, (name, nickname) in enumerate([
+        ('敌法师', '不朽的敌法师'), ('斧王', '斧王一刀999'), ('祈求者', '卡尔的奥术'), ('帕吉', '屠夫钩子'), ('水晶室女', '冰女辅助')
+    ])
+]
+
+
+def room_snapshots(backend, voters):
+    """返回 (投票中的快照, 已结束的快照)"""
+    room_id = f'bench-render-{voters}'
+    backend.create_room(room_id, room_id, 1, voters, 1, '房主', 'bench', HEROES)
+    for i in range(voters - 1):
+        backend.start_user_voting(room_id, f'voter-{i}')
+        backend.vote(room_id, f'voter-{i}', i % 5 + 1, f'观众{i}号')
+    voting = backend.find_room(room_id)
+    backend.start_user_voting(room_id, 'last')
+    backend.vote(room_id, 'last', 1, '最后一位观众')
+    return voting, backend.find_room(room_id)
+
+
+def rate(func):
+    """每次调用的平均耗时（微秒）"""
+    count = 0
+    start = time.perf_counter()
+    deadline = start + DURATION
+    while time.perf_counter() < deadline:
+        for _ in range(50):
+            func()
+        count += 50
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def main():
+    if orjson is None:
+        print('未安装 orjson，ORJSONRenderer 会退回到标准库 json')
+    backend = MemoryRoomBackend()
+    json_renderer = JSONRenderer()
+    orjson_renderer = ORJSONRenderer()
+    print(f'{"voters":>6}  {"status":>8}  {"bytes":>7}  {"json (us)":>9}  {"orjson (us)":>11}  {"cached (us)":>11}')
+    for voters in VOTER_COUNTS:
+        for snapshot in room_snapshots(backend, voters):
+            data = {'success': True, 'data': snapshot.to_dict('voter-0')}
+            expected = json_renderer.render(data)
+            if orjson_renderer.render(data) != expected or _RoomPayload.of(snapshot).response('voter-0') != expected:
+                raise RuntimeError('序列化结果与 JSONRenderer 不一致')
+            stdlib = rate(lambda: json_renderer.render({'success': True, 'data': snapshot.to_dict('voter-0')}))
+            fast = rate(lambda: orjson_renderer.render({'success': True, 'data': snapshot.to_dict('voter-0')}))
+            cached = rate(lambda: _RoomPayload.of(snapshot).response('voter-0'))
+            print(
+                f'{voters:>6}  {snapshot.status:>8}  {len(expected):>7,}  '
+                f'{stdlib:>9.2f}  {fast:>11.2f}  {cached:>11.2f}'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""
+前端静态文件：原来的 serve_index / django.views.static.serve 与内存中的 StaticFiles 对比。
+
+在临时目录中按 Vite 的输出结构生成构建产物（index.html、assets/index-哈希.js、assets/index-哈希.css，
+内容由 frontend/src 的源码重复拼接到接近实际打包后的大小），对每种文件统计：
+- us/req：单个请求的处理时间（直接调用视图，不经过中间件）
+- bytes：浏览器（Accept-Encoding: gzip, deflate, br）实际接收的响应体大小
+- revisit：再次打开页面时需要发出的请求数（legacy 的文件都需要用 If-Modified-Since 确认，
+  immutable 的文件直接使用浏览器缓存，只有 index.html 需要确认）
+
+用法（在 backend 目录下执行）：
+    python bench/room_static.py
+"""
+import os
+import shutil
+import tempfile
+import time
+
+from _common import BACKEND_DIR, setup_django
+
+setup_django()
+
+from django.http import HttpResponse  # noqa: E402
+from django.test import RequestFactory  # noqa: E402
+from django.views.static import serve as static_serve  # noqa: E402
+
+from app.static_files import StaticFiles, brotli  # noqa: E402
+
+REQUESTS = 2000
+JS_SIZE = 150 * 1024
+CSS_SIZE = 20 * 1024
+ACCEPT_ENCODING = 'gzip, deflate, br'
+
+FRONTEND_SRC = os.path.join(os.path.dirname(BACKEND_DIR), 'frontend', 'src')
+
+
+def read_sources(suffixes):
+    sources = []
+    for directory, _, names in os.walk(FRONTEND_SRC):
+        for name in sorted(names):
+            if name.endswith(suffixes):
+                with open(os.path.join(directory, name), 'rb') as f:
+                    sources.append(f.read())
+    return b'\n'.join(sources)
+
+
+def repeat_to(content, size):
+    return (content * (size // len(content) + 1))[:size]
+
+
+def build_dist(root):
+    """生成与 Vite 输出结构相同的构建产物，返回各文件的 URL 路径"""
+    os.makedirs(os.path.join(root, 'assets'))
+    files = {
+        'assets/index-Bq3xY7kd.js': repeat_to(read_sources(('.js', '.vue')), JS_SIZE),
+        'assets/index-D4nPz1Qe.css': repeat_to(read_sources(('.vue',)), CSS_SIZE),
+    }
+    files['index.html'] = (
+        '<!DOCTYPE html>\n<html lang="zh-CN">\n<head>\n<meta charset="UTF-8">\n'
+        '<meta name="viewport" content="width=device-width, initial-scale=1.0">\n<title>抓内鬼</title>\n'
+        '<script type="module" crossorigin src="/static/assets/index-Bq3xY7kd.js"></script>\n'
+        '<link rel="stylesheet" crossorigin href="/static/assets/index-D4nPz1Qe.css">\n'
+        '</head>\n<body>\n<div id="app"></div>\n</body>\n</html>\n'
+    ).encode()
+    for name, content in files.items():
+        with open(os.path.join(root, name), 'wb') as f:
+            f.write(content)
+    return list(files)
+
+
+def legacy_index(root):
+    """原来的 serve_index：每次请求都从磁盘读取 index.html"""
+    def view(request):
+        with open(os.path.join(root, 'index.html'), 'rb') as f:
+            content = f.read()
+        return HttpResponse(content, content_type='text/html')
+    return view
+
+
+def body_size(response):
+    if response.streaming:
+        content = b''.join(response.streaming_content)
+        response.close()
+        return len(content)
+    return len(response.content)
+
+
+def measure(view, request, args):
+    body_size(view(request, *args))
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        body_size(view(request, *args))
+    return (time.perf_counter() - start) / REQUESTS * 1e6
+
+
+def main():
+    root = tempfile.mkdtemp(prefix='bench-static-')
+    factory = RequestFactory()
+    try:
+        names = build_dist(root)
+        static_files = StaticFiles()
+        start = time.perf_counter()
+        static_files.configure(root)
+        load_ms = (time.perf_counter() - start) * 1000
+
+        modes = {
+            'legacy': lambda name: (
+                (legacy_index(root), ()) if name == 'index.html'
+                else (lambda request, path: static_serve(request, path, document_root=root), (name,))
+            ),
+            'memory': lambda name: (
+                (static_files.index, ()) if name == 'index.html' else (static_files.serve, (name,))
+            ),
+        }
+
+        print(f'启动加载与压缩：{load_ms:.1f} ms（brotli: {"已安装" if brotli is not None else "未安装，只提供 gzip"}）')
+        print(f'{"file":>26}  {"mode":>6}  {"us/req":>8}  {"bytes":>8}  {"cache-control":>36}')
+        revisits = {}
+        for name in names:
+            for mode, resolve in modes.items():
+                view, args = resolve(name)
+                request = factory.get(f'/static/{name}', HTTP_ACCEPT_ENCODING=ACCEPT_ENCODING)
+                response = view(request, *args)
+                size = body_size(response)
+                cache_control = response.get('Cache-Control', '-')
+                if 'immutable' not in cache_control:
+                    revisits[mode] = revisits.get(mode, 0) + 1
+                elapsed = measure(view, request, args)
+                print(f'{name:>26}  {mode:>6}  {elapsed:>8.1f}  {size:>8,}  {cache_control:>36}')
+
+        print('再次打开页面需要发出的请求数：' + '，'.join(f'{mode} {count}' for mode, count in revisits.items()))
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    main()
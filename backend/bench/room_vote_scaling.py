@@ -0,0 +1,50 @@
+"""
+房间投票人数增加时单次投票的耗时。
+
+对每个 VOTER_COUNTS 中的人数创建一个房间（最大投票人数等于该人数，每人 VOTES_PER_USER 票），
+所有人先开始投票并投出前 VOTES_PER_USER - 1 票，再统计最后一轮投票中 MemoryRoomBackend.vote 的平均耗时。
+最后一轮时已投票人数已达到最大投票人数，每一票都会做投票结束判断；
+判断由增量维护的计数完成，耗时应与房间人数无关。
+
+用法（在 backend 目录下执行）：
+    python bench/room_vote_scaling.py
+"""
+import time
+
+from _common import HEROES
+
+from app.api.services import MemoryRoomBackend
+
+VOTER_COUNTS = [10, 100, 1000, 10000]
+VOTES_PER_USER = 2
+ROUNDS = 3
+
+
+def last_round_cost(backend, room_id, voters):
+    """返回最后一轮投票的平均耗时（微秒）"""
+    backend.create_room(room_id, room_id, 1, voters, VOTES_PER_USER, 'bench', 'bench', HEROES)
+    fingerprints = [f'voter-{i}' for i in range(voters)]
+    for fingerprint in fingerprints:
+        backend.start_user_voting(room_id, fingerprint)
+    for vote in range(VOTES_PER_USER - 1):
+        for i, fingerprint in enumerate(fingerprints):
+            backend.vote(room_id, fingerprint, (i + vote) % 5 + 1)
+    start = time.perf_counter()
+    for i, fingerprint in enumerate(fingerprints):
+        backend.vote(room_id, fingerprint, (i + VOTES_PER_USER - 1) % 5 + 1)
+    elapsed = time.perf_counter() - start
+    if backend.get_room_status(room_id) != 'finished':
+        raise RuntimeError('房间没有结束')
+    return elapsed / voters * 1e6
+
+
+def main():
+    backend = MemoryRoomBackend()
+    print(f'{"voters":>8}  {"us/vote":>8}')
+    for voters in VOTER_COUNTS:
+        cost = min(last_round_cost(backend, f'bench-{voters}-{i}', voters) for i in range(ROUNDS))
+        print(f'{voters:>8}  {cost:>8.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+内存后端单个房间的内存占用和大房间的投票吞吐量。
+
+1. 内存：分别创建 MEMORY_ROOMS 个 5 人房间和 LARGE_ROOMS 个 LARGE_VOTERS 人房间（所有人都已投完票），
+   用 tracemalloc 统计平均每个房间占用的内存（不含共享的英雄列表）
+2. 吞吐量：LARGE_VOTERS 人的房间，所有人先开始投票，再依次投出 VOTES_PER_USER 票，
+   统计 MemoryRoomBackend.vote 的每秒次数
+
+用法（在 backend 目录下执行）：
+    python bench/room_votes.py
+"""
+import time
+import tracemalloc
+
+from _common import HEROES
+
+from app.api.services import MemoryRoomBackend
+
+MEMORY_ROOMS = 2000
+LARGE_ROOMS = 5
+LARGE_VOTERS = 1000
+VOTES_PER_USER = 2
+ROUNDS = 3
+
+
+def fill_room(backend, room_id, voters):
+    """创建房间，所有用户先开始投票，再依次投完票；返回投票阶段的耗时和投票次数"""
+    backend.create_room(room_id, room_id, 1, voters, VOTES_PER_USER, 'bench', 'bench', HEROES)
+    fingerprints = [f'{room_id}-voter-{i}' for i in range(voters)]
+    for fingerprint in fingerprints:
+        backend.start_user_voting(room_id, fingerprint)
+    start = time.perf_counter()
+    for vote in range(VOTES_PER_USER):
+        for i, fingerprint in enumerate(fingerprints):
+            result = backend.vote(room_id, fingerprint, (i + vote) % 5 + 1, f'用户{i}')
+            if not result['success']:
+                raise RuntimeError(result)
+    elapsed = time.perf_counter() - start
+    if backend.get_room_status(room_id) != 'finished':
+        raise RuntimeError('房间没有结束')
+    return elapsed, voters * VOTES_PER_USER
+
+
+def memory_per_room(rooms, voters):
+    backend = MemoryRoomBackend()
+    backend.configure_expiry(max_rooms=rooms * 2)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for i in range(rooms):
+        fill_room(backend, f'bench-{voters}-{i}', voters)
+    # 快照会在下一次读取时重新生成，这里只统计房间状态本身
+    for room in backend._rooms.values():
+        room.snapshot = None
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return used / rooms
+
+
+def vote_throughput():
+    backend = MemoryRoomBackend()
+    best = 0.0
+    for round_index in range(ROUNDS):
+        elapsed, votes = fill_room(backend, f'bench-throughput-{round_index}', LARGE_VOTERS)
+        best = max(best, votes / elapsed)
+    return best
+
+
+def main():
+    print(f'{"voters/room":>11}  {"bytes/room":>10}')
+    print(f'{5:>11}  {memory_per_room(MEMORY_ROOMS, 5):>10,.0f}')
+    print(f'{LARGE_VOTERS:>11}  {memory_per_room(LARGE_ROOMS, LARGE_VOTERS):>10,.0f}')
+    print(f'\n{LARGE_VOTERS} 人房间，每人 {VOTES_PER_USER} 票：{vote_throughput():,.0f} votes/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""
+gunicorn 多 worker 与单 worker 的吞吐量对比（共享内存房间存储）。
+
+分别以 1 worker × THREADS 线程和 N worker × THREADS 线程（N 默认为 CPU 核数）启动 gunicorn，
+所有 worker 通过 ROOM_BACKEND=shm 共享同一个映射文件。房间由本脚本直接写入映射文件，
+不需要访问 OpenDota。然后用 CLIENTS 个客户端进程（每个进程一条长连接）压测：
+- detail：GET /api/rooms/{password}
+- vote：POST /api/rooms/{password}/vote（投票用户已提前开始投票，每个请求都是一次有效投票）
+
+用法（在 backend 目录下执行）：
+    python bench/room_workers.py
+"""
+import http.client
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from _common import BACKEND_DIR, HEROES, free_port
+
+from app.api.shm_backend import MAX_VOTERS, PLAYER_COUNT, SharedMemoryRoomBackend
+
+WORKER_COUNTS = [1, max(2, os.cpu_count() or 1)]
+THREADS = 4
+CLIENTS = 8
+DETAIL_REQUESTS = 4000
+# 每个投票房间可以接受 MAX_VOTERS * PLAYER_COUNT 次有效投票
+VOTE_ROOMS = 25
+CAPACITY = 256
+
+
+def setup_rooms(path):
+    """在映射文件中创建详情房间和投票房间，返回投票请求列表 (密码, 指纹, 玩家序号)"""
+    backend = SharedMemoryRoomBackend(path, capacity=CAPACITY)
+    backend.create_room('bench-detail', 'bench-detail', 1, 10, 1, 'bench', 'bench', HEROES)
+    for i in range(9):
+        backend.start_user_voting('bench-detail', f'voter-{i}')
+        backend.vote('bench-detail', f'voter-{i}', i % PLAYER_COUNT + 1, f'用户{i}')
+
+    votes = []
+    for room in range(VOTE_ROOMS):
+        room_id = f'bench-vote-{room}'
+        backend.create_room(room_id, room_id, 1, MAX_VOTERS, PLAYER_COUNT, 'bench', 'bench', HEROES)
+        for voter in range(MAX_VOTERS):
+            fingerprint = f'{room_id}-{voter}'
+            backend.start_user_voting(room_id, fingerprint)
+            votes.extend((room_id, fingerprint, player) for player in range(1, PLAYER_COUNT + 1))
+    return votes
+
+
+def start_server(path, workers, port):
+    env = dict(
+        os.environ,
+        DJANGO_SETTINGS_MODULE='app.settings',
+        DEBUG='False',
+        ROOM_BACKEND='shm',
+        ROOM_SHM_PATH=path,
+        ROOM_SHM_CAPACITY=str(CAPACITY)
+    )
+    server = subprocess.Popen(
+        [
+            sys.executable, '-m', 'gunicorn', 'app.wsgi:application',
+            '--bind', f'127.0.0.1:{port}',
+            '--workers', str(workers),
+            '--threads', str(THREADS)
+        ],
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    # 等待所有 worker 就绪：连续多次请求都成功
+    deadline = time.time() + 30
+    ready = 0
+    while ready < workers * 4:
+        if time.time() > deadline:
+            server.kill()
+            raise RuntimeError('gunicorn 启动超时')
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            conn.request('GET', '/api/stats')
+            ready += conn.getresponse().status == 200
+            conn.close()
+        except OSError:
+            time.sleep(0.1)
+    return server
+
+
+def run_client(args):
+    """单个客户端进程：在一条长连接上依次发送请求，返回每个请求的耗时"""
+    port, requests = args
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    latencies = []
+    for method, url, body, fingerprint in requests:
+        headers = {'X-User-Fingerprint': fingerprint}
+        if body is not None:
+            headers['Content-Type'] = 'application/json'
+        start = time.perf_counter()
+        conn.request(method, url, body=body, headers=headers)
+        response = conn.getresponse()
+        response.read()
+        latencies.append(time.perf_counter() - start)
+        if response.status != 200:
+            raise RuntimeError(f'{method} {url} 返回 {response.status}')
+    conn.close()
+    return latencies
+
+
+def load(pool, port, requests):
+    """把请求平均分给各个客户端进程，返回 (每秒请求数, p50 毫秒, p99 毫秒)"""
+    chunks = [(port, requests[i::CLIENTS]) for i in range(CLIENTS)]
+    start = time.perf_counter()
+    latencies = sorted(sum(pool.map(run_client, chunks), []))
+    elapsed = time.perf_counter() - start
+    return (
+        len(requests) / elapsed,
+        latencies[len(latencies) // 2] * 1000,
+        latencies[int(len(latencies) * 0.99)] * 1000
+    )
+
+
+def main():
+    detail_requests = [
+        ('GET', '/api/rooms/bench-detail', None, f'voter-{i % 9}') for i in range(DETAIL_REQUESTS)
+    ]
+    print(f'{"workers x threads":>17}  {"endpoint":>8}  {"req/s":>8}  {"p50 (ms)":>8}  {"p99 (ms)":>8}')
+    with multiprocessing.Pool(CLIENTS) as pool:
+        for workers in WORKER_COUNTS:
+            fd, path = tempfile.mkstemp(prefix='bench-rooms-')
+            os.close(fd)
+            os.remove(path)
+            votes = setup_rooms(path)
+            vote_requests = [
+                ('POST', f'/api/rooms/{password}/vote', json.dumps({'player_index': player}), fingerprint)
+                for password, fingerprint, player in votes
+            ]
+            port = free_port()
+            server = start_server(path, workers, port)
+            try:
+                for endpoint, requests in (('detail', detail_requests), ('vote', vote_requests)):
+                    rps, p50, p99 = load(pool, port, requests)
+                    print(f'{f"{workers} x {THREADS}":>17}  {endpoint:>8}  {rps:>8,.0f}  {p50:>8.2f}  {p99:>8.2f}')
+            finally:
+                server.terminate()
+                server.wait()
+                os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
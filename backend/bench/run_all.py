@@ -0,0 +1,94 @@
+"""
+依次运行 bench/ 中的全部基准测试脚本（room_*.py，新增的脚本自动加入），任何一个脚本失败（退出码非 0 或超时）时
+最后以退出码 1 结束，用于在提交前确认所有脚本仍然可以运行。
+
+- room_micro.py、room_load.py 的 JSON 结果写入 --output-dir 下的 room_micro.json、room_load.json，
+  可以用 bench/compare.py 对比不同提交的结果
+- 每个脚本的终端输出写入 --output-dir 下的 <脚本名>.log，失败时同时打印最后几行
+- --quick 时 room_micro 只测较小的组合、room_load 使用较小的负载，其余脚本不变，整体约需 5 分钟
+
+用法（在 backend 目录下执行，room_load、room_asgi、room_workers、room_ballot 需要安装 gunicorn、uvicorn 和 httpx）：
+    python bench/run_all.py
+    python bench/run_all.py --quick --output-dir /tmp/bench
+    python bench/run_all.py room_etag room_detail     # 只运行指定的脚本
+"""
+import argparse
+import glob
+import os
+import subprocess
+import sys
+import time
+
+from _common import BACKEND_DIR
+
+BENCH_DIR = os.path.join(BACKEND_DIR, 'bench')
+# 输出 JSON 结果的脚本：脚本名 -> (参数, --quick 时追加的参数)
+SUITE_ARGS = {
+    'room_micro': ([], ['--quick']),
+    'room_load': ([], ['--rooms', '5', '--voters', '3', '--rounds', '1', '--ramp', '1', '--vote-spread', '1']),
+}
+# 失败时打印的输出行数
+TAIL_LINES = 20
+
+
+def scripts(names):
+    available = sorted(
+        os.path.splitext(os.path.basename(path))[0] for path in glob.glob(os.path.join(BENCH_DIR, 'room_*.py'))
+    )
+    if not names:
+        return available
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise SystemExit(f'没有这些脚本: {", ".join(unknown)}')
+    return names
+
+
+def run(name, args, output_dir):
+    """运行一个脚本，返回 (是否成功, 耗时, 失败原因)"""
+    command = [sys.executable, os.path.join(BENCH_DIR, f'{name}.py')]
+    if name in SUITE_ARGS:
+        options, quick_options = SUITE_ARGS[name]
+        command += options + (quick_options if args.quick else [])
+        command += ['--output', os.path.join(output_dir, f'{name}.json')]
+    start = time.monotonic()
+    with open(os.path.join(output_dir, f'{name}.log'), 'w', encoding='utf-8') as log:
+        try:
+            result = subprocess.run(command, cwd=BACKEND_DIR, stdout=log, stderr=subprocess.STDOUT,
+                                    timeout=args.timeout)
+        except subprocess.TimeoutExpired:
+            return False, time.monotonic() - start, f'超过 {args.timeout} 秒'
+    elapsed = time.monotonic() - start
+    if result.returncode != 0:
+        return False, elapsed, f'退出码 {result.returncode}'
+    return True, elapsed, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='运行全部基准测试脚本')
+    parser.add_argument('names', nargs='*', help='只运行这些脚本（不带 .py），默认全部')
+    parser.add_argument('--output-dir', '-o', default='bench-results', help='结果和日志目录（默认 bench-results）')
+    parser.add_argument('--quick', action='store_true', help='room_micro、room_load 使用较小的规模')
+    parser.add_argument('--timeout', type=float, default=900, help='单个脚本的超时时间（秒）')
+    args = parser.parse_args()
+    output_dir = os.path.abspath(args.output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+
+    failed = []
+    for name in scripts(args.names):
+        print(f'{name:<20} ', end='', flush=True)
+        ok, elapsed, reason = run(name, args, output_dir)
+        print(f'{"ok" if ok else "FAILED":<7}{elapsed:7.1f}s' + (f'  {reason}' if reason else ''), flush=True)
+        if not ok:
+            failed.append(name)
+            with open(os.path.join(output_dir, f'{name}.log'), encoding='utf-8', errors='replace') as log:
+                for line in log.readlines()[-TAIL_LINES:]:
+                    print(f'    {line.rstrip()}')
+
+    print(f'结果和日志: {output_dir}')
+    if failed:
+        print(f'失败的脚本: {", ".join(failed)}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -21,12 +21,28 @@ export async function createRoom(data) {
   return response.json()
 }
 
-export async function getRoom(roomId) {
+// 房间详情的上一次响应、ETag 和版本号，房间未变化时服务端返回 304，直接复用缓存结果
+const roomCache = {}
+
+// wait > 0 时使用长轮询：服务端在房间版本号变化或等待 wait 秒后才返回
+export async function getRoom(roomId, wait = 0) {
   const headers = getHeaders()
-  const response = await fetch(`${API_BASE}/rooms/${roomId}`, {
+  const cached = roomCache[roomId]
+  let url = `${API_BASE}/rooms/${roomId}`
+  if (cached) {
+    headers['If-None-Match'] = cached.etag
+    if (wait > 0 && cached.version) {
+      url += `?since=${cached.version}&wait=${wait}`
+    }
+  }
+  const response = await fetch(url, {
     headers
   })
+  if (response.status === 304 && cached) {
+    return cached.result
+  }
   if (!response.ok) {
+    delete roomCache[roomId]
     // 如果响应不成功，尝试解析 JSON，如果失败则返回错误对象
     try {
       return await response.json()
@@ -38,7 +54,19 @@ export async function getRoom(roomId) {
       }
     }
   }
-  return response.json()
+  const result = await response.json()
+  const etag = response.headers.get('ETag')
+  if (etag && result.success) {
+    roomCache[roomId] = { etag, result, version: response.headers.get('X-Room-Version') }
+  } else {
+    delete roomCache[roomId]
+  }
+  return result
+}
+
+export function getRoomEventsUrl(roomId) {
+  // EventSource 无法设置请求头，用户指纹通过查询参数传递
+  return `${API_BASE}/rooms/${roomId}/events?fingerprint=${encodeURIComponent(getUserFingerprint())}`
 }
 
 export async function startVoting(roomId) {